@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 #
-# Copyright (c) 2024-2025, Geoffrey M. Poore
+# Copyright (c) 2024-2026, Geoffrey M. Poore
 # All rights reserved.
 #
 # Licensed under the LaTeX Project Public License version 1.3c:
@@ -25,6 +25,15 @@ The combined executable plus wheels provide everything that is needed for the
 Python side of the minted LaTeX package.  No additional Python libraries are
 required.
 
+To avoid compiling Python modules from the wheels every time this executable
+runs, the wheels are unpacked and bytecode-compiled once, in a user-level
+cache directory (`$XDG_CACHE_HOME/latexminted/wheels` or
+`~/.cache/latexminted/wheels`).  The cache is only used if it is under a
+hidden directory outside the current directory, TEXMFOUTPUT, and
+TEXMF_OUTPUT_DIRECTORY, so that LaTeX cannot write it.  Otherwise, or if the
+environment variable `LATEXMINTED_NO_WHEEL_CACHE` is set, modules are imported
+from the wheels directly.
+
 The wheels require Python >= 3.8.  If this executable is launched with an
 earlier Python version, then it will attempt to locate a more recent Python
 installation and run itself with that Python version in a subprocess.  The
@@ -84,7 +93,7 @@ under Windows:
 # This is NOT the version of the `latexminted` library.  The library version
 # is what matters for compatibility purposes, and the library version is what
 # is returned from running `latexminted --version`.
-__launcher_version__ = '20250306'
+__launcher_version__ = '20261019'
 
 
 import os
@@ -281,8 +290,125 @@ if not wheel_paths:
 for pkg in required_wheel_packages:
     if not any(whl.name.startswith(pkg) for whl in wheel_paths):
         sys.exit('latexminted failed to find all required bundled wheels *.whl')
+
+
+
+# Python can import directly from wheels, but zipimport never writes bytecode,
+# so all modules would be compiled again every time this executable runs.
+# Pygments is large enough that this is a significant fraction of run time.
+# To avoid this, wheels are unpacked and bytecode-compiled once, in a
+# user-level cache directory, and then imported from there.  Each unpacked
+# wheel is keyed by Python implementation/version and the SHA-256 of the
+# wheel, so multiple TeX installations and Python versions can share the
+# cache.  Files are verified against the wheel's RECORD when unpacked, and an
+# unpacked wheel is only used once it is complete.  If anything goes wrong,
+# the wheel itself is used as before.
+#
+# The unpacked wheels are imported as code, so the cache must not be writable
+# by LaTeX.  It must be outside the current directory, TEXMFOUTPUT, and
+# TEXMF_OUTPUT_DIRECTORY, and must be under a hidden (dot) directory, since
+# LaTeX is not allowed to write dotfiles except with `openout_any = a`, in
+# which case there is no write security to begin with.
+def get_wheel_cache_path():
+    if os.getenv('LATEXMINTED_NO_WHEEL_CACHE'):
+        return None
+    env_XDG_CACHE_HOME = os.getenv('XDG_CACHE_HOME')
+    if sys.platform != 'win32' and env_XDG_CACHE_HOME and Path(env_XDG_CACHE_HOME).is_absolute():
+        cache_root = Path(env_XDG_CACHE_HOME)
+    else:
+        try:
+            cache_root = Path.home() / '.cache'
+        except RuntimeError:
+            return None
+    wheel_cache_path = cache_root / 'latexminted' / 'wheels' / sys.implementation.cache_tag
+    wheel_cache_path_resolved = wheel_cache_path.resolve()
+    for path in (wheel_cache_path, wheel_cache_path_resolved):
+        if not any(part.startswith('.') and part not in ('.', '..') for part in path.parts):
+            return None
+    # The permission check for executables compares the parent directory of
+    # its arguments with locations writable by LaTeX
+    wheel_cache_placeholder_path = wheel_cache_path / 'wheel'
+    if not is_permitted_executable_path(wheel_cache_placeholder_path, wheel_cache_placeholder_path.resolve()):
+        return None
+    return wheel_cache_path_resolved
+
+
+def unpack_wheel(wheel_path, wheel_cache_path):
+    import base64
+    import compileall
+    import csv
+    import hashlib
+    import io
+    import py_compile
+    import zipfile
+
+    wheel_bytes = wheel_path.read_bytes()
+    wheel_hash = hashlib.sha256(wheel_bytes).hexdigest()
+    unpacked_path = wheel_cache_path / '{}-{}'.format(wheel_path.stem, wheel_hash[:16])
+    if (unpacked_path / '.complete').is_file():
+        return unpacked_path
+
+    wheel_cache_path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    temp_path = unpacked_path.with_name('{}.tmp-{}'.format(unpacked_path.name, os.getpid()))
+    try:
+        with zipfile.ZipFile(io.BytesIO(wheel_bytes)) as wheel_zip:
+            records = {}
+            for name in wheel_zip.namelist():
+                if name.endswith('.dist-info/RECORD') and name.count('/') == 1:
+                    record_text = wheel_zip.read(name).decode('utf8')
+                    for row in csv.reader(record_text.splitlines()):
+                        if row and row[1]:
+                            records[row[0]] = row[1]
+            for info in wheel_zip.infolist():
+                if info.is_dir():
+                    continue
+                name = info.filename
+                if name.startswith('/') or '\\' in name or '..' in name.split('/') or ':' in name:
+                    raise ValueError
+                data = wheel_zip.read(info)
+                if not name.endswith('.dist-info/RECORD'):
+                    algorithm, _, expected_digest = records[name].partition('=')
+                    if algorithm != 'sha256':
+                        raise ValueError
+                    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b'=').decode('ascii')
+                    if digest != expected_digest:
+                        raise ValueError
+                file_path = temp_path / name
+                file_path.parent.mkdir(parents=True, exist_ok=True)
+                file_path.write_bytes(data)
+        # Unpacked files never change, so bytecode doesn't need to be checked
+        # against source files
+        compileall.compile_dir(temp_path.as_posix(), quiet=2, workers=1,
+                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+        (temp_path / '.complete').write_text(wheel_hash, encoding='utf8')
+        try:
+            os.replace(temp_path.as_posix(), unpacked_path.as_posix())
+        except OSError:
+            # Another process may have unpacked the wheel at the same time
+            if not (unpacked_path / '.complete').is_file():
+                raise
+    finally:
+        if temp_path.exists():
+            shutil.rmtree(temp_path.as_posix(), ignore_errors=True)
+    return unpacked_path
+
+
+wheel_import_paths = []
+wheel_cache_path = None
+try:
+    wheel_cache_path = get_wheel_cache_path()
+except Exception:
+    pass
 for wheel_path in wheel_paths:
-    sys.path.insert(0, wheel_path.as_posix())
+    wheel_import_path = wheel_path
+    if wheel_cache_path is not None:
+        try:
+            wheel_import_path = unpack_wheel(wheel_path, wheel_cache_path)
+        except Exception:
+            pass
+    wheel_import_paths.append(wheel_import_path)
+for wheel_import_path in wheel_import_paths:
+    sys.path.insert(0, wheel_import_path.as_posix())
 
 
 
@@ -368,5 +494,8 @@ if sys.platform == 'win32' and not os.getenv('LATEXMINTED_SUBPROCESS'):
 
 
 
-from latexminted.cmdline import main
-main()
+# Worker processes started with `multiprocessing` using `spawn` import this
+# script again as `__mp_main__`, so `main()` must not run in that case
+if __name__ == '__main__':
+    from latexminted.cmdline import main
+    main()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+from typing import Any, Iterable, Iterator
+from pygments import highlight as pygments_highlight
+from .err import LatexMintedError
+from .highlighting import make_lexer_and_formatter, preprocess_code, process_highlight_data
+from .messages import latex_message_to_text, Messages
+
+
+
+
+# Library interface for highlighting code within Python, without LaTeX.
+# Requests use the same option names and values as the `minted` package, and
+# highlighted code is identical to the contents of the `.highlight.minted`
+# files that `latexminted` creates within LaTeX (without the digest trailer
+# that is added with the `.latexminted_config` setting `cache.skip_existing`).
+# There are no data files, message files, or subprocesses.  Custom lexers in
+# standalone Python files are not supported, since loading them depends on
+# LaTeX security settings; Pygments plugin packages work as usual.
+
+# Defaults for options that are passed from the `minted` package to Python
+default_options: dict[str, str] = {
+    'autogobble': 'false',
+    'codetagify': '',
+    'commandprefix': 'PYG',
+    'compactoutput': 'false',
+    'encoding': 'utf8',
+    'escapeinside': '',
+    'extrakeywords': '',
+    'extrakeywordsconstant': '',
+    'extrakeywordsdeclaration': '',
+    'extrakeywordsnamespace': '',
+    'extrakeywordspseudo': '',
+    'extrakeywordsreserved': '',
+    'extrakeywordstype': '',
+    'funcnamehighlighting': 'true',
+    'gobble': '0',
+    'gobblefilter': '0',
+    'keywordcase': 'none',
+    'literalenvname': 'MintedVerbatim',
+    'literatecomment': '',
+    'mathescape': 'false',
+    'python3': 'true',
+    'rangeregex': '',
+    'rangeregexdotall': 'false',
+    'rangeregexmatchnumber': '1',
+    'rangeregexmultiline': 'false',
+    'rangestartafterstring': '',
+    'rangestartafterstringline': '',
+    'rangestartstring': '',
+    'rangestartstringline': '',
+    'rangestopbeforestring': '',
+    'rangestopbeforestringline': '',
+    'rangestopstring': '',
+    'rangestopstringline': '',
+    'startinline': 'false',
+    'stripall': 'false',
+    'stripnl': 'false',
+    'style': 'default',
+    'texcl': 'false',
+    'texcomments': 'false',
+    'tokenmerge': 'true',
+}
+
+
+class HighlightResult(object):
+    '''
+    Result of a highlighting request.  `highlighted` is the highlighted code,
+    or `None` if there were errors, in which case `errors` lists them.
+    '''
+    def __init__(self, *, request: dict[str, Any], highlighted: str | None, errors: list[str]):
+        self.request = request
+        self.highlighted = highlighted
+        self.errors = errors
+
+    def __repr__(self):
+        return f'{type(self).__name__}(highlighted={self.highlighted!r}, errors={self.errors!r})'
+
+
+
+
+def _option_to_str(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return 'none'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        return value
+    raise TypeError
+
+
+def _result(*, request: dict[str, Any], highlighted: str | None, messages: Messages) -> HighlightResult:
+    errors = [latex_message_to_text(message) for message in messages.errors]
+    return HighlightResult(request=request, highlighted=highlighted, errors=errors)
+
+
+def highlight_request(request: dict[str, Any]) -> HighlightResult:
+    '''
+    Highlight code for a single request.  A request is a dict with keys `code`
+    and `lexer`, plus optionally any of the keys in `default_options`.  Option
+    values are strings as in LaTeX (`"true"`, `"none"`, etc.), or the
+    corresponding `bool`, `int`, or `None`.
+    '''
+    messages = Messages(md5='api')
+    if 'code' not in request or 'lexer' not in request:
+        messages.append_error('Highlighting request requires "code" and "lexer"')
+        return _result(request=request, highlighted=None, messages=messages)
+    pyopt: dict[str, str] = default_options.copy()
+    for k, v in request.items():
+        if k == 'code':
+            continue
+        try:
+            pyopt[k] = _option_to_str(v)
+        except TypeError:
+            messages.append_error(rf'Key "{k}" has invalid value of type "{type(v).__name__}"')
+    if messages.has_errors():
+        return _result(request=request, highlighted=None, messages=messages)
+
+    processed_data = process_highlight_data(messages=messages, data={'code': request['code'], 'pyopt': pyopt})
+    highlighted: str | None = None
+    if processed_data is not None:
+        minted_opts, py_opts, code_opts, custom_lexer_opts, lexer_opts, filter_opts, formatter_opts = processed_data
+        code = preprocess_code(minted_opts['code'], messages=messages, **code_opts)
+        if code is not None:
+            lexer_and_formatter = make_lexer_and_formatter(
+                messages=messages, py_opts=py_opts, custom_lexer_opts=custom_lexer_opts, lexer_opts=lexer_opts,
+                filter_opts=filter_opts, formatter_opts=formatter_opts
+            )
+            if lexer_and_formatter is not None:
+                pygments_lexer, pygments_formatter = lexer_and_formatter
+                highlighted = pygments_highlight(code, pygments_lexer, pygments_formatter)
+    return _result(request=request, highlighted=highlighted, messages=messages)
+
+
+def highlight_many(requests: Iterable[dict[str, Any]]) -> Iterator[HighlightResult]:
+    '''
+    Highlight code for each request (see `highlight_request()`), yielding
+    results in order as they are completed.  Errors in one request do not
+    prevent later requests from being processed.
+    '''
+    for request in requests:
+        yield highlight_request(request)
+
+
+def highlight(code: str, lexer: str, **options: Any) -> str:
+    '''
+    Highlight code, raising `LatexMintedError` if there are errors.
+    '''
+    result = highlight_request({'code': code, 'lexer': lexer, **options})
+    if result.highlighted is None:
+        raise LatexMintedError('; '.join(result.errors))
+    return result.highlighted
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import hashlib
+import re
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Iterator, TypeVar
+from latexrestricted import PathSecurityError
+
+
+
+
+# This module only contains functionality that does not depend on LaTeX
+# security settings, so that it can be used both within LaTeX shell escape
+# (with restricted paths) and outside LaTeX (with standard paths).
+
+PathType = TypeVar('PathType', bound=Path)
+
+
+# Cache files for highlighted code are named with the MD5 hash of code plus
+# options.  With `cachelayout=sharded`, these are stored in two levels of
+# subdirectories based on the first four hex digits of the hash:
+# `<hash[:2]>/<hash[2:4]>/<hash>.highlight.minted`.  All other cache files
+# (style definitions and indexes) are always stored directly in the cache
+# directory.  Index files list cache files by their names relative to the
+# cache directory, so sharded names include subdirectories.
+hash_cache_file_name_re = re.compile(r'(?:([0-9a-f]{2})/([0-9a-f]{2})/)?([0-9a-f]{32})\.highlight\.minted')
+shard_glob_pattern = '[0-9a-f][0-9a-f]/[0-9a-f][0-9a-f]/*.minted'
+
+# With `cache.incremental_min_lines`, lexer checkpoints for a large input file
+# are saved as `<key>-<hash>.checkpoint.minted`, where `<key>` identifies the
+# input file plus lexer and `<hash>` is the hash of the highlight file that
+# was created with the checkpoints.  Checkpoint files are not listed in index
+# files.  They are in use as long as their highlight file is in use.
+checkpoint_file_name_re = re.compile(r'([0-9a-f]{32})-([0-9a-f]{32})\.checkpoint\.minted')
+
+# When `cache.skip_existing` is enabled, highlight files end with a trailer
+# containing a SHA-256 digest of all preceding file contents.  This makes it
+# possible to distinguish complete files from files left behind by an
+# interrupted compile.  The trailer is a TeX comment, so it has no effect when
+# the file is input.
+digest_trailer_prefix = '%latexminted sha256='
+
+# With the minted package option `cachebundle`, cleaning also writes
+# `_<md5>.bundle.minted`, which contains the highlighted code for all
+# highlight files in the current index, so that LaTeX can load all cached code
+# with a single file open.  The bundle is listed in the index like any other
+# cache file.  Bundle entries are delimited with the control characters
+# `^^A`, `^^B`, `^^C`, and `^^D`, so highlighted code containing these is not
+# bundled; LaTeX inputs the highlight file as usual instead.
+bundle_delimiters = ('\x01', '\x02', '\x03', '\x04')
+
+# Advisory lock file that serializes index updates and garbage collection
+# when multiple processes share a cache directory.  This is never evicted.
+cache_lock_file_name = '_latexminted.lock.minted'
+
+# Errors from background garbage collection, which has no terminal.  This is
+# overwritten each time background garbage collection starts, and is never
+# evicted.
+gc_log_file_name = '_latexminted.gclog.minted'
+
+
+
+
+def is_hash_cache_file_name(name: str) -> bool:
+    match = hash_cache_file_name_re.fullmatch(name)
+    if not match:
+        return False
+    shard_0, shard_1, hash = match.groups()
+    return shard_0 is None or hash.startswith(f'{shard_0}{shard_1}')
+
+
+def is_sharded_cache_file_name(name: str) -> bool:
+    return '/' in name and is_hash_cache_file_name(name)
+
+
+def flat_cache_file_name(name: str) -> str:
+    return name.rsplit('/', 1)[-1]
+
+
+def sharded_cache_file_name(name: str) -> str:
+    name = flat_cache_file_name(name)
+    return f'{name[:2]}/{name[2:4]}/{name}'
+
+
+def alternate_layout_cache_file_name(name: str) -> str:
+    '''
+    Name of a hash-based cache file in the other cache layout, for migrating
+    between flat and sharded layouts.
+    '''
+    if is_sharded_cache_file_name(name):
+        return flat_cache_file_name(name)
+    return sharded_cache_file_name(name)
+
+
+def checkpoint_file_name(key: str, highlight_file_name: str) -> str:
+    return f'{key}-{flat_cache_file_name(highlight_file_name)[:32]}.checkpoint.minted'
+
+
+def checkpoint_glob_pattern(key: str) -> str:
+    return f'{key}-*.checkpoint.minted'
+
+
+def checkpoint_highlight_file_names(name: str) -> tuple[str, str] | None:
+    '''
+    Names of the highlight file for a checkpoint file, in the flat and
+    sharded layouts.  Return `None` if `name` is not a checkpoint file.
+    '''
+    match = checkpoint_file_name_re.fullmatch(name)
+    if not match:
+        return None
+    flat_name = f'{match.group(2)}.highlight.minted'
+    return (flat_name, sharded_cache_file_name(flat_name))
+
+
+def iter_cache_file_paths(cache_path: PathType) -> Iterator[tuple[str, PathType]]:
+    '''
+    Iterate over all `*.minted` files in the cache directory, for both flat
+    and sharded layouts.  Yield tuples of file names relative to the cache
+    directory (as used in index files) and paths.
+    '''
+    for minted_path in cache_path.glob('*.minted'):
+        if minted_path.name in (cache_lock_file_name, gc_log_file_name):
+            continue
+        yield (minted_path.name, minted_path)
+    for minted_path in cache_path.glob(shard_glob_pattern):
+        yield (f'{minted_path.parent.parent.name}/{minted_path.parent.name}/{minted_path.name}', minted_path)
+
+
+
+
+def digest_trailer_status(highlighted_bytes: bytes) -> bool | None:
+    '''
+    Whether highlighted code ends with a valid digest trailer.  Return `None`
+    if there is no trailer.
+    '''
+    content_bytes, trailer_prefix_bytes, digest_bytes = highlighted_bytes.rpartition(
+        digest_trailer_prefix.encode('utf8')
+    )
+    if not trailer_prefix_bytes:
+        return None
+    if not digest_bytes.endswith(b'\n'):
+        return False
+    hasher = hashlib.sha256()
+    hasher.update(content_bytes)
+    return digest_bytes[:-1] == hasher.hexdigest().encode('ascii')
+
+
+
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _lock_file(file: BinaryIO):
+        file.seek(0)
+        while True:
+            try:
+                # `LK_LOCK` only retries for around 10 seconds before raising
+                # an error, so keep waiting
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            except OSError:
+                continue
+            break
+
+    def _unlock_file(file: BinaryIO):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(file: BinaryIO):
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(file: BinaryIO):
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock(lock_path: Path) -> Iterator[bool]:
+    '''
+    Hold an exclusive advisory lock on `lock_path`, creating the file if
+    necessary.  Yield whether the lock was acquired.  If the lock file cannot
+    be created, continue without locking.
+    '''
+    try:
+        lock_file = lock_path.open('ab')
+    except Exception:
+        yield False
+        return
+    try:
+        _lock_file(lock_file)
+    except Exception:
+        lock_file.close()
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        try:
+            _unlock_file(lock_file)
+        finally:
+            lock_file.close()
+
+
+@contextmanager
+def cache_lock(cache_path: Path) -> Iterator[bool]:
+    '''
+    Hold an exclusive advisory lock on the cache directory while reading and
+    writing indexes and deleting cache files.  Yield whether the lock was
+    acquired.  If the lock file cannot be created (for example, the cache
+    directory does not exist yet or is read-only), continue without locking,
+    since nothing can be deleted in that case.
+    '''
+    with file_lock(cache_path / cache_lock_file_name) as is_locked:
+        yield is_locked
+
+
+
+
+# While a compile is producing cache files, it holds a lease
+# `_<md5>.lease.minted` that lists them, one per line.  Cleaning in other
+# processes treats leased files as in use until the compile writes its index
+# and releases the lease.  Without batch mode, each snippet adds its cache
+# file to the lease separately, so files are appended to the lease rather
+# than rewriting it, and leasing is not quadratic in the number of snippets.
+# Leases that have not been renewed for `lease_seconds` are ignored, so that
+# a crashed compile can't keep files in the cache indefinitely.  Expired
+# leases are then deleted as unused files.
+
+def lease_file_name(md5: str) -> str:
+    return f'_{md5}.lease.minted'
+
+
+def bundle_file_name(md5: str) -> str:
+    return f'_{md5}.bundle.minted'
+
+
+def config_cache_file_name(md5: str) -> str:
+    return f'_{md5}.configcache.minted'
+
+
+def acquire_lease(cache_path: Path, *, md5: str, cache_file_names: Iterable[str]) -> bool:
+    '''
+    Add cache files to the lease for the current compile, creating or
+    renewing the lease.  Return whether the lease was written.  This is
+    best-effort:  if the lease can't be written, then writing the cache files
+    themselves will fail with a more useful error.
+    '''
+    lease_path = cache_path / lease_file_name(md5)
+    # Appending always writes at least a newline, which renews the lease
+    lease_text = ''.join(f'{name}\n' for name in cache_file_names) or '\n'
+    with cache_lock(cache_path):
+        try:
+            with lease_path.open('a', encoding='utf8') as lease_file:
+                lease_file.write(lease_text)
+        except (OSError, PathSecurityError):
+            return False
+    return True
+
+
+def release_lease(cache_path: Path, *, md5: str):
+    '''
+    Delete the lease for the current compile.  This should be called while
+    holding the cache lock, after the compile's index has been written.
+    '''
+    try:
+        (cache_path / lease_file_name(md5)).unlink(missing_ok=True)
+    except (OSError, PathSecurityError):
+        pass
+
+
+def read_active_leases(cache_path: Path, *, lease_seconds: int, exclude_md5: str | None = None) -> set[str]:
+    '''
+    Names of cache files that are leased by compiles in progress, including
+    the lease files themselves.  This should be called while holding the
+    cache lock.
+    '''
+    leased: set[str] = set()
+    exclude_name = lease_file_name(exclude_md5) if exclude_md5 is not None else None
+    now = time.time()
+    for lease_path in cache_path.glob('*.lease.minted'):
+        if lease_path.name == exclude_name:
+            continue
+        try:
+            if now - lease_path.stat().st_mtime > lease_seconds:
+                continue
+            lease_text = lease_path.read_text(encoding='utf8')
+        except Exception:
+            continue
+        leased.add(lease_path.name)
+        leased.update(name for name in lease_text.splitlines() if name)
+    return leased
+
+
+
+
+def timestamp_to_date(timestamp: str) -> date:
+    # Python < 3.11 requires `YYYY-MM-DD`
+    return date.fromisoformat(f'{timestamp[:4]}-{timestamp[4:6]}-{timestamp[6:8]}')
+
+
+def plan_cache_eviction(*, timestamp: str, current_index_name: str | None, current_cache_files: set[str],
+                        index_data: dict[str, dict[str, Any]], cache_file_sizes: dict[str, int],
+                        max_age_days: int, max_bytes: int | None, max_files: int | None) -> dict[str, str]:
+    '''
+    Determine which files in the cache directory should be deleted.  Return a
+    dict that maps file names (relative to the cache directory) to reasons
+    for eviction:
+
+      * `expired`:  Index file that was last used more than `max_age_days`
+        ago.
+
+      * `unused`:  Cache file that is not listed in any remaining index.
+
+      * `budget`:  Index file, or cache file only listed in that index, that
+        was evicted because the cache exceeds `max_bytes` or `max_files`.
+        Indexes are evicted in order of least recent use, based on index
+        timestamps.
+
+    `index_data` maps index file names to index data for all indexes other
+    than the current index.  `current_cache_files` are the files listed in
+    the current index; these are never evicted.  `cache_file_sizes` maps the
+    names of all files in the cache to their sizes in bytes.
+    '''
+    timestamp_date = timestamp_to_date(timestamp)
+    evicted: dict[str, str] = {}
+    live_index_data: dict[str, dict[str, Any]] = {}
+    for index_name, index_data_i in index_data.items():
+        if index_name == current_index_name:
+            continue
+        index_age = timestamp_date - timestamp_to_date(index_data_i['timestamp'])
+        if index_age > timedelta(days=max_age_days):
+            evicted[index_name] = 'expired'
+        else:
+            live_index_data[index_name] = index_data_i
+
+    # Checkpoint files are treated as if they were listed wherever their
+    # highlight files are listed
+    checkpoints: dict[str, list[str]] = defaultdict(list)
+    for cache_file_name in cache_file_sizes:
+        highlight_file_names = checkpoint_highlight_file_names(cache_file_name)
+        if highlight_file_names is not None:
+            for highlight_file_name in highlight_file_names:
+                checkpoints[highlight_file_name].append(cache_file_name)
+
+    def with_checkpoints(cache_file_names: set[str]) -> set[str]:
+        if not checkpoints:
+            return cache_file_names
+        return cache_file_names.union(*(checkpoints[n] for n in cache_file_names if n in checkpoints))
+
+    reference_counts: dict[str, int] = defaultdict(int)
+    for cache_file_name in with_checkpoints(current_cache_files):
+        reference_counts[cache_file_name] += 1
+    for index_name, index_data_i in live_index_data.items():
+        for cache_file_name in with_checkpoints(set(index_data_i['cachefiles']) | {index_name}):
+            reference_counts[cache_file_name] += 1
+    for cache_file_name in cache_file_sizes:
+        if cache_file_name not in reference_counts and cache_file_name not in evicted:
+            evicted[cache_file_name] = 'unused'
+
+    if max_bytes is None and max_files is None:
+        return evicted
+    remaining_sizes = {k: v for k, v in cache_file_sizes.items() if k not in evicted}
+    total_bytes = sum(remaining_sizes.values())
+    total_files = len(remaining_sizes)
+    for index_name, index_data_i in sorted(live_index_data.items(), key=lambda x: (x[1]['timestamp'], x[0])):
+        if (max_bytes is None or total_bytes <= max_bytes) and (max_files is None or total_files <= max_files):
+            break
+        for cache_file_name in with_checkpoints(set(index_data_i['cachefiles']) | {index_name}):
+            reference_counts[cache_file_name] -= 1
+            if reference_counts[cache_file_name] == 0 and cache_file_name in remaining_sizes:
+                evicted[cache_file_name] = 'budget'
+                total_bytes -= remaining_sizes.pop(cache_file_name)
+                total_files -= 1
+    return evicted
+
+
+def eviction_report_data(*, timestamp: str, cache_file_sizes: dict[str, int],
+                         evicted: dict[str, str]) -> dict[str, Any]:
+    '''
+    Summary of a planned eviction, for eviction reports.
+    '''
+    return {
+        'timestamp': timestamp,
+        'totalfiles': len(cache_file_sizes),
+        'totalbytes': sum(cache_file_sizes.values()),
+        'evictedfiles': len(evicted),
+        'evictedbytes': sum(cache_file_sizes.get(k, 0) for k in evicted),
+        'evicted': [
+            {'file': k, 'reason': v, 'bytes': cache_file_sizes.get(k, 0)} for k, v in sorted(evicted.items())
+        ],
+    }
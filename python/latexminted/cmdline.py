@@ -22,11 +22,12 @@ from typing import Callable
 
 
 class ArgParser(argparse.ArgumentParser):
-    def __init__(self, *, prog: str, **kwargs):
+    def __init__(self, *, prog: str, standalone: bool = False, **kwargs):
         kwargs.setdefault('allow_abbrev', False)
         kwargs.setdefault('formatter_class', argparse.RawTextHelpFormatter)
         super().__init__(prog=prog, **kwargs)
         self._prog = prog
+        self._standalone = standalone
         self._command_subparsers = None
         self._command_help_dict = None
 
@@ -42,7 +43,27 @@ class ArgParser(argparse.ArgumentParser):
         parser.add_argument('--debug', help='Keep temp files for debugging', action='store_true')
         parser.add_argument('md5', help=r'MD5 hash based on \jobname')
 
+    def add_standalone_command(self, name: str, *, help: str,
+                               func: Callable[..., None]) -> argparse.ArgumentParser:
+        '''
+        Add a command that is designed to run outside LaTeX.  Unlike commands
+        that are launched from LaTeX, this does not have `md5`, `--timestamp`,
+        and `--debug` arguments.  The command's parser is returned so that
+        arguments can be added.
+        '''
+        if self._command_subparsers is None:
+            self._command_subparsers = self.add_subparsers(dest='subparser_name')
+        if self._command_help_dict is None:
+            self._command_help_dict = {}
+        self._command_help_dict[name] = help
+        parser = self._command_subparsers.add_parser(name, help=help, standalone=True)
+        parser.set_defaults(func=func, standalone=True)
+        return parser
+
     def print_help(self):
+        if self._standalone:
+            super().print_help()
+            return
         term_columns = shutil.get_terminal_size()[0]
         help_lines = []
         if self._command_help_dict:
@@ -73,6 +94,8 @@ class ArgParser(argparse.ArgumentParser):
             '  --debug     Keep temp files for debugging',
             '  -h, --help  Show this help message and exit',
             "  --version   Show program's version number and exit\n" if self._command_help_dict else '',
+            'Commands that run outside LaTeX take other arguments; see COMMAND --help.\n'
+            if self._command_help_dict else '',
             'Repository: https://github.com/gpoore/minted',
             'CTAN: https://ctan.org/pkg/minted',
             'PyPI: https://pypi.org/project/latexminted',
@@ -82,7 +105,22 @@ class ArgParser(argparse.ArgumentParser):
 
 
 
-def main():
+def positive_int(value: str) -> int:
+    try:
+        n = int(value)
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise argparse.ArgumentTypeError(f'"{value}" is not a positive integer')
+    return n
+
+
+
+
+def main(argv: list[str] | None = None):
+    '''
+    Command-line interface.  `argv` defaults to `sys.argv[1:]`.
+    '''
     parser = ArgParser(
         prog='latexminted',
     )
@@ -143,7 +181,23 @@ def main():
         from .command_styledef import styledef
         styledef(**kwargs)
 
-    parser.add_command('batch', help='Batch process highlight, styledef, and clean', func=batch)
+    def cache(**kwargs):
+        from .command_cache import cache_cmdline
+        cache_cmdline(**kwargs)
+
+    def gc(**kwargs):
+        from .command_gc import gc_cmdline
+        gc_cmdline(**kwargs)
+
+    def prebuild(**kwargs):
+        from .command_prebuild import prebuild_cmdline
+        prebuild_cmdline(**kwargs)
+
+    def replay(**kwargs):
+        from .command_replay import replay_cmdline
+        replay_cmdline(**kwargs)
+
+    parser.add_command('batch', help='Batch process config, highlight, styledef, and clean', func=batch)
     parser.add_command('clean', help='Clean up temp files and unused cache files', func=clean)
     parser.add_command('cleanconfig', help='Clean up config temp file', func=clean_config)
     parser.add_command('cleantemp', help='Clean up temp files', func=clean_temp)
@@ -153,7 +207,115 @@ def main():
         'styledef', help='Generate highlighting style definition and save it to file', func=styledef
     )
 
-    cmdline_args = parser.parse_args()
+    def add_gc_arguments(gc_parser: argparse.ArgumentParser):
+        gc_parser.add_argument('--dry-run', help='Report files that would be deleted without deleting them',
+                               action='store_true')
+        gc_parser.add_argument('--grace-seconds', help='Never delete files modified more recently (default 3600)',
+                               type=int, default=3600)
+        add_lease_seconds_argument(gc_parser)
+        add_max_age_days_argument(gc_parser)
+        gc_parser.add_argument('--max-bytes', help='Maximum total size of the cache in bytes', type=positive_int)
+        gc_parser.add_argument('--max-files', help='Maximum number of files in the cache', type=positive_int)
+        gc_parser.add_argument('--report', help='Save eviction report (JSON) to file')
+        add_timestamp_argument(gc_parser)
+        add_cache_dir_argument(gc_parser)
+
+    def add_cache_dir_argument(parser: argparse.ArgumentParser):
+        parser.add_argument('cache_dir', metavar='CACHEDIR', help='minted cache directory')
+
+    def add_json_argument(parser: argparse.ArgumentParser):
+        parser.add_argument('--json', help='Output JSON', action='store_true')
+
+    def add_lease_seconds_argument(parser: argparse.ArgumentParser):
+        parser.add_argument('--lease-seconds', help='Ignore leases older than this (default 3600)',
+                            type=positive_int, default=3600)
+
+    def add_max_age_days_argument(parser: argparse.ArgumentParser):
+        parser.add_argument('--max-age-days', help='Evict indexes unused for more days (default 30)',
+                            type=positive_int, default=30)
+
+    def add_timestamp_argument(parser: argparse.ArgumentParser):
+        parser.add_argument('--timestamp', help='Timestamp for index ages (YYYYMMDDHHMMSS, default now)')
+
+    gc_parser = parser.add_standalone_command(
+        'gc', help='Delete unused and expired cache files outside LaTeX', func=gc
+    )
+    add_gc_arguments(gc_parser)
+
+    cache_parser = parser.add_standalone_command(
+        'cache', help='Inspect and maintain a cache directory outside LaTeX', func=cache
+    )
+    cache_subparsers = cache_parser.add_subparsers(dest='cache_command', metavar='CACHE_COMMAND', required=True)
+    cache_stats_parser = cache_subparsers.add_parser(
+        'stats', help='Report size, orphaned files, stale indexes, duplicates, and per-job footprint',
+        standalone=True
+    )
+    add_json_argument(cache_stats_parser)
+    add_lease_seconds_argument(cache_stats_parser)
+    add_max_age_days_argument(cache_stats_parser)
+    add_timestamp_argument(cache_stats_parser)
+    add_cache_dir_argument(cache_stats_parser)
+    cache_verify_parser = cache_subparsers.add_parser(
+        'verify', help='Check for invalid indexes, missing files, and corrupt files', standalone=True
+    )
+    add_json_argument(cache_verify_parser)
+    add_cache_dir_argument(cache_verify_parser)
+    cache_orphans_parser = cache_subparsers.add_parser(
+        'orphans', help='List files that are not used by any index', standalone=True
+    )
+    add_json_argument(cache_orphans_parser)
+    add_lease_seconds_argument(cache_orphans_parser)
+    add_cache_dir_argument(cache_orphans_parser)
+    cache_gc_parser = cache_subparsers.add_parser(
+        'gc', help='Delete unused and expired cache files (same as "latexminted gc")', standalone=True
+    )
+    add_gc_arguments(cache_gc_parser)
+    cache_export_parser = cache_subparsers.add_parser(
+        'export', help='Save indexes and the files they use to an archive (.tar, .tar.gz)', standalone=True
+    )
+    add_json_argument(cache_export_parser)
+    add_max_age_days_argument(cache_export_parser)
+    add_timestamp_argument(cache_export_parser)
+    cache_export_parser.add_argument('archive', metavar='ARCHIVE', help='Archive file to create')
+    add_cache_dir_argument(cache_export_parser)
+    cache_import_parser = cache_subparsers.add_parser(
+        'import', help='Verify an archive and extract files that do not exist yet', standalone=True
+    )
+    add_json_argument(cache_import_parser)
+    cache_import_parser.add_argument('archive', metavar='ARCHIVE', help='Archive file created by "cache export"')
+    add_cache_dir_argument(cache_import_parser)
+
+    prebuild_parser = parser.add_standalone_command(
+        'prebuild', help='Fill the cache from saved data files before running LaTeX', func=prebuild
+    )
+    prebuild_parser.add_argument('--index', help='Only create cache files listed in this index file')
+    prebuild_parser.add_argument('--jobs', help='Number of parallel processes (default CPU count)',
+                                 type=positive_int)
+    prebuild_parser.add_argument('data_paths', metavar='DATA', nargs='+',
+                                 help='Data file (*.data.minted) or directory of data files')
+
+    replay_parser = parser.add_standalone_command(
+        'replay', help='Replay saved data files in a sandbox for profiling and benchmarking', func=replay
+    )
+    add_json_argument(replay_parser)
+    replay_parser.add_argument('--profile', metavar='FILE', help='Save cProfile stats for all runs to file')
+    replay_parser.add_argument('--repeat', help='Number of times to replay all data files (default 1)',
+                               type=positive_int, default=1)
+    replay_parser.add_argument('--sandbox', metavar='DIR', help='Use and keep this sandbox directory (must be empty)')
+    replay_parser.add_argument('--tracemalloc', help='Trace memory allocations with tracemalloc', action='store_true')
+    replay_parser.add_argument('--tracemalloc-frames', help='Frames per traceback with --tracemalloc (default 1)',
+                               type=positive_int, default=1)
+    replay_parser.add_argument('data_paths', metavar='DATA', nargs='+',
+                               help='Data file (*.data.minted) or directory of data files')
+
+    cmdline_args = parser.parse_args(argv)
+
+    if getattr(cmdline_args, 'standalone', False):
+        standalone_args = {
+            k: v for k, v in vars(cmdline_args).items() if k not in ('func', 'standalone', 'subparser_name')
+        }
+        cmdline_args.func(**standalone_args)
+        sys.exit()
 
     func_keys = set(['md5', 'timestamp', 'debug'])
     func_args = {k: v for k, v in vars(cmdline_args).items() if k in func_keys}
@@ -232,6 +394,11 @@ def main():
     cmdline_args.func(**func_args)
     if debug:
         debug_mv_data(md5=md5, data_path=data_path)
+    if latexminted_config.stats.enable:
+        from .stats import save_job_stats, update_prometheus_textfile
+        save_job_stats(md5=md5, timestamp=timestamp)
+        if latexminted_config.stats.prometheus_textfile:
+            update_prometheus_textfile(latexminted_config.stats.prometheus_textfile)
     messages.communicate()
     if messages.has_errors():
         sys.exit(1)
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 #
-# Copyright (c) 2024, Geoffrey M. Poore
+# Copyright (c) 2024-2026, Geoffrey M. Poore
 # All rights reserved.
 #
 # Licensed under the LaTeX Project Public License version 1.3c:
@@ -10,25 +10,271 @@
 
 from __future__ import annotations
 
-from typing import Any
+import hashlib
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+from .cache import acquire_lease, is_hash_cache_file_name
 from .command_styledef import styledef
-from .command_highlight import highlight
-from .command_clean import clean
+from .command_highlight import highlight, load_input_file, write_highlighted
+from .command_clean import clean, clean_temp_except_errlog
+from .command_config import batch_config
 from .messages import Messages
+from .restricted import MintedTempRestrictedPath
+from .stats import stats
+
+
+
+
+class BatchPipeline(object):
+    '''
+    Overlap file I/O with highlighting in batch mode.  Input files for
+    upcoming snippets are read in a thread pool, and highlighted code is
+    written by a background thread while later snippets are highlighted.
+    Both are bounded, so that only a limited amount of code and highlighted
+    code is held in memory.
+
+    Prefetching is limited to plain reads of input files with relative paths
+    that security settings permit reading, checked in the main thread.  Any
+    file that can't be read as is, doesn't have the expected MD5 hash, or
+    can't be decoded is loaded again with `load_input_file()` in the main
+    thread, which looks for it with kpsewhich and reports errors.  kpsewhich
+    and `latex_config` are never used from other threads.
+
+    Messages from other threads are collected separately and added to the
+    main messages in the same order as when everything runs sequentially.
+    Writing is speculative:  `highlight()` assumes that writing will succeed.
+    If a write fails, `failed_write()` returns the index of the snippet, and
+    the batch must roll back and highlight all subsequent snippets again
+    without background writing, since errors affect how later snippets are
+    processed.
+    '''
+    prefetch_lookahead: int = 8
+    prefetch_workers: int = 4
+    max_pending_writes: int = 8
+
+    def __init__(self, *, md5: str, data: list[dict[str, Any]]):
+        self._md5 = md5
+        self._data = data
+        self._prefetch_executor: ThreadPoolExecutor | None = None
+        self._prefetched: dict[int, Future] = {}
+        self._next_prefetch_index: int = 0
+        self._write_queue: queue.Queue = queue.Queue(maxsize=self.max_pending_writes)
+        self._writer_thread: threading.Thread | None = None
+        self._write_results: list[tuple[int, bool, Messages]] = []
+        self._write_results_lock = threading.Lock()
+        self._failed_write_index: int | None = None
+        self.background_writes: bool = True
+
+    @staticmethod
+    def _read_input(input_file_path: MintedTempRestrictedPath, mdfivesum: str) -> bytes | None:
+        try:
+            input_file_bytes = input_file_path.read_bytes()
+        except Exception:
+            return None
+        hasher = hashlib.md5()
+        hasher.update(input_file_bytes)
+        if hasher.hexdigest() != mdfivesum:
+            return None
+        return input_file_bytes
+
+    def prefetch(self, index: int):
+        '''
+        Start reading input files for snippets up to `prefetch_lookahead`
+        after `index`.
+        '''
+        stop_index = min(index + self.prefetch_lookahead, len(self._data))
+        while self._next_prefetch_index < stop_index:
+            d = self._data[self._next_prefetch_index]
+            if (d['command'] == 'highlight' and 'code' not in d and 'inputfilepath' in d and
+                    'inputfilemdfivesum' in d):
+                input_file_path = MintedTempRestrictedPath(d['inputfilepath'])
+                if not input_file_path.is_absolute() and input_file_path.readable_file()[0]:
+                    if self._prefetch_executor is None:
+                        self._prefetch_executor = ThreadPoolExecutor(max_workers=self.prefetch_workers)
+                    self._prefetched[self._next_prefetch_index] = self._prefetch_executor.submit(
+                        self._read_input, input_file_path, d['inputfilemdfivesum'].lower()
+                    )
+            self._next_prefetch_index += 1
+
+    def input_loader(self, index: int) -> Callable[..., str | None]:
+        def load(*, messages: Messages, input_file: str, mdfivesum: str, encoding: str) -> str | None:
+            future = self._prefetched.pop(index, None)
+            d = self._data[index]
+            if future is not None and input_file == d['inputfilepath'] and mdfivesum == d['inputfilemdfivesum'].lower():
+                input_file_bytes = future.result()
+                if input_file_bytes is not None:
+                    try:
+                        return input_file_bytes.decode(encoding=encoding)
+                    except UnicodeDecodeError:
+                        pass
+            return load_input_file(messages=messages, input_file=input_file, mdfivesum=mdfivesum, encoding=encoding)
+        return load
+
+    def _write_loop(self):
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                break
+            index, data, highlighted_path, highlighted = item
+            if self._failed_write_index is not None:
+                # Writes after a failed write are discarded, since the
+                # snippets will be highlighted again
+                continue
+            messages = Messages(md5=self._md5)
+            messages.set_context(data)
+            try:
+                is_written = write_highlighted(messages=messages, name=data['highlightfilename'],
+                                               highlighted_path=highlighted_path, highlighted=highlighted)
+            except Exception as e:
+                messages.append_error(
+                    rf'Failed due to unexpected error (see \detokenize{{"{messages.errlog_file_name}"}} if it exists)'
+                )
+                messages.append_errlog(e)
+                is_written = False
+            with self._write_results_lock:
+                self._write_results.append((index, is_written, messages))
+                if not is_written:
+                    self._failed_write_index = index
+
+    def output_writer(self, index: int) -> Callable[[MintedTempRestrictedPath, str], None] | None:
+        if not self.background_writes:
+            return None
+        def write(highlighted_path: MintedTempRestrictedPath, highlighted: str):
+            if self._writer_thread is None:
+                self._writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+                self._writer_thread.start()
+            self._write_queue.put((index, self._data[index], highlighted_path, highlighted))
+        return write
+
+    def failed_write(self) -> int | None:
+        with self._write_results_lock:
+            return self._failed_write_index
+
+    def finish_writes(self) -> tuple[list[tuple[int, bool, Messages]], int | None]:
+        '''
+        Wait for all pending writes.  Return results for all writes since the
+        last call, in order, and the index of the snippet with a failed write
+        (if any).
+        '''
+        if self._writer_thread is not None:
+            self._write_queue.put(None)
+            self._writer_thread.join()
+            self._writer_thread = None
+        with self._write_results_lock:
+            write_results = self._write_results
+            failed_write_index = self._failed_write_index
+            self._write_results = []
+            self._failed_write_index = None
+        return (write_results, failed_write_index)
+
+    def close(self):
+        if self._writer_thread is not None:
+            self._write_queue.put(None)
+            self._writer_thread.join()
+            self._writer_thread = None
+        if self._prefetch_executor is not None:
+            self._prefetch_executor.shutdown(wait=True)
+            self._prefetch_executor = None
 
 
 
 
 def batch(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: list[dict[str, Any]]):
-    new_cache_file_names: list[str] = []
+    # Lease all cache files in the batch at once, rather than separately for
+    # each command
+    leased_cache_file_names: list[str] = []
     for d in data:
+        if d['command'] == 'styledef':
+            leased_cache_file_names.append(d['styledeffilename'])
+        elif d['command'] == 'highlight' and is_hash_cache_file_name(d['highlightfilename']):
+            leased_cache_file_names.append(d['highlightfilename'])
+    if leased_cache_file_names:
+        acquire_lease(MintedTempRestrictedPath(data[0]['cachepath']), md5=md5,
+                      cache_file_names=leased_cache_file_names)
+
+    new_cache_file_names: list[str] = []
+    pipeline = BatchPipeline(md5=md5, data=data)
+    try:
+        _batch_highlight(md5=md5, timestamp=timestamp, debug=debug, messages=messages, data=data,
+                         new_cache_file_names=new_cache_file_names, pipeline=pipeline)
+    finally:
+        pipeline.close()
+
+    if data and data[-1]['command'] == 'config':
+        # With only a config step, there are no cache files to index
+        clean_temp_except_errlog(md5=md5, debug=debug)
+    elif data and data[-1]['command'] != 'clean':
+        messages.set_context()
+        # Batch mode is a special case for clean.  When a document without an
+        # existing cache is first compiled, an explicit clean command is not
+        # written to the data file because there are no cache files in use
+        # since they don't yet exist.  However, at the end of the batch, these
+        # files do exist, so clean should be invoked to create an index.
+        clean_data = {
+            'jobname': data[-1]['jobname'],
+            'cachepath': data[-1]['cachepath'],
+            'cachefiles': [],
+        }
+        if any(d['command'] == 'config' and d.get('cacheconfig') == 'true' for d in data):
+            clean_data['cacheconfig'] = 'true'
+        clean(md5=md5, timestamp=timestamp, debug=debug, messages=messages,
+              data=clean_data, additional_cache_file_names=new_cache_file_names)
+
+
+def _batch_highlight(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: list[dict[str, Any]],
+                     new_cache_file_names: list[str], pipeline: BatchPipeline):
+    # State before each command, for rolling back after a failed background
+    # write.  Stats for background writes are only counted once writes are
+    # finished, so they are never part of a checkpoint.
+    checkpoints: dict[int, tuple[tuple[int, int, int], Any, int]] = {}
+
+    def finish_writes() -> int | None:
+        # Wait for pending writes.  If a write failed, roll back to the end of
+        # the snippet with the failed write, add its error, and return the
+        # index of the next command, so that processing can resume there
+        # without background writes.
+        write_results, failed_write_index = pipeline.finish_writes()
+        if failed_write_index is not None:
+            messages_checkpoint, stats_checkpoint, len_new_cache_file_names = checkpoints[failed_write_index + 1]
+            messages.rollback(messages_checkpoint)
+            stats.restore(stats_checkpoint)
+            # The last file name before the checkpoint is from the snippet
+            # with the failed write
+            del new_cache_file_names[len_new_cache_file_names-1:]
+        stats.count('outputs_written', sum(1 for _, is_written, _ in write_results if is_written))
+        if failed_write_index is None:
+            return None
+        for index, is_written, write_messages in write_results:
+            if index == failed_write_index:
+                messages.extend(write_messages)
+        pipeline.background_writes = False
+        return failed_write_index + 1
+
+    n = 0
+    while n <= len(data):
+        checkpoints[n] = (messages.checkpoint(), stats.snapshot(), len(new_cache_file_names))
+        if n == len(data) or data[n]['command'] == 'clean' or pipeline.failed_write() is not None:
+            resume_index = finish_writes()
+            if resume_index is not None:
+                n = resume_index
+                continue
+            if n == len(data):
+                break
+        d = data[n]
         command = d['command']
-        if command == 'styledef':
-            f = styledef(md5=md5, timestamp=timestamp, debug=debug, messages=messages, data=d)
+        if command == 'config':
+            messages.set_context()
+            batch_config(md5=md5, timestamp=timestamp, debug=debug, messages=messages, data=d)
+        elif command == 'styledef':
+            f = styledef(md5=md5, timestamp=timestamp, debug=debug, messages=messages, data=d, lease=False)
             if f is not None:
                 new_cache_file_names.append(f)
         elif command == 'highlight':
-            f = highlight(md5=md5, timestamp=timestamp, debug=debug, messages=messages, data=d)
+            pipeline.prefetch(n)
+            f = highlight(md5=md5, timestamp=timestamp, debug=debug, messages=messages, data=d, lease=False,
+                          input_loader=pipeline.input_loader(n), output_writer=pipeline.output_writer(n))
             if f is not None:
                 new_cache_file_names.append(f)
         elif command == 'clean':
@@ -40,18 +286,4 @@ def batch(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: li
                   data=d, additional_cache_file_names=new_cache_file_names)
         else:
             raise ValueError
-
-    if data and data[-1]['command'] != 'clean':
-        messages.set_context()
-        # Batch mode is a special case for clean.  When a document without an
-        # existing cache is first compiled, an explicit clean command is not
-        # written to the data file because there are no cache files in use
-        # since they don't yet exist.  However, at the end of the batch, these
-        # files do exist, so clean should be invoked to create an index.
-        clean_data = {
-            'jobname': data[-1]['jobname'],
-            'cachepath': data[-1]['cachepath'],
-            'cachefiles': [],
-        }
-        clean(md5=md5, timestamp=timestamp, debug=debug, messages=messages,
-              data=clean_data, additional_cache_file_names=new_cache_file_names)
+        n += 1
@@ -0,0 +1,678 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import re
+import sys
+import tarfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from json import loads as json_loads
+from json import dumps as json_dumps
+from pathlib import Path
+from typing import Any
+from pygments import __version__ as pygments_version
+from .cache import (
+    cache_lock, cache_lock_file_name, checkpoint_highlight_file_names, digest_trailer_status, gc_log_file_name,
+    hash_cache_file_name_re, is_hash_cache_file_name, is_sharded_cache_file_name, read_active_leases,
+    timestamp_to_date
+)
+from .command_gc import gc_cmdline
+from .err import CacheArchiveError
+from .version import __version__
+
+
+
+
+# `latexminted cache` commands for inspecting a cache directory outside of
+# LaTeX.  Like `latexminted gc`, these do not depend on LaTeX security
+# settings, and only `cache gc` and `cache import` ever modify the cache.
+#
+# Caches shared by many documents can contain tens of thousands of files, so
+# the directory is listed with `os.scandir()` (one call per directory), and
+# `stat()` calls and index reads are performed in a thread pool.
+
+_shard_dir_chars = frozenset('0123456789abcdef')
+
+def _is_shard_dir_name(name: str) -> bool:
+    return len(name) == 2 and all(c in _shard_dir_chars for c in name)
+
+
+def _scandir_minted_files(dir_path: str, prefix: str) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    '''
+    List `*.minted` files and shard subdirectories within a directory.
+    Return lists of (name relative to cache directory, path) tuples.
+    '''
+    files: list[tuple[str, str]] = []
+    subdirs: list[tuple[str, str]] = []
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.name.endswith('.minted') and entry.is_file():
+                    files.append((f'{prefix}{entry.name}', entry.path))
+                elif _is_shard_dir_name(entry.name) and entry.is_dir():
+                    subdirs.append((f'{prefix}{entry.name}/', entry.path))
+    except FileNotFoundError:
+        pass
+    return files, subdirs
+
+
+def _stat(path: str) -> os.stat_result | None:
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def _read_index(path: str) -> dict[str, Any] | str:
+    try:
+        index_bytes = Path(path).read_bytes()
+    except Exception as e:
+        return str(e)
+    return _parse_index(index_bytes)
+
+
+def _parse_index(index_bytes: bytes) -> dict[str, Any] | str:
+    try:
+        index_data = json_loads(index_bytes)
+    except Exception as e:
+        return str(e)
+    if (not isinstance(index_data, dict) or not isinstance(index_data.get('cachefiles'), list) or
+            not isinstance(index_data.get('timestamp'), str)):
+        return 'missing or invalid "cachefiles" or "timestamp"'
+    return index_data
+
+
+def _sha256_file(path: str) -> str | None:
+    hasher = hashlib.sha256()
+    try:
+        hasher.update(Path(path).read_bytes())
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+class CacheScan(object):
+    '''
+    Snapshot of a cache directory:  all `*.minted` files with sizes and
+    modification times, plus all index files and the reference graph from
+    cache files to the indexes that list them.  Each index is read once.
+    '''
+    def __init__(self, cache_dir: str, *, executor: ThreadPoolExecutor):
+        self.cache_dir: str = cache_dir
+        self.file_paths: dict[str, str] = {}
+        self.file_sizes: dict[str, int] = {}
+        self.file_mtimes: dict[str, float] = {}
+        self.misplaced_files: list[str] = []
+        self.indexes: dict[str, dict[str, Any]] = {}
+        self.invalid_indexes: dict[str, str] = {}
+        self.references: dict[str, set[str]] = defaultdict(set)
+        self.missing_files: dict[str, list[str]] = {}
+
+        files, shard_dirs = _scandir_minted_files(cache_dir, '')
+        shard_subdirs: list[tuple[str, str]] = []
+        for shard_files, shard_subdirs_i in executor.map(lambda x: _scandir_minted_files(x[1], x[0]), shard_dirs):
+            files.extend(shard_files)
+            shard_subdirs.extend(shard_subdirs_i)
+        for shard_files, _ in executor.map(lambda x: _scandir_minted_files(x[1], x[0]), shard_subdirs):
+            files.extend(shard_files)
+        files = [(name, path) for name, path in files if name not in (cache_lock_file_name, gc_log_file_name)]
+        for (name, path), stat in zip(files, executor.map(_stat, (path for _, path in files))):
+            if stat is None:
+                continue
+            self.file_paths[name] = path
+            self.file_sizes[name] = stat.st_size
+            self.file_mtimes[name] = stat.st_mtime
+            if '/' in name and not is_hash_cache_file_name(name):
+                self.misplaced_files.append(name)
+
+        index_names = [name for name in self.file_paths if name.endswith('.index.minted')]
+        for name, index_data in zip(index_names, executor.map(_read_index, (self.file_paths[n] for n in index_names))):
+            if isinstance(index_data, str):
+                self.invalid_indexes[name] = index_data
+                continue
+            self.indexes[name] = index_data
+            missing: list[str] = []
+            for cache_file_name in set(index_data['cachefiles']) | {name}:
+                self.references[cache_file_name].add(name)
+                if cache_file_name not in self.file_sizes:
+                    missing.append(cache_file_name)
+            if missing:
+                self.missing_files[name] = sorted(missing)
+
+    def orphans(self, *, lease_seconds: int) -> list[str]:
+        '''
+        Files that are not listed in any index and are not leased by a
+        compile in progress.  These are deleted by the next cleaning.
+        '''
+        leased = read_active_leases(Path(self.cache_dir), lease_seconds=lease_seconds)
+        orphans: list[str] = []
+        for name in self.file_sizes:
+            if name in self.references or name in leased:
+                continue
+            highlight_file_names = checkpoint_highlight_file_names(name)
+            if highlight_file_names is not None and any(
+                    n in self.references or n in leased for n in highlight_file_names):
+                # Checkpoint files are in use while their highlight files are
+                continue
+            orphans.append(name)
+        return sorted(orphans)
+
+    def stale_indexes(self, *, timestamp: str, max_age_days: int) -> list[str]:
+        timestamp_date = timestamp_to_date(timestamp)
+        return sorted(
+            name for name, index_data in self.indexes.items()
+            if timestamp_date - timestamp_to_date(index_data['timestamp']) > timedelta(days=max_age_days)
+        )
+
+    def duplicates(self, *, executor: ThreadPoolExecutor) -> list[list[str]]:
+        '''
+        Groups of highlight files with identical contents.  Only files with
+        identical sizes are hashed.
+        '''
+        names_by_size: dict[int, list[str]] = defaultdict(list)
+        for name, size in self.file_sizes.items():
+            if hash_cache_file_name_re.fullmatch(name):
+                names_by_size[size].append(name)
+        candidates = [name for names in names_by_size.values() if len(names) > 1 for name in names]
+        names_by_digest: dict[str, list[str]] = defaultdict(list)
+        for name, digest in zip(candidates, executor.map(_sha256_file, (self.file_paths[n] for n in candidates))):
+            if digest is not None:
+                names_by_digest[digest].append(name)
+        return sorted(sorted(names) for names in names_by_digest.values() if len(names) > 1)
+
+    def job_footprints(self) -> list[dict[str, Any]]:
+        '''
+        Files and bytes used by each index.  Exclusive bytes are only used by
+        that index, so they would be freed if it were evicted.
+        '''
+        footprints: list[dict[str, Any]] = []
+        for name, index_data in sorted(self.indexes.items()):
+            cache_file_names = [n for n in set(index_data['cachefiles']) | {name} if n in self.file_sizes]
+            footprints.append({
+                'index': name,
+                'jobname': index_data.get('jobname'),
+                'timestamp': index_data['timestamp'],
+                'files': len(cache_file_names),
+                'bytes': sum(self.file_sizes[n] for n in cache_file_names),
+                'exclusivebytes': sum(self.file_sizes[n] for n in cache_file_names if len(self.references[n]) == 1),
+            })
+        return footprints
+
+
+
+
+def _format_bytes(n: int) -> str:
+    size = float(n)
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if size < 1000 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1000
+    raise ValueError
+
+
+def _file_kind(name: str) -> str:
+    return name.rsplit('.', 2)[-2] if name.count('.') >= 2 else 'other'
+
+
+def cache_stats(scan: CacheScan, *, executor: ThreadPoolExecutor, timestamp: str, max_age_days: int,
+                lease_seconds: int) -> dict[str, Any]:
+    files_by_kind: dict[str, int] = defaultdict(int)
+    bytes_by_kind: dict[str, int] = defaultdict(int)
+    for name, size in scan.file_sizes.items():
+        files_by_kind[_file_kind(name)] += 1
+        bytes_by_kind[_file_kind(name)] += size
+    orphans = scan.orphans(lease_seconds=lease_seconds)
+    duplicates = scan.duplicates(executor=executor)
+    return {
+        'cachedir': scan.cache_dir,
+        'totalfiles': len(scan.file_sizes),
+        'totalbytes': sum(scan.file_sizes.values()),
+        'kinds': {k: {'files': files_by_kind[k], 'bytes': bytes_by_kind[k]} for k in sorted(files_by_kind)},
+        'indexes': len(scan.indexes),
+        'invalidindexes': sorted(scan.invalid_indexes),
+        'staleindexes': scan.stale_indexes(timestamp=timestamp, max_age_days=max_age_days),
+        'orphanfiles': len(orphans),
+        'orphanbytes': sum(scan.file_sizes[n] for n in orphans),
+        'duplicategroups': duplicates,
+        'duplicatebytes': sum(scan.file_sizes[g[0]] * (len(g) - 1) for g in duplicates),
+        'jobs': scan.job_footprints(),
+    }
+
+
+def cache_verify(scan: CacheScan, *, executor: ThreadPoolExecutor) -> dict[str, Any]:
+    '''
+    Check the cache for problems:  invalid indexes, files listed in indexes
+    that do not exist, files in the wrong shard subdirectories, and highlight
+    files with digest trailers that do not match their contents (usually
+    from an interrupted write).
+    '''
+    highlight_names = [name for name in scan.file_sizes if hash_cache_file_name_re.fullmatch(name)]
+
+    def check_digest(name: str) -> bool:
+        try:
+            return digest_trailer_status(Path(scan.file_paths[name]).read_bytes()) is not False
+        except OSError:
+            return True
+
+    corrupt = [name for name, ok in zip(highlight_names, executor.map(check_digest, highlight_names)) if not ok]
+    return {
+        'cachedir': scan.cache_dir,
+        'invalidindexes': dict(sorted(scan.invalid_indexes.items())),
+        'missingfiles': scan.missing_files,
+        'misplacedfiles': sorted(scan.misplaced_files),
+        'corruptfiles': sorted(corrupt),
+    }
+
+
+
+
+# Cache archives for `latexminted cache export` and `latexminted cache
+# import`, for saving a cache directory as a single file (for example, a CI
+# artifact) and restoring it.  An archive is a tar file (gzip-compressed if
+# the name ends with `.gz` or `.tgz`).  The first member is `manifest.json`,
+# which records the archive format, the latexminted and Pygments versions
+# that created the cache, and the SHA-256 digest and size of every other
+# member, so that an archive can be verified and extracted with a single
+# sequential read.
+#
+# Only indexes that are not expired and the files they list are exported.
+# Indexes are exported with missing files removed from their lists, so that
+# restored indexes never refer to files that no longer exist.  Highlight
+# files with digest trailers that do not match their contents are skipped.
+#
+# Import never overwrites existing files.  Cache files other than indexes
+# depend on the versions that created them, so they are only imported when
+# the Pygments version is identical and the latexminted version has the same
+# major and minor version.  Indexes are imported with their lists limited to
+# files that exist after import, and are dropped if none do.  Files are
+# written under temporary names and then renamed while holding the cache
+# lock, so that an interrupted import never leaves incomplete files.
+
+archive_format_version = 1
+archive_manifest_name = 'manifest.json'
+
+_archive_flat_file_name_re = re.compile(r'[0-9A-Za-z_][0-9A-Za-z_.@+-]*\.minted')
+
+
+def _is_archive_file_name(name: str) -> bool:
+    if name in (cache_lock_file_name, gc_log_file_name) or name.endswith('.lease.minted'):
+        return False
+    return bool(_archive_flat_file_name_re.fullmatch(name)) or is_sharded_cache_file_name(name)
+
+
+def _is_index_file_name(name: str) -> bool:
+    return '/' not in name and name.endswith('.index.minted')
+
+
+def _is_compatible_archive(manifest: dict[str, Any]) -> bool:
+    return (manifest['pygments'] == pygments_version and
+            manifest['latexminted'].split('.')[:2] == __version__.split('.')[:2])
+
+
+def _archive_tarinfo(name: str, size: int, mtime: float) -> tarfile.TarInfo:
+    tarinfo = tarfile.TarInfo(name)
+    tarinfo.size = size
+    tarinfo.mtime = int(mtime)
+    tarinfo.mode = 0o644
+    return tarinfo
+
+
+def _archive_file_digest(name: str, path: str) -> str | None:
+    '''
+    SHA-256 digest of a cache file to export, or `None` if it can't be read
+    or has a digest trailer that does not match its contents.
+    '''
+    try:
+        file_bytes = Path(path).read_bytes()
+    except OSError:
+        return None
+    if hash_cache_file_name_re.fullmatch(name) and digest_trailer_status(file_bytes) is False:
+        return None
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def cache_export(scan: CacheScan, *, executor: ThreadPoolExecutor, archive: str, timestamp: str,
+                 max_age_days: int) -> dict[str, Any]:
+    '''
+    Save the files in use in a cache directory to an archive.  This should
+    be called while holding the cache lock.
+    '''
+    stale_indexes = set(scan.stale_indexes(timestamp=timestamp, max_age_days=max_age_days))
+    live_indexes = {name: data for name, data in scan.indexes.items() if name not in stale_indexes}
+    cache_file_names: set[str] = set()
+    for index_data in live_indexes.values():
+        cache_file_names.update(n for n in index_data['cachefiles'] if n in scan.file_sizes)
+    for name in scan.file_sizes:
+        highlight_file_names = checkpoint_highlight_file_names(name)
+        if highlight_file_names is not None and any(n in cache_file_names for n in highlight_file_names):
+            cache_file_names.add(name)
+    cache_file_names -= live_indexes.keys()
+    sorted_cache_file_names = sorted(cache_file_names)
+
+    manifest_files: dict[str, dict[str, Any]] = {}
+    skipped_files: list[str] = []
+    digests = executor.map(lambda n: _archive_file_digest(n, scan.file_paths[n]), sorted_cache_file_names)
+    for name, digest in zip(sorted_cache_file_names, digests):
+        if digest is None:
+            skipped_files.append(name)
+        else:
+            manifest_files[name] = {'sha256': digest, 'bytes': scan.file_sizes[name]}
+    index_bytes: dict[str, bytes] = {}
+    for name, index_data in sorted(live_indexes.items()):
+        index_data = dict(index_data)
+        index_data['cachefiles'] = sorted(n for n in set(index_data['cachefiles']) if n in manifest_files)
+        index_bytes[name] = json_dumps(index_data, indent=2).encode('utf8')
+        manifest_files[name] = {
+            'sha256': hashlib.sha256(index_bytes[name]).hexdigest(), 'bytes': len(index_bytes[name])
+        }
+    manifest = {
+        'format': archive_format_version,
+        'timestamp': timestamp,
+        'latexminted': __version__,
+        'pygments': pygments_version,
+        'files': manifest_files,
+    }
+
+    archive_path = Path(archive)
+    temp_archive_path = archive_path.with_name(f'{archive_path.name}.tmp-{os.getpid()}')
+    mode = 'w:gz' if archive_path.name.endswith(('.gz', '.tgz')) else 'w'
+    try:
+        with tarfile.open(temp_archive_path, mode, format=tarfile.PAX_FORMAT) as tar:
+            manifest_bytes = json_dumps(manifest, indent=2).encode('utf8')
+            tar.addfile(_archive_tarinfo(archive_manifest_name, len(manifest_bytes), time.time()),
+                        io.BytesIO(manifest_bytes))
+            for name in sorted_cache_file_names:
+                if name not in manifest_files:
+                    continue
+                file_bytes = Path(scan.file_paths[name]).read_bytes()
+                if hashlib.sha256(file_bytes).hexdigest() != manifest_files[name]['sha256']:
+                    raise CacheArchiveError(f'cache file "{name}" was modified during export')
+                tar.addfile(_archive_tarinfo(name, len(file_bytes), scan.file_mtimes[name]), io.BytesIO(file_bytes))
+            for name, data in index_bytes.items():
+                tar.addfile(_archive_tarinfo(name, len(data), scan.file_mtimes[name]), io.BytesIO(data))
+        os.replace(temp_archive_path, archive_path)
+    except OSError as e:
+        temp_archive_path.unlink(missing_ok=True)
+        raise CacheArchiveError(f'failed to write archive "{archive}": {e}')
+    except CacheArchiveError:
+        temp_archive_path.unlink(missing_ok=True)
+        raise
+    return {
+        'archive': archive,
+        'cachedir': scan.cache_dir,
+        'latexminted': __version__,
+        'pygments': pygments_version,
+        'files': len(manifest_files),
+        'bytes': sum(x['bytes'] for x in manifest_files.values()),
+        'indexes': len(index_bytes),
+        'staleindexes': sorted(stale_indexes),
+        'skippedfiles': skipped_files,
+    }
+
+
+def _load_archive_manifest(tar: tarfile.TarFile) -> dict[str, Any]:
+    member = tar.next()
+    if member is None or member.name != archive_manifest_name or not member.isfile():
+        raise CacheArchiveError(f'archive does not start with "{archive_manifest_name}"')
+    try:
+        manifest = json_loads(tar.extractfile(member).read())
+    except Exception as e:
+        raise CacheArchiveError(f'invalid "{archive_manifest_name}": {e}')
+    if not isinstance(manifest, dict) or manifest.get('format') != archive_format_version:
+        raise CacheArchiveError(f'unsupported archive format (expected version {archive_format_version})')
+    if (not isinstance(manifest.get('latexminted'), str) or not isinstance(manifest.get('pygments'), str) or
+            not isinstance(manifest.get('files'), dict) or
+            not all(isinstance(v, dict) and isinstance(v.get('sha256'), str) and isinstance(v.get('bytes'), int)
+                    for v in manifest['files'].values())):
+        raise CacheArchiveError(f'invalid "{archive_manifest_name}"')
+    return manifest
+
+
+def _write_cache_file(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f'.{path.name}.tmp-{os.getpid()}')
+    try:
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+    except OSError:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def cache_import(*, archive: str, cache_dir: str) -> dict[str, Any]:
+    '''
+    Verify a cache archive and extract it into a cache directory.  Members
+    that are not in the manifest or that do not match it are rejected.
+    '''
+    cache_path = Path(cache_dir)
+    imported: dict[str, int] = {}
+    existing_files: list[str] = []
+    dropped_files: list[str] = []
+    rejected_files: dict[str, str] = {}
+    pending_indexes: dict[str, bytes] = {}
+    try:
+        tar = tarfile.open(archive, 'r|*')
+    except (OSError, tarfile.TarError) as e:
+        raise CacheArchiveError(f'failed to open archive "{archive}": {e}')
+    with tar, cache_lock(cache_path):
+        try:
+            manifest = _load_archive_manifest(tar)
+            manifest_files: dict[str, dict[str, Any]] = manifest['files']
+            is_compatible = _is_compatible_archive(manifest)
+            seen: set[str] = set()
+            # Iterating over the archive would yield the manifest again
+            while True:
+                member = tar.next()
+                if member is None:
+                    break
+                name = member.name
+                if not _is_archive_file_name(name) or not member.isfile():
+                    rejected_files[name] = 'invalid file name or type'
+                    continue
+                if name not in manifest_files or name in seen:
+                    rejected_files[name] = 'not in manifest or duplicate'
+                    continue
+                seen.add(name)
+                is_index = _is_index_file_name(name)
+                if not is_index and not is_compatible:
+                    dropped_files.append(name)
+                    continue
+                if (cache_path / name).exists():
+                    existing_files.append(name)
+                    continue
+                data = tar.extractfile(member).read()
+                if (len(data) != manifest_files[name]['bytes'] or
+                        hashlib.sha256(data).hexdigest() != manifest_files[name]['sha256']):
+                    rejected_files[name] = 'digest does not match manifest'
+                    continue
+                if is_index:
+                    pending_indexes[name] = data
+                    continue
+                try:
+                    _write_cache_file(cache_path / name, data)
+                except OSError as e:
+                    raise CacheArchiveError(f'failed to write cache file "{name}": {e}')
+                imported[name] = len(data)
+        except (OSError, tarfile.TarError) as e:
+            raise CacheArchiveError(f'failed to read archive "{archive}": {e}')
+        for name in manifest_files:
+            if name not in seen and name not in rejected_files:
+                rejected_files[name] = 'missing from archive'
+
+        for name, data in sorted(pending_indexes.items()):
+            index_data = _parse_index(data)
+            if isinstance(index_data, str):
+                rejected_files[name] = f'invalid index: {index_data}'
+                continue
+            index_data['cachefiles'] = sorted(
+                n for n in set(index_data['cachefiles'])
+                if isinstance(n, str) and (n in imported or _is_archive_file_name(n) and (cache_path / n).exists())
+            )
+            if not index_data['cachefiles']:
+                dropped_files.append(name)
+                continue
+            index_bytes = json_dumps(index_data, indent=2).encode('utf8')
+            try:
+                _write_cache_file(cache_path / name, index_bytes)
+            except OSError as e:
+                raise CacheArchiveError(f'failed to write index "{name}": {e}')
+            imported[name] = len(index_bytes)
+    return {
+        'archive': archive,
+        'cachedir': cache_dir,
+        'latexminted': manifest['latexminted'],
+        'pygments': manifest['pygments'],
+        'compatible': is_compatible,
+        'importedfiles': len(imported),
+        'importedbytes': sum(imported.values()),
+        'existingfiles': len(existing_files),
+        'droppedfiles': sorted(dropped_files),
+        'rejectedfiles': dict(sorted(rejected_files.items())),
+    }
+
+
+
+
+def _print_stats(stats_data: dict[str, Any]):
+    lines = [
+        f'Cache directory: {stats_data["cachedir"]}',
+        f'Files: {stats_data["totalfiles"]} ({_format_bytes(stats_data["totalbytes"])})',
+    ]
+    for kind, kind_data in stats_data['kinds'].items():
+        lines.append(f'  {kind}: {kind_data["files"]} ({_format_bytes(kind_data["bytes"])})')
+    lines.extend([
+        f'Indexes: {stats_data["indexes"]} ({len(stats_data["staleindexes"])} stale, '
+        f'{len(stats_data["invalidindexes"])} invalid)',
+        f'Orphaned files: {stats_data["orphanfiles"]} ({_format_bytes(stats_data["orphanbytes"])})',
+        f'Duplicate content: {len(stats_data["duplicategroups"])} groups '
+        f'({_format_bytes(stats_data["duplicatebytes"])} reclaimable)',
+    ])
+    if stats_data['jobs']:
+        lines.append('Jobs:')
+        for job in sorted(stats_data['jobs'], key=lambda x: -x['bytes']):
+            last_used = timestamp_to_date(job['timestamp']).isoformat()
+            lines.append(
+                f'  {job["jobname"]} ({job["index"]}): {job["files"]} files, {_format_bytes(job["bytes"])}, '
+                f'{_format_bytes(job["exclusivebytes"])} exclusive, last used {last_used}'
+            )
+    print('\n'.join(lines))
+
+
+def _print_export(export_data: dict[str, Any]):
+    lines = [
+        f'Exported {export_data["files"]} files ({_format_bytes(export_data["bytes"])}) '
+        f'from {export_data["indexes"]} indexes to {export_data["archive"]}',
+        f'latexminted {export_data["latexminted"]}, Pygments {export_data["pygments"]}',
+    ]
+    if export_data['staleindexes']:
+        lines.append(f'Skipped {len(export_data["staleindexes"])} stale indexes')
+    for name in export_data['skippedfiles']:
+        lines.append(f'Skipped unreadable or corrupt file: {name}')
+    print('\n'.join(lines))
+
+
+def _print_import(import_data: dict[str, Any]):
+    lines = [
+        f'Imported {import_data["importedfiles"]} files ({_format_bytes(import_data["importedbytes"])}) '
+        f'into {import_data["cachedir"]}',
+        f'Skipped {import_data["existingfiles"]} existing files',
+    ]
+    if not import_data['compatible']:
+        lines.append(
+            f'Archive was created with incompatible versions (latexminted {import_data["latexminted"]}, '
+            f'Pygments {import_data["pygments"]}); only indexes of existing files were imported'
+        )
+    if import_data['droppedfiles']:
+        lines.append(f'Dropped {len(import_data["droppedfiles"])} files')
+    for name, reason in import_data['rejectedfiles'].items():
+        lines.append(f'Rejected {name}: {reason}')
+    print('\n'.join(lines))
+
+
+def cache_cmdline(*, cache_command: str, cache_dir: str, **kwargs):
+    if cache_command == 'import':
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    if not Path(cache_dir).is_dir():
+        sys.exit(f'latexminted cache: cache directory "{cache_dir}" does not exist')
+    if cache_command == 'gc':
+        gc_cmdline(cache_dir=cache_dir, **kwargs)
+        return
+
+    json: bool = kwargs.pop('json')
+    if cache_command == 'import':
+        try:
+            import_data = cache_import(cache_dir=cache_dir, **kwargs)
+        except CacheArchiveError as e:
+            sys.exit(f'latexminted cache import: {e}')
+        if json:
+            print(json_dumps(import_data, indent=2))
+        else:
+            _print_import(import_data)
+        if import_data['rejectedfiles']:
+            sys.exit(1)
+        return
+
+    with ThreadPoolExecutor() as executor:
+        if cache_command == 'export':
+            timestamp = kwargs.pop('timestamp') or time.strftime('%Y%m%d%H%M%S')
+            try:
+                with cache_lock(Path(cache_dir)):
+                    scan = CacheScan(cache_dir, executor=executor)
+                    export_data = cache_export(scan, executor=executor, timestamp=timestamp, **kwargs)
+            except CacheArchiveError as e:
+                sys.exit(f'latexminted cache export: {e}')
+            if json:
+                print(json_dumps(export_data, indent=2))
+            else:
+                _print_export(export_data)
+            return
+        scan = CacheScan(cache_dir, executor=executor)
+        if cache_command == 'stats':
+            timestamp = kwargs.pop('timestamp') or time.strftime('%Y%m%d%H%M%S')
+            stats_data = cache_stats(scan, executor=executor, timestamp=timestamp, **kwargs)
+            if json:
+                print(json_dumps(stats_data, indent=2))
+            else:
+                _print_stats(stats_data)
+        elif cache_command == 'orphans':
+            orphans = scan.orphans(**kwargs)
+            if json:
+                print(json_dumps([{'file': n, 'bytes': scan.file_sizes[n]} for n in orphans], indent=2))
+            elif orphans:
+                print('\n'.join(orphans))
+        elif cache_command == 'verify':
+            verify_data = cache_verify(scan, executor=executor)
+            if json:
+                print(json_dumps(verify_data, indent=2))
+            else:
+                lines = []
+                for name, error in verify_data['invalidindexes'].items():
+                    lines.append(f'Invalid index {name}: {error}')
+                for name, missing in verify_data['missingfiles'].items():
+                    lines.append(f'Index {name} lists missing files: {", ".join(missing)}')
+                for name in verify_data['misplacedfiles']:
+                    lines.append(f'File in wrong shard subdirectory: {name}')
+                for name in verify_data['corruptfiles']:
+                    lines.append(f'Digest does not match contents: {name}')
+                if lines:
+                    print('\n'.join(lines))
+                else:
+                    print('No problems found')
+            if any(verify_data[k] for k in ('invalidindexes', 'missingfiles', 'misplacedfiles', 'corruptfiles')):
+                sys.exit(1)
+        else:
+            raise ValueError
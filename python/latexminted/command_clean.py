@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 #
-# Copyright (c) 2024, Geoffrey M. Poore
+# Copyright (c) 2024-2026, Geoffrey M. Poore
 # All rights reserved.
 #
 # Licensed under the LaTeX Project Public License version 1.3c:
@@ -10,21 +10,32 @@
 
 from __future__ import annotations
 
+import os
+import re
 from datetime import date, timedelta
 from json import loads as json_loads
 from json import dumps as json_dumps
+from typing import Any
 from latexrestricted import PathSecurityError
+from .cache import (
+    alternate_layout_cache_file_name, bundle_delimiters, bundle_file_name, cache_lock, config_cache_file_name,
+    eviction_report_data, gc_log_file_name, hash_cache_file_name_re, iter_cache_file_paths, is_sharded_cache_file_name,
+    lease_file_name, plan_cache_eviction, read_active_leases, release_lease, timestamp_to_date
+)
+from .command_gc import start_background_gc
 from .messages import Messages
-from .restricted import MintedTempRestrictedPath
+from .restricted import latexminted_config, MintedTempRestrictedPath
+from .stats import stats, timed
+from .version import __version_info__
 
 
 
 
 paths_skipped_in_initial_temp_cleaning: set[MintedTempRestrictedPath] = set()
 
-all_roles = ['config', 'data', 'errlog', 'highlight', 'message', 'style']
+all_roles = ['config', 'configpending', 'data', 'errlog', 'highlight', 'message', 'style']
 all_roles_less_errlog = [x for x in all_roles if x != 'errlog']
-config_roles = ['config']
+config_roles = ['config', 'configpending']
 message_roles = ['message']
 
 
@@ -39,24 +50,47 @@ def clean_messages(*, md5: str):
                 pass
 
 
+def temp_file_names(*, path: MintedTempRestrictedPath, md5: str) -> list[str]:
+    '''
+    Names of minted temp files for the current document in a TeX root
+    directory, from a single directory scan.  This avoids trying every
+    possible temp file name separately.
+    '''
+    prefix = f'_{md5}'
+    try:
+        with os.scandir(path) as entries:
+            return [entry.name for entry in entries if entry.name.startswith(prefix) and entry.name.endswith('.minted')]
+    except OSError:
+        return []
+
+
+def debug_data_file_number(*, name: str, md5: str) -> int | None:
+    '''
+    Number `<n>` of a data file `_<md5>_<n>.data.minted` that was kept for
+    debugging, or `None` if `name` is not such a file.
+    '''
+    prefix = f'_{md5}_'
+    suffix = '.data.minted'
+    if name.startswith(prefix) and name.endswith(suffix):
+        number = name[len(prefix):-len(suffix)]
+        if number.isdigit() and number.isascii():
+            return int(number)
+    return None
+
+
 def _clean_temp(*, md5: str, roles: list[str], skipped: set[MintedTempRestrictedPath] | None):
+    role_file_names = set(f'_{md5}.{role}.minted' for role in roles)
     for path in MintedTempRestrictedPath.tex_roots():
-        for role in roles:
-            temp_file_path = path / f'_{md5}.{role}.minted'
+        for name in temp_file_names(path=path, md5=md5):
+            if name not in role_file_names and debug_data_file_number(name=name, md5=md5) is None:
+                continue
+            temp_file_path = path / name
             if skipped and temp_file_path in skipped:
                 continue
             try:
                 temp_file_path.unlink(missing_ok=True)
             except (PermissionError, PathSecurityError):
                 continue
-        for n in range(1, 101):
-            debug_data_path = path / f'_{md5}_{n}.data.minted'
-            try:
-                debug_data_path.unlink()
-            except (PermissionError, PathSecurityError):
-                continue
-            except FileNotFoundError:
-                break
 
 
 def clean_initial_temp(*, md5: str):
@@ -75,29 +109,131 @@ def clean_config_temp(*, md5: str, debug: bool = False):
     _clean_temp(md5=md5, roles=config_roles, skipped=None)
 
 
+# The saved config for `cacheconfig` contains the version of the executable
+# that created it.  LaTeX can't check that against the installed executable
+# without running it, which is what the saved config avoids, so the check is
+# made whenever the executable cleans the cache at the end of a compile.  A
+# saved config from another version is deleted, so that the next compile
+# detects the config again.
+
+_config_cache_executable_version_re = re.compile(r'\\xdef\\minted@executable@version\{\\detokenize\{([^{}]*)\}\}%')
+
+
+def delete_stale_config_cache(*, md5: str, cache_path: MintedTempRestrictedPath) -> bool:
+    '''
+    Delete the saved config if it was not created by this version of the
+    executable.  Return whether it was deleted.
+    '''
+    config_cache_path = cache_path / config_cache_file_name(md5)
+    try:
+        config_cache = config_cache_path.read_text(encoding='utf8')
+    except (OSError, UnicodeDecodeError, PathSecurityError):
+        return False
+    minted_executable_version = f'{__version_info__.major}.{__version_info__.minor}.{__version_info__.micro}'
+    match = _config_cache_executable_version_re.search(config_cache)
+    if match is not None and match.group(1) == minted_executable_version:
+        return False
+    try:
+        config_cache_path.unlink(missing_ok=True)
+    except (OSError, PathSecurityError):
+        return False
+    return True
+
+
+
+
+@timed('clean')
 def clean(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: dict[str, str],
           additional_cache_file_names: list[str] | None = None):
     if not debug:
         # Debug setting only applies to temp files, not to cache cleaning
         clean_temp_except_errlog(md5=md5)
 
-    # Python < 3.11 requires `YYYY-MM-DD`
-    timestamp_date = date.fromisoformat(f'{timestamp[:4]}-{timestamp[4:6]}-{timestamp[6:8]}')
+    cache_config = latexminted_config.cache
     cache_path = MintedTempRestrictedPath(data['cachepath'])
     current_index_name = f'_{md5}.index.minted'
+    eviction_report_name = f'_{md5}.eviction.minted'
     current_index_cache_files: set[str] = set()
     current_index_cache_files.add(current_index_name)
     if additional_cache_file_names is not None:
         current_index_cache_files.update(additional_cache_file_names)
     current_index_cache_files.update(data['cachefiles'])
+    if cache_config.eviction_dry_run:
+        current_index_cache_files.add(eviction_report_name)
+    cache_bundle = data.get('cachebundle') == 'true'
+    if cache_bundle:
+        current_index_cache_files.add(bundle_file_name(md5))
+    if data.get('cacheconfig') == 'true':
+        current_index_cache_files.add(config_cache_file_name(md5))
+        delete_stale_config_cache(md5=md5, cache_path=cache_path)
 
+    # Index updates and eviction are performed while holding a lock on the
+    # cache directory, so that a concurrent compile or garbage collection
+    # can't delete files that are listed in an index that is being written.
+    with cache_lock(cache_path):
+        did_write_index = _update_index_and_evict(
+            md5=md5, timestamp=timestamp, messages=messages, data=data, cache_path=cache_path,
+            current_index_name=current_index_name, current_index_cache_files=current_index_cache_files,
+            eviction_report_name=eviction_report_name,
+        )
+
+    # The bundle only changes when the cache files in the index change, so it
+    # is only rewritten along with the index, or if a previous write failed
+    if cache_bundle and (did_write_index or cache_bundle_is_stale(
+            cache_path=cache_path, bundle_name=bundle_file_name(md5), index_name=current_index_name)):
+        write_cache_bundle(messages=messages, cache_path=cache_path, bundle_name=bundle_file_name(md5),
+                           cache_file_names=current_index_cache_files)
+
+    # With background cleaning, garbage collection is only needed when the
+    # index changes:  either cache files are no longer used, or a day has
+    # passed so other indexes may have expired.
+    if cache_config.clean_mode == 'background' and did_write_index:
+        # Errors from the last background garbage collection are reported
+        # before the log is overwritten
+        try:
+            gc_log = (cache_path / gc_log_file_name).read_text(encoding='utf8', errors='replace')
+        except (FileNotFoundError, PermissionError, PathSecurityError):
+            gc_log = ''
+        if gc_log.strip():
+            messages.append_warning(
+                rf'Background cache cleaning failed or had errors (see \detokenize{{"{messages.errlog_file_name}"}})'
+            )
+            messages.append_errlog(gc_log)
+        resolved_cache_path = cache_path.resolve()
+        if cache_config.eviction_dry_run:
+            eviction_report = (resolved_cache_path / eviction_report_name).as_posix()
+        else:
+            eviction_report = None
+        start_background_gc(
+            cache_dir=resolved_cache_path.as_posix(),
+            timestamp=timestamp,
+            lease_seconds=cache_config.lease_seconds,
+            max_age_days=cache_config.max_age_days,
+            max_bytes=cache_config.max_bytes,
+            max_files=cache_config.max_files,
+            dry_run=cache_config.eviction_dry_run,
+            report=eviction_report,
+        )
+
+
+def _update_index_and_evict(*, md5: str, timestamp: str, messages: Messages, data: dict[str, str],
+                            cache_path: MintedTempRestrictedPath, current_index_name: str,
+                            current_index_cache_files: set[str], eviction_report_name: str) -> bool:
+    cache_config = latexminted_config.cache
+    timestamp_date = timestamp_to_date(timestamp)
     old_current_index_cache_files: set[str] = set()
-    used_cache_files: set[str] = set()
-    used_cache_files.update(current_index_cache_files)
-    did_delete_old_index: bool = False
-    for index_path in cache_path.glob('*.index.minted'):
+    old_current_index_date: date | None = None
+    index_data: dict[str, dict[str, Any]] = {}
+    if cache_config.clean_mode == 'sync':
+        index_paths = cache_path.glob('*.index.minted')
+    else:
+        # Only the current index is needed; eviction happens out of band
+        index_paths = [cache_path / current_index_name]
+    for index_path in index_paths:
         try:
-            index_data = json_loads(index_path.read_bytes())
+            index_data_i = json_loads(index_path.read_bytes())
+        except FileNotFoundError:
+            continue
         except PathSecurityError:
             messages.append_error(
                 rf'Cannot read file \detokenize{{"{index_path.name}"}} outside working directory, \detokenize{{TEXMFOUTPUT}}, and \detokenize{{TEXMF_OUTPUT_DIRECTORY}}'
@@ -106,43 +242,59 @@ def clean(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: di
         except PermissionError:
             messages.append_error(rf'Insufficient permission to open file \detokenize{{"{index_path.name}"}}')
             continue
+        stats.count('index_files_scanned')
+        if index_path.name == current_index_name:
+            old_current_index_cache_files.update(index_data_i['cachefiles'])
+            old_current_index_date = timestamp_to_date(index_data_i['timestamp'])
+        else:
+            index_data[index_path.name] = index_data_i
 
-        # Python < 3.11 requires `YYYY-MM-DD`
-        index_data_ts = index_data['timestamp']
-        index_date = date.fromisoformat(f'{index_data_ts[:4]}-{index_data_ts[4:6]}-{index_data_ts[6:8]}')
-        index_age = timestamp_date - index_date
-        if index_age > timedelta(days=30):
-            # Delete index files more than 30 days old
+    # Index timestamps record when an index was last used.  The current index
+    # is rewritten when it is modified and also when its timestamp is from an
+    # earlier day, so that the least recently used caches can be identified.
+    did_modify_current_index: bool = current_index_cache_files != old_current_index_cache_files
+    did_expire_index: bool = any(
+        timestamp_date - timestamp_to_date(v['timestamp']) > timedelta(days=cache_config.max_age_days)
+        for v in index_data.values()
+    )
+    if cache_config.clean_mode == 'sync' and (
+            did_expire_index or did_modify_current_index or cache_config.eviction_dry_run):
+        cache_file_paths: dict[str, MintedTempRestrictedPath] = dict(iter_cache_file_paths(cache_path))
+        cache_file_sizes: dict[str, int] = {}
+        for cache_file_name, cache_file_path in cache_file_paths.items():
+            if cache_config.max_bytes is None and not cache_config.eviction_dry_run:
+                cache_file_sizes[cache_file_name] = 0
+                continue
             try:
-                index_path.unlink(missing_ok=True)
-                did_delete_old_index = True
-            except PathSecurityError:
-                messages.append_error(
-                    rf'Cannot delete file \detokenize{{"{index_data.name}"}} outside working directory, \detokenize{{TEXMFOUTPUT}}, and \detokenize{{TEXMF_OUTPUT_DIRECTORY}}'
-                )
-            except PermissionError:
-                messages.append_error(rf'Insufficient permission to delete outdated cache file \detokenize{{"{index_path.name}"}}')
-            continue
-
-        if index_path.name == current_index_name:
-            old_current_index_cache_files.update(index_data['cachefiles'])
+                cache_file_sizes[cache_file_name] = cache_file_path.stat().st_size
+            except FileNotFoundError:
+                continue
+        # Files that other compiles are producing but have not yet indexed
+        # are protected by their leases
+        leased_cache_files = read_active_leases(
+            cache_path, lease_seconds=cache_config.lease_seconds, exclude_md5=md5
+        )
+        leased_cache_files.add(lease_file_name(md5))
+        evicted = plan_cache_eviction(
+            timestamp=timestamp,
+            current_index_name=current_index_name,
+            current_cache_files=current_index_cache_files | leased_cache_files,
+            index_data=index_data,
+            cache_file_sizes=cache_file_sizes,
+            max_age_days=cache_config.max_age_days,
+            max_bytes=cache_config.max_bytes,
+            max_files=cache_config.max_files,
+        )
+        if cache_config.eviction_dry_run:
+            write_eviction_report(messages=messages, timestamp=timestamp, cache_path=cache_path,
+                                  eviction_report_name=eviction_report_name,
+                                  cache_file_sizes=cache_file_sizes, evicted=evicted)
         else:
-            used_cache_files.update(index_data['cachefiles'])
+            delete_cache_files(messages=messages, cache_file_paths=cache_file_paths, evicted=evicted)
 
-    if did_delete_old_index or current_index_cache_files != old_current_index_cache_files:
-        for minted_path in cache_path.glob('*.minted'):
-            if minted_path.name not in used_cache_files:
-                try:
-                    minted_path.unlink(missing_ok=True)
-                except PathSecurityError:
-                    messages.append_error(
-                        rf'Cannot delete file \detokenize{{"{minted_path.name}"}} outside working directory, \detokenize{{TEXMFOUTPUT}}, and \detokenize{{TEXMF_OUTPUT_DIRECTORY}}'
-                    )
-                except PermissionError:
-                    messages.append_error(rf'Insufficient permission to delete unused cache file \detokenize{{"{minted_path.name}"}}')
-
-    if current_index_cache_files == old_current_index_cache_files:
-        return
+    if not did_modify_current_index and old_current_index_date == timestamp_date:
+        release_lease(cache_path, md5=md5)
+        return False
     new_index_data = {
         'jobname': data['jobname'],
         'md5': md5,
@@ -156,5 +308,103 @@ def clean(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: di
         messages.append_error(
             rf'Cannot write file \detokenize{{"{new_index_path.name}"}} outside working directory, \detokenize{{TEXMFOUTPUT}}, and \detokenize{{TEXMF_OUTPUT_DIRECTORY}}'
         )
+        return False
     except PermissionError:
         messages.append_error(rf'Insufficient permission to write file \detokenize{{"{new_index_path.name}"}}')
+        return False
+    release_lease(cache_path, md5=md5)
+    return True
+
+
+def delete_cache_files(*, messages: Messages, cache_file_paths: dict[str, MintedTempRestrictedPath],
+                       evicted: dict[str, str]):
+    for cache_file_name in evicted:
+        try:
+            cache_file_path = cache_file_paths[cache_file_name]
+        except KeyError:
+            continue
+        try:
+            cache_file_path.unlink(missing_ok=True)
+        except PathSecurityError:
+            messages.append_error(
+                rf'Cannot delete file \detokenize{{"{cache_file_path.name}"}} outside working directory, \detokenize{{TEXMFOUTPUT}}, and \detokenize{{TEXMF_OUTPUT_DIRECTORY}}'
+            )
+            continue
+        except PermissionError:
+            messages.append_error(rf'Insufficient permission to delete unused cache file \detokenize{{"{cache_file_path.name}"}}')
+            continue
+        stats.count('files_evicted')
+        if is_sharded_cache_file_name(cache_file_name):
+            # Remove shard subdirectories once they are empty
+            for shard_path in (cache_file_path.parent, cache_file_path.parent.parent):
+                try:
+                    shard_path.rmdir()
+                except (OSError, PathSecurityError):
+                    break
+
+
+def write_eviction_report(*, messages: Messages, timestamp: str, cache_path: MintedTempRestrictedPath,
+                          eviction_report_name: str, cache_file_sizes: dict[str, int], evicted: dict[str, str]):
+    report_data = eviction_report_data(timestamp=timestamp, cache_file_sizes=cache_file_sizes, evicted=evicted)
+    eviction_report_path = cache_path / eviction_report_name
+    try:
+        eviction_report_path.write_text(json_dumps(report_data, indent=2), encoding='utf8')
+    except PathSecurityError:
+        messages.append_error(
+            rf'Cannot write file \detokenize{{"{eviction_report_path.name}"}} outside working directory, \detokenize{{TEXMFOUTPUT}}, and \detokenize{{TEXMF_OUTPUT_DIRECTORY}}'
+        )
+    except PermissionError:
+        messages.append_error(rf'Insufficient permission to write file \detokenize{{"{eviction_report_path.name}"}}')
+
+
+def cache_bundle_is_stale(*, cache_path: MintedTempRestrictedPath, bundle_name: str, index_name: str) -> bool:
+    '''
+    Whether a bundle is missing or older than its index.  The bundle is
+    written right after the index, so an older bundle means that writing it
+    failed or was interrupted.
+    '''
+    try:
+        bundle_mtime = (cache_path / bundle_name).stat().st_mtime_ns
+        index_mtime = (cache_path / index_name).stat().st_mtime_ns
+    except (OSError, PathSecurityError):
+        return True
+    return bundle_mtime < index_mtime
+
+
+def write_cache_bundle(*, messages: Messages, cache_path: MintedTempRestrictedPath, bundle_name: str,
+                       cache_file_names: set[str]):
+    '''
+    Write a bundle containing the highlighted code from all highlight files in
+    the cache.  Each entry is `^^C^^A<hash>^^B^^A\\endgroup<newline><code>^^B`,
+    and the bundle ends with `^^D`.  LaTeX reads the bundle with all
+    characters as catcode 12 except for the delimiters, and later retokenizes
+    each entry with `\\scantokens`; the `\\endgroup` closes the group that
+    sets `\\newlinechar` for `\\scantokens`.  Files that are missing or
+    that contain delimiters are skipped, so LaTeX falls back to inputting
+    them.
+    '''
+    bundle_entries: list[str] = []
+    for cache_file_name in sorted(cache_file_names):
+        match = hash_cache_file_name_re.fullmatch(cache_file_name)
+        if not match:
+            continue
+        highlighted: str | None = None
+        for name in (cache_file_name, alternate_layout_cache_file_name(cache_file_name)):
+            try:
+                highlighted = (cache_path / name).read_text(encoding='utf8')
+            except (OSError, PathSecurityError, UnicodeDecodeError):
+                continue
+            break
+        if highlighted is None or any(c in highlighted for c in bundle_delimiters):
+            continue
+        bundle_entries.append(f'\x03\x01{match.group(3)}\x02\x01\\endgroup\n{highlighted}\x02')
+    bundle_entries.append('\x04')
+    bundle_path = cache_path / bundle_name
+    try:
+        bundle_path.write_text(''.join(bundle_entries), encoding='utf8')
+    except PathSecurityError:
+        messages.append_error(
+            rf'Cannot write file \detokenize{{"{bundle_path.name}"}} outside working directory, \detokenize{{TEXMFOUTPUT}}, and \detokenize{{TEXMF_OUTPUT_DIRECTORY}}'
+        )
+    except PermissionError:
+        messages.append_error(rf'Insufficient permission to write file \detokenize{{"{bundle_path.name}"}}')
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 #
-# Copyright (c) 2024, Geoffrey M. Poore
+# Copyright (c) 2024-2026, Geoffrey M. Poore
 # All rights reserved.
 #
 # Licensed under the LaTeX Project Public License version 1.3c:
@@ -11,7 +11,8 @@
 from __future__ import annotations
 
 from latexrestricted import PathSecurityError
-from .command_clean import clean_initial_temp
+from .cache import config_cache_file_name
+from .command_clean import clean_config_temp, clean_initial_temp
 from .messages import Messages
 from .restricted import MintedTempRestrictedPath
 from .version import __version_info__
@@ -63,6 +64,59 @@ def config(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: d
                     tex_cachepath += '/'
                 config_lines.append(rf'\xdef\minted@config@cachepath{{\detokenize{{{tex_cachepath}}}}}%')
                 config_file.write('\n'.join(config_lines))
-                return
         except (PermissionError, PathSecurityError):
             continue
+        if (data.get('cacheconfig') == 'true' and minted_sty_version is not None and
+                minted_sty_version >= MINTED_STY_MIN_VERSION):
+            write_config_cache(md5=md5, data=data, tex_cachepath=tex_cachepath)
+        return
+
+
+
+
+def write_config_cache(*, md5: str, data: dict[str, str], tex_cachepath: str):
+    '''
+    Save the config result in the cache directory, so that later compiles can
+    use it instead of running the executable to detect the configuration
+    (`minted` package option `cacheconfig`).  The result is only valid for
+    the same `minted.sty` version, the same date, and the same `cachedir`.
+    It depends on the TeX output directories through its location, since
+    LaTeX only finds it in the working directory and the output directory.
+    LaTeX also checks that it still exists at the cache path it contains.
+    Failure to save the result is ignored, since the configuration is then
+    simply detected again.
+    '''
+    minted_executable_version = f'{__version_info__.major}.{__version_info__.minor}.{__version_info__.micro}'
+    tex_minted_version: str = data['mintedversion']
+    tex_date: str = data['timestamp'][:8]
+    tex_cachedir: str = data['cachedir']
+    config_cache_lines = [
+        rf'\xdef\minted@configcache@mintedversion{{\detokenize{{{tex_minted_version}}}}}%',
+        rf'\xdef\minted@configcache@date{{\detokenize{{{tex_date}}}}}%',
+        rf'\xdef\minted@configcache@cachedir{{\detokenize{{{tex_cachedir}}}}}%',
+        rf'\xdef\minted@executable@version{{\detokenize{{{minted_executable_version}}}}}%',
+        rf'\xdef\minted@config@cachepath{{\detokenize{{{tex_cachepath}}}}}%',
+    ]
+    cache_path = MintedTempRestrictedPath(tex_cachepath)
+    try:
+        cache_path.mkdir(parents=True, exist_ok=True)
+        (cache_path / config_cache_file_name(md5)).write_text('\n'.join(config_cache_lines), encoding='utf8')
+    except (OSError, PathSecurityError):
+        pass
+
+
+
+
+def batch_config(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: dict[str, str]):
+    '''
+    Config step of a batch, for the `minted` package option `batchconfig`.
+    LaTeX has either detected the config without cleaning up afterward, or
+    used a saved config from an earlier day without running the executable.
+    Either way, clean up the config temp files (including the marker that
+    LaTeX writes when it uses an earlier saved config), and save the config
+    again so that it is valid for today.
+    '''
+    if not debug:
+        clean_config_temp(md5=md5)
+    if data.get('cacheconfig') == 'true':
+        write_config_cache(md5=md5, data=data, tex_cachepath=data['cachepath'])
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+from json import loads as json_loads
+from json import dumps as json_dumps
+from pathlib import Path
+from typing import Any
+from .cache import (
+    cache_lock, eviction_report_data, gc_log_file_name, is_sharded_cache_file_name, iter_cache_file_paths,
+    plan_cache_eviction, read_active_leases
+)
+from .processes import latexminted_command, safe_cwd
+
+
+
+
+# Garbage collection of the cache directory outside of LaTeX.  This is used
+# with `cache.clean_mode = "background"`, in which case the compile only
+# writes its index and then starts `latexminted gc` as a detached Python
+# process, and by `latexminted gc` run manually or from a CI scheduler.  This
+# module does not depend on LaTeX security settings.  It only ever deletes
+# minted cache files within the cache directory that it is given.
+
+def gc(*, cache_dir: str, timestamp: str | None = None, lease_seconds: int = 3600, max_age_days: int = 30,
+       max_bytes: int | None = None, max_files: int | None = None, grace_seconds: int = 3600,
+       dry_run: bool = False, report: str | None = None) -> dict[str, Any]:
+    '''
+    Delete unused and expired files from the cache directory `cache_dir`,
+    following the same eviction rules as `clean()` in a compile.  Return an
+    eviction report.
+
+    Files leased by compiles in progress are never evicted.  Files modified
+    less than `grace_seconds` ago are also never evicted, since a compile
+    that is still running may have created them without having written its
+    index yet (for example, with a version of `latexminted` that does not
+    use leases).  With `dry_run`, nothing is deleted.  With `report`, the
+    eviction report is saved to that path (JSON).
+    '''
+    cache_path = Path(cache_dir)
+    if timestamp is None:
+        timestamp = time.strftime('%Y%m%d%H%M%S')
+    grace_cutoff = time.time() - grace_seconds
+
+    with cache_lock(cache_path):
+        index_data: dict[str, dict[str, Any]] = {}
+        for index_path in cache_path.glob('*.index.minted'):
+            try:
+                index_data_i = json_loads(index_path.read_bytes())
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f'latexminted gc: skipping unreadable index "{index_path.as_posix()}": {e}', file=sys.stderr)
+                continue
+            index_data[index_path.name] = index_data_i
+
+        cache_file_paths: dict[str, Path] = dict(iter_cache_file_paths(cache_path))
+        cache_file_sizes: dict[str, int] = {}
+        recent_cache_files: set[str] = set()
+        for cache_file_name, cache_file_path in cache_file_paths.items():
+            try:
+                stat = cache_file_path.stat()
+            except FileNotFoundError:
+                continue
+            cache_file_sizes[cache_file_name] = stat.st_size
+            if stat.st_mtime > grace_cutoff:
+                recent_cache_files.add(cache_file_name)
+        recent_cache_files.update(read_active_leases(cache_path, lease_seconds=lease_seconds))
+        if report is not None:
+            report_path = Path(report)
+            if report_path.parent.resolve() == cache_path.resolve():
+                recent_cache_files.add(report_path.name)
+
+        evicted = plan_cache_eviction(
+            timestamp=timestamp,
+            current_index_name=None,
+            current_cache_files=recent_cache_files,
+            index_data=index_data,
+            cache_file_sizes=cache_file_sizes,
+            max_age_days=max_age_days,
+            max_bytes=max_bytes,
+            max_files=max_files,
+        )
+        if not dry_run:
+            for cache_file_name in evicted:
+                cache_file_path = cache_file_paths[cache_file_name]
+                try:
+                    cache_file_path.unlink(missing_ok=True)
+                except OSError as e:
+                    print(f'latexminted gc: failed to delete "{cache_file_path.as_posix()}": {e}', file=sys.stderr)
+                    continue
+                if is_sharded_cache_file_name(cache_file_name):
+                    for shard_path in (cache_file_path.parent, cache_file_path.parent.parent):
+                        try:
+                            shard_path.rmdir()
+                        except OSError:
+                            break
+
+    report_data = eviction_report_data(timestamp=timestamp, cache_file_sizes=cache_file_sizes, evicted=evicted)
+    report_data['dryrun'] = dry_run
+    if report is not None:
+        Path(report).write_text(json_dumps(report_data, indent=2), encoding='utf8')
+    return report_data
+
+
+def start_background_gc(*, cache_dir: str, timestamp: str, lease_seconds: int, max_age_days: int,
+                        max_bytes: int | None, max_files: int | None, dry_run: bool,
+                        report: str | None = None) -> bool:
+    '''
+    Start `gc()` in a detached Python process that outlives the current
+    process, so that LaTeX does not wait for it.  The process never imports
+    from the working directory (see `processes.py`).  Standard error is
+    saved in the cache directory as `gc_log_file_name`.  Return whether the
+    process was started.
+    '''
+    args = [
+        'gc',
+        '--timestamp', timestamp,
+        '--lease-seconds', str(lease_seconds),
+        '--max-age-days', str(max_age_days),
+    ]
+    if max_bytes is not None:
+        args.extend(['--max-bytes', str(max_bytes)])
+    if max_files is not None:
+        args.extend(['--max-files', str(max_files)])
+    if dry_run:
+        args.append('--dry-run')
+    if report is not None:
+        args.extend(['--report', os.path.abspath(report)])
+    args.append(os.path.abspath(cache_dir))
+
+    kwargs: dict[str, Any] = {}
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = (
+            subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.CREATE_NO_WINDOW
+        )
+    else:
+        kwargs['start_new_session'] = True
+    # Errors are saved in the cache directory, since there is no terminal
+    try:
+        with open(Path(cache_dir) / gc_log_file_name, 'wb') as gc_log:
+            subprocess.Popen(latexminted_command(*args), cwd=safe_cwd(), stdin=subprocess.DEVNULL,
+                             stdout=subprocess.DEVNULL, stderr=gc_log, close_fds=True, **kwargs)
+    except OSError:
+        return False
+    return True
+
+
+def gc_cmdline(*, cache_dir: str, timestamp: str | None, lease_seconds: int, max_age_days: int,
+               max_bytes: int | None, max_files: int | None, grace_seconds: int, dry_run: bool, report: str | None):
+    if not Path(cache_dir).is_dir():
+        sys.exit(f'latexminted gc: cache directory "{cache_dir}" does not exist')
+    report_data = gc(cache_dir=cache_dir, timestamp=timestamp, lease_seconds=lease_seconds,
+                     max_age_days=max_age_days, max_bytes=max_bytes, max_files=max_files,
+                     grace_seconds=grace_seconds, dry_run=dry_run, report=report)
+    if report is None:
+        if dry_run:
+            print(json_dumps(report_data, indent=2))
+        else:
+            print(
+                f'Evicted {report_data["evictedfiles"]} of {report_data["totalfiles"]} files '
+                f'({report_data["evictedbytes"]} of {report_data["totalbytes"]} bytes)'
+            )
@@ -11,217 +11,24 @@
 from __future__ import annotations
 
 import hashlib
-import re
-import textwrap
+import os
+from json import loads as json_loads
+from json import dumps as json_dumps
 from typing import Any, Callable
 from latexrestricted import latex_config, PathSecurityError
 from pygments import highlight as pygments_highlight
-from pygments.formatters.latex import LatexEmbeddedLexer, LatexFormatter
+from pygments.formatters.latex import LatexFormatter
 from pygments.lexer import Lexer
-from pygments.lexers import find_lexer_class_by_name
-from pygments.token import Name, Keyword
-from pygments.util import ClassNotFound
-from .err import CustomLexerError
+from .cache import (
+    acquire_lease, alternate_layout_cache_file_name, checkpoint_file_name, checkpoint_glob_pattern,
+    digest_trailer_prefix, digest_trailer_status, is_hash_cache_file_name, is_sharded_cache_file_name
+)
+from .highlighting import make_lexer_and_formatter, preprocess_code, process_highlight_data
+from .incremental import checkpoint_key, format_tokens, lex_incremental, supports_incremental_lexing
+from .parallel import lex_parallel, supports_parallel_lexing
 from .messages import Messages
-from .restricted import load_custom_lexer, MintedTempRestrictedPath
-
-
-
-# Some Pygments options are given a different name in LaTeX.  These are always
-# referred to by their names in LaTeX.  Options are translated using this dict
-# immediately before being passed to Pygments.
-pygments_translations: dict[str, str] = {
-    'gobblefilter': 'gobble',
-    'literalenvname': 'envname',
-}
-
-# Sets and dicts for checking Python-related options and converting values to
-# Python types
-bool_keys: set[str] = set([
-    'autogobble',
-    'funcnamehighlighting',
-    'mathescape',
-    'python3',
-    'rangeregexdotall',
-    'rangeregexmultiline',
-    'startinline',
-    'stripall',
-    'stripnl',
-    'texcl',
-    'texcomments',
-    'tokenmerge',
-])
-nonnegative_int_re = re.compile('[1-9][0-9]*|0')
-nonnegative_int_or_none_keys: set[str] = set([
-    'gobble',
-    'gobblefilter',
-])
-positive_int_re = re.compile('[1-9][0-9]*')
-positive_int_keys: set[str] = set([
-    'rangeregexmatchnumber',
-])
-other_keys_value_sets: dict[str, set[str]] = {
-    'keywordcase': set(['lower', 'upper', 'capitalize', 'none']),
-}
-other_keys_comma_or_space_delim_set = set([
-    'extrakeywords',
-    'extrakeywordsconstant',
-    'extrakeywordsdeclaration',
-    'extrakeywordsnamespace',
-    'extrakeywordspseudo',
-    'extrakeywordsreserved',
-    'extrakeywordstype',
-])
-other_keys_unchecked_str_value: set[str] = set([
-    'codetagify',
-    'commandprefix',
-    'encoding',
-    'literalenvname',
-    'literatecomment',
-    'escapeinside',
-    'lexer',
-    'rangestartstring',
-    'rangestartstringline',
-    'rangestartafterstring',
-    'rangestartafterstringline',
-    'rangestopstring',
-    'rangestopstringline',
-    'rangestopbeforestring',
-    'rangestopbeforestringline',
-    'rangeregex',
-])
-all_keys = bool_keys | nonnegative_int_or_none_keys | positive_int_keys | set(other_keys_value_sets) | other_keys_unchecked_str_value
-
-# Keys for manipulating code within Python
-code_keys = set([
-    'autogobble',
-    'gobble',
-    'literatecomment',
-    'rangestartstring',
-    'rangestartstringline',
-    'rangestartafterstring',
-    'rangestartafterstringline',
-    'rangestopstring',
-    'rangestopstringline',
-    'rangestopbeforestring',
-    'rangestopbeforestringline',
-    'rangeregex',
-    'rangeregexmatchnumber',
-    'rangeregexdotall',
-    'rangeregexmultiline',
-])
-# Keys for creating customized subclasses of Pygments lexers
-custom_lexer_keys = set([
-    'extrakeywords',
-    'extrakeywordsconstant',
-    'extrakeywordsdeclaration',
-    'extrakeywordsnamespace',
-    'extrakeywordspseudo',
-    'extrakeywordsreserved',
-    'extrakeywordstype',
-])
-# Categorize Pygments options into lexer, filter, or formatter
-lexer_keys: set[str] = set([
-    'funcnamehighlighting',
-    'python3',
-    'startinline',
-    'stripall',
-    'stripnl',
-])
-filter_keys_no_options: set[str] = set([
-    'tokenmerge',
-])
-filter_keys_one_option: dict[str, str] = {
-    'codetagify': 'codetags',
-    'keywordcase': 'case',
-    'gobblefilter': 'n',
-}
-filter_keys_one_option_preproc: dict[str, Callable[[str], str | list[str]]] = {
-    'codetagify': lambda x: [x_i.strip() for x_i in x.split(',')] if ',' in x else x
-}
-filter_keys = filter_keys_no_options | set(filter_keys_one_option)
-formatter_keys: set[str] = set([
-    'commandprefix',
-    'literalenvname',
-    'escapeinside',
-    'mathescape',
-    'texcl',
-    'texcomments',
-])
-pygments_keys = lexer_keys | filter_keys | formatter_keys
-
-
-
-
-def process_highlight_data(*, messages: Messages, data: dict[str, Any]) -> tuple[dict[str, Any], ...] | None:
-    minted_opts: dict[str, str] = {k: v for k, v in data.items() if k != 'pyopt'}
-    py_opts = {}
-    code_opts = {}
-    custom_lexer_opts = {}
-    lexer_opts = {}
-    filter_opts = {}
-    formatter_opts = {}
-
-    for k, v in data['pyopt'].items():
-        if k in lexer_keys:
-            current_opts = lexer_opts
-        elif k in filter_keys:
-            current_opts = filter_opts
-        elif k in formatter_keys:
-            current_opts = formatter_opts
-        elif k in code_keys:
-            current_opts = code_opts
-        elif k in custom_lexer_keys:
-            current_opts = custom_lexer_opts
-        elif k in all_keys:
-            current_opts = py_opts
-        else:
-            messages.append_error(rf'Key "{k}" is unknown and will be ignored')
-            continue
-
-        if k in bool_keys:
-            if v in ('true', 'false'):
-                current_opts[k] = v == 'true'
-            else:
-                messages.append_error(rf'Key "{k}" has invalid value \detokenize{{"{v}"}} (expected "true" or "false")')
-        elif k in nonnegative_int_or_none_keys:
-            if v == 'none':
-                current_opts[k] = 0
-            elif nonnegative_int_re.fullmatch(v):
-                current_opts[k] = int(v)
-            else:
-                messages.append_error(rf'Key "{k}" has invalid value \detokenize{{"{v}"}} (expected non-negative integer or "none")')
-        elif k in positive_int_keys:
-            if positive_int_re.fullmatch(v):
-                current_opts[k] = int(v)
-            else:
-                messages.append_error(rf'Key "{k}" has invalid value \detokenize{{"{v}"}} (expected positive integer)')
-        elif k in other_keys_value_sets:
-            if v in other_keys_value_sets[k]:
-                if v == 'none':
-                    current_opts[k] = None
-                else:
-                    current_opts[k] = v
-            else:
-                valid_options = ', '.join(f'"{opt}"' for opt in other_keys_value_sets[k])
-                messages.append_error(rf'Key "{k}" has invalid value \detokenize{{"{v}"}} (expected {valid_options})')
-        elif k in other_keys_comma_or_space_delim_set:
-            if ',' in v:
-                current_opts[k] = set(v_i for v_i in (x.strip() for x in v.split(',')) if v_i)
-            else:
-                current_opts[k] = set(v_i for v_i in (x.strip() for x in v.split(' ')) if v_i)
-        elif k in other_keys_unchecked_str_value:
-            current_opts[k] = v
-        else:
-            raise TypeError(rf'Key "{k}" lacks a type checking function')
-
-    # Additional data processing
-    if 'inputfilemdfivesum' in minted_opts:
-        minted_opts['inputfilemdfivesum'] = minted_opts['inputfilemdfivesum'].lower()
-
-    if messages.has_errors():
-        return None
-    return minted_opts, py_opts, code_opts, custom_lexer_opts, lexer_opts, filter_opts, formatter_opts
+from .restricted import latexminted_config, load_custom_lexer, MintedTempRestrictedPath
+from .stats import stats, timed
 
 
 
@@ -284,141 +91,200 @@ def load_input_file(*, messages: Messages, input_file: str, mdfivesum: str, enco
 
 
 
-def preprocess_code(code: str, *, messages: Messages,
-                    autogobble: bool, gobble: int, literatecomment: str,
-                    rangestartstring: str, rangestartstringline: str,
-                    rangestartafterstring: str, rangestartafterstringline: str,
-                    rangestopstring: str, rangestopstringline: str,
-                    rangestopbeforestring: str, rangestopbeforestringline: str,
-                    rangeregex: str, rangeregexmatchnumber: int, rangeregexdotall: bool, rangeregexmultiline: bool) -> str | None:
-    start_string_options = (rangestartstring, rangestartstringline, rangestartafterstring, rangestartafterstringline)
-    stop_string_options = (rangestopstring, rangestopstringline, rangestopbeforestring, rangestopbeforestringline)
-    if rangeregex and (any(start_string_options) or any(stop_string_options)):
-        messages.append_error('Cannot use "rangeregex" at the same time as range string options')
-        return
-    if sum(1 for x in start_string_options if x) > 1:
-        messages.append_error('Cannot use multiple "rangestart" options at the same time')
-        return
-    if sum(1 for x in stop_string_options if x) > 1:
-        messages.append_error('Cannot use multiple "rangestop" options at the same time')
-        return
 
-    if rangeregex:
+
+
+
+def append_digest_trailer(highlighted: str) -> str:
+    if not highlighted.endswith('\n'):
+        highlighted += '\n'
+    hasher = hashlib.sha256()
+    hasher.update(highlighted.encode('utf8'))
+    return f'{highlighted}{digest_trailer_prefix}{hasher.hexdigest()}\n'
+
+
+def has_valid_digest_trailer(highlighted_path: MintedTempRestrictedPath) -> bool:
+    try:
+        highlighted_bytes = highlighted_path.read_bytes()
+    except (FileNotFoundError, PermissionError, PathSecurityError):
+        return False
+    return digest_trailer_status(highlighted_bytes) is True
+
+
+
+
+def migrate_cache_file(*, cache_path: MintedTempRestrictedPath, name: str) -> bool:
+    # When `cachelayout` is changed, existing hash-based cache files are moved
+    # into the new layout instead of being highlighted again.  Migration is
+    # only an optimization, so any failure falls back to highlighting.
+    alternate_path = cache_path / alternate_layout_cache_file_name(name)
+    if not alternate_path.is_file():
+        return False
+    migrated_path = cache_path / name
+    try:
+        if is_sharded_cache_file_name(name):
+            migrated_path.parent.mkdir(parents=True, exist_ok=True)
+        alternate_path.replace(migrated_path)
+    except (FileNotFoundError, PermissionError, PathSecurityError):
+        return False
+    if is_sharded_cache_file_name(alternate_path.relative_to(cache_path).as_posix()):
+        for shard_path in (alternate_path.parent, alternate_path.parent.parent):
+            try:
+                shard_path.rmdir()
+            except (OSError, PathSecurityError):
+                break
+    return True
+
+
+
+
+def write_highlighted(*, messages: Messages, name: str, highlighted_path: MintedTempRestrictedPath,
+                      highlighted: str) -> bool:
+    try:
+        if is_sharded_cache_file_name(name):
+            highlighted_path.parent.mkdir(parents=True, exist_ok=True)
+        highlighted_path.write_text(highlighted, encoding='utf8')
+    except PermissionError:
+        messages.append_error(r'Insufficient permission to write highlighted code')
+        return False
+    except PathSecurityError:
+        messages.append_error(
+            r'Cannot write highlighted code outside working directory, \detokenize{TEXMFOUTPUT}, and \detokenize{TEXMF_OUTPUT_DIRECTORY}'
+        )
+        return False
+    return True
+
+
+
+
+def highlight_incremental(*, cache_path: MintedTempRestrictedPath, input_file: str, highlight_file_name: str,
+                          code: str, lexer: Lexer, formatter: LatexFormatter) -> str:
+    # Lex using checkpoints saved when a previous version of the input file
+    # was highlighted, and save new checkpoints.  Checkpoints are only an
+    # optimization, so any failure to read or write them is ignored.
+    key = checkpoint_key(input_file=input_file, lexer=lexer)
+    previous_paths: list[tuple[float, MintedTempRestrictedPath]] = []
+    for previous_path in cache_path.glob(checkpoint_glob_pattern(key)):
         try:
-            flags = re.NOFLAG
-        except AttributeError:  # Python < 3.11
-            flags = re.RegexFlag(0)
-        if rangeregexdotall:
-            flags |= re.DOTALL
-        if rangeregexmultiline:
-            flags |= re.MULTILINE
+            previous_paths.append((previous_path.stat().st_mtime, previous_path))
+        except (OSError, PathSecurityError):
+            pass
+    previous_data: dict[str, Any] | None = None
+    for _, previous_path in sorted(previous_paths, key=lambda x: x[0], reverse=True):
         try:
-            pattern = re.compile(rangeregex, flags)
-        except Exception as e:
-            messages.append_error(
-                rf'Failed to compile "rangeregex" regular expression (see \detokenize{{{messages.errlog_file_name}}} if it exists)'
-            )
-            messages.append_errlog(e)
-            return
-        regex_match: re.Match | None = None
-        did_match: bool = False
-        for n, match_n in enumerate(pattern.finditer(code), start=1):
-            did_match = True
-            if n == rangeregexmatchnumber:
-                regex_match = match_n
-                break
-        if not did_match:
-            messages.append_error('Failed to find match with regular expression "rangeregex"')
-            return
-        if not regex_match:
-            messages.append_error(f'Failed to find match number {rangeregexmatchnumber} with regular expression "rangeregex"')
-            return
-        code = regex_match.group()
+            previous_data = json_loads(previous_path.read_bytes())
+        except Exception:
+            continue
+        break
 
-    if rangestartstring:
-        index = code.find(rangestartstring)
-        if index == -1:
-            messages.append_error('Failed to find string for "rangestartstring"')
-            return
-        code = code[index:]
-    if rangestartstringline:
-        string_index = code.find(rangestartstringline)
-        if string_index == -1:
-            messages.append_error('Failed to find string for "rangestartstringline"')
-            return
-        newline_index = code.rfind('\n', 0, string_index)
-        index = newline_index + 1
-        code = code[index:]
-    if rangestartafterstring:
-        index = code.find(rangestartafterstring)
-        if index == -1:
-            messages.append_error('Failed to find string for "rangestartafterstring"')
-            return
-        code = code[index+len(rangestartafterstring):]
-    if rangestartafterstringline:
-        string_index = code.find(rangestartafterstringline)
-        if string_index == -1:
-            messages.append_error('Failed to find string for "rangestartafterstringline"')
-            return
-        newline_index = code.find('\n', string_index + len(rangestartafterstring))
-        if newline_index == -1:
-            index = len(code)
+    text = lexer._preprocess_lexer_input(code)
+    try:
+        result = lex_incremental(lexer, text, previous_data)
+    except Exception:
+        if previous_data is None:
+            raise
+        result = lex_incremental(lexer, text, None)
+    if previous_data is not None and result.relexed_chars < len(text):
+        stats.count('incremental_lexes')
+    highlighted = format_tokens(lexer, formatter, result.tokens)
+
+    if result.checkpoint_data is not None:
+        checkpoint_path = cache_path / checkpoint_file_name(key, highlight_file_name)
+        try:
+            checkpoint_path.write_text(json_dumps(result.checkpoint_data, separators=(',', ':')), encoding='utf8')
+        except (OSError, PathSecurityError):
+            pass
         else:
-            index = newline_index + 1
-        code = code[index:]
-
-    if rangestopstring:
-        index = code.find(rangestopstring)
-        if index == -1:
-            messages.append_error('Failed to find string for "rangestopstring"')
-            return
-        code = code[:index+len(rangestopstring)]
-    if rangestopstringline:
-        string_index = code.find(rangestopstringline)
-        if string_index == -1:
-            messages.append_error('Failed to find string for "rangestopstringline"')
-            return
-        newline_index = code.find('\n', string_index + len(rangestopstringline))
-        if newline_index == -1:
-            index = len(code)
+            for _, previous_path in previous_paths:
+                if previous_path.name != checkpoint_path.name:
+                    try:
+                        previous_path.unlink(missing_ok=True)
+                    except (OSError, PathSecurityError):
+                        pass
+    return highlighted
+
+
+
+
+def highlight_supervised(*, messages: Messages, code: str, py_opts: dict[str, Any], custom_lexer_opts: dict[str, Any],
+                         lexer_opts: dict[str, Any], filter_opts: dict[str, Any],
+                         formatter_opts: dict[str, Any]) -> str | None:
+    # Highlight in a worker process with the time and memory budget from
+    # `.latexminted_config`.  A snippet that exceeds the budget is an error,
+    # and the worker is restarted for the next snippet.
+    from .supervised import (
+        get_supervisor, SupervisedHighlightError, SupervisedHighlightMemoryError, SupervisedHighlightTimeout
+    )
+    supervisor = get_supervisor(timeout_seconds=latexminted_config.lexing.timeout_seconds,
+                                max_memory_mb=latexminted_config.lexing.max_memory_mb)
+    try:
+        return supervisor.highlight(code, py_opts=py_opts, custom_lexer_opts=custom_lexer_opts,
+                                    lexer_opts=lexer_opts, filter_opts=filter_opts, formatter_opts=formatter_opts)
+    except SupervisedHighlightTimeout:
+        stats.count('budget_exceeded')
+        messages.append_error(
+            rf'''Highlighting with lexer \detokenize{{"{py_opts['lexer']}"}} exceeded the time limit of \detokenize{{{latexminted_config.lexing.timeout_seconds}}} seconds (\detokenize{{"lexing.timeout_seconds"}} in \detokenize{{.latexminted_config}})'''
+        )
+    except SupervisedHighlightMemoryError:
+        stats.count('budget_exceeded')
+        messages.append_error(
+            rf'''Highlighting with lexer \detokenize{{"{py_opts['lexer']}"}} exceeded the memory limit of \detokenize{{{latexminted_config.lexing.max_memory_mb}}} MB (\detokenize{{"lexing.max_memory_mb"}} in \detokenize{{.latexminted_config}})'''
+        )
+    except SupervisedHighlightError as e:
+        if e.latex_errors:
+            for error in e.latex_errors:
+                messages.append_error(error)
         else:
-            index = newline_index + 1
-        code = code[:index]
-    if rangestopbeforestring:
-        index = code.find(rangestopbeforestring)
-        if index == -1:
-            messages.append_error('Failed to find string for "rangestopbeforestring"')
-            return
-        code = code[:index]
-    if rangestopbeforestringline:
-        string_index = code.find(rangestopbeforestringline)
-        if string_index == -1:
-            messages.append_error('Failed to find string for "rangestopbeforestringline"')
-            return
-        newline_index = code.rfind('\n', 0, string_index)
-        index = newline_index + 1
-        code = code[:index]
-
-    if literatecomment:
-        code_lines = code.splitlines(True)
-        if all(line.startswith(literatecomment) for line in code_lines):
-            len_literatecomment = len(literatecomment)
-            code = ''.join(line[len_literatecomment:] for line in code_lines)
-    if autogobble:
-        code = textwrap.dedent(code)
-    if gobble:
-        code = ''.join(line[gobble:] or '\n' for line in code.splitlines(True))
-
-    if not code.endswith('\n'):
-        code += '\n'
+            messages.append_error(
+                rf'Failed due to unexpected error (see \detokenize{{"{messages.errlog_file_name}"}} if it exists)'
+            )
+            messages.append_errlog(str(e))
+    return None
 
-    return code
 
 
 
+@timed('highlight')
+def highlight(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: dict[str, Any],
+              lease: bool = True, input_loader: Callable[..., str | None] = load_input_file,
+              output_writer: Callable[[MintedTempRestrictedPath, str], None] | None = None) -> str | None:
+    '''
+    Highlight code and save it to file.  Return the name of the file, or
+    `None` in the event of errors.
 
-def highlight(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: dict[str, Any]) -> str | None:
+    `input_loader` and `output_writer` allow batch mode to read input files
+    and write highlighted code in other threads.  With `output_writer`, the
+    name of the file is returned before it has been written, and writing
+    errors are handled by the writer.
+    '''
     messages.set_context(data)
+    stats.count('snippets')
+    if '/' in data['highlightfilename'] and not is_sharded_cache_file_name(data['highlightfilename']):
+        messages.append_error(
+            rf'''Invalid file name for highlighted code \detokenize{{"{data['highlightfilename']}"}}'''
+        )
+        return
+    if is_hash_cache_file_name(data['highlightfilename']):
+        # Highlighted code may already exist if another compile using the
+        # same cache directory created it, if a previous compile was
+        # interrupted after highlighting but before LaTeX could use it, or if
+        # it exists in the cache under a different `cachelayout`
+        cache_path = MintedTempRestrictedPath(data['cachepath'])
+        if lease:
+            # Lease before checking for existing files, so that cleaning in
+            # another process can't delete them after they are found
+            acquire_lease(cache_path, md5=md5, cache_file_names=[data['highlightfilename']])
+        if (latexminted_config.cache.skip_existing and
+                has_valid_digest_trailer(cache_path / data['highlightfilename'])):
+            stats.count('cache_hits')
+            return data['highlightfilename']
+        # The other layout is only checked when there isn't a usable file in
+        # the current layout, so that cache hits don't need another lookup
+        if migrate_cache_file(cache_path=cache_path, name=data['highlightfilename']):
+            stats.count('cache_hits')
+            return data['highlightfilename']
+    stats.count('cache_misses')
+
     processed_data = process_highlight_data(messages=messages, data=data)
     if processed_data is None:
         return
@@ -428,8 +294,8 @@ def highlight(*, md5: str, timestamp: str, debug: bool, messages: Messages, data
     if 'code' in minted_opts:
         code = minted_opts['code']
     else:
-        code = load_input_file(messages=messages, input_file=minted_opts['inputfilepath'],
-                               mdfivesum=minted_opts['inputfilemdfivesum'], encoding=py_opts['encoding'])
+        code = input_loader(messages=messages, input_file=minted_opts['inputfilepath'],
+                            mdfivesum=minted_opts['inputfilemdfivesum'], encoding=py_opts['encoding'])
         if code is None:
             return
 
@@ -437,90 +303,48 @@ def highlight(*, md5: str, timestamp: str, debug: bool, messages: Messages, data
     if code is None:
         return
 
-    translated_lexer_opts = {pygments_translations.get(k, k): v for k, v in lexer_opts.items()}
-    pygments_lexer: Lexer
-    try:
-        PygmentsLexer = find_lexer_class_by_name(py_opts['lexer'])
-    except ClassNotFound:
-        if not py_opts['lexer'].endswith('.py') and '.py:' not in py_opts['lexer']:
-            messages.append_error(rf'''Pygments lexer \detokenize{{"{py_opts['lexer']}"}} is unknown''')
-            return
-        try:
-            PygmentsLexer = load_custom_lexer(py_opts['lexer'])
-        except CustomLexerError as e:
-            messages.append_error(rf'\detokenize{{{str(e)}}}')
-            return
-        except Exception as e:
-            messages.append_error(
-                rf'''Failed to load custom lexer \detokenize{{"{py_opts['lexer']}"}}; see \detokenize{{{messages.errlog_file_name}}} if it exists''')
-            messages.append_errlog(e)
-            return
-
-
-    if any(custom_lexer_opts.values()):
-        extra_tokens = {}
-        for v in custom_lexer_opts['extrakeywords']:
-            extra_tokens[v] = Keyword
-        for v in custom_lexer_opts['extrakeywordsconstant']:
-            extra_tokens[v] = Keyword.Constant
-        for v in custom_lexer_opts['extrakeywordsdeclaration']:
-            extra_tokens[v] = Keyword.Declaration
-        for v in custom_lexer_opts['extrakeywordsnamespace']:
-            extra_tokens[v] = Keyword.Namespace
-        for v in custom_lexer_opts['extrakeywordspseudo']:
-            extra_tokens[v] = Keyword.Pseudo
-        for v in custom_lexer_opts['extrakeywordsreserved']:
-            extra_tokens[v] = Keyword.Reserved
-        for v in custom_lexer_opts['extrakeywordstype']:
-            extra_tokens[v] = Keyword.Type
-
-        # https://pygments.org/docs/lexerdevelopment/
-        PygmentsLexerBase = PygmentsLexer
-        class PygmentsLexer(PygmentsLexerBase):
-            EXTRA_TOKENS = extra_tokens
-
-            def get_tokens_unprocessed(self, text, stack=('root',)):
-                for index, token, value in PygmentsLexerBase.get_tokens_unprocessed(self, text, stack):
-                    if token is Name and value in self.EXTRA_TOKENS:
-                        yield index, self.EXTRA_TOKENS[value], value
-                    else:
-                        yield index, token, value
-
-
-    pygments_lexer = PygmentsLexer(**translated_lexer_opts)
-
-    for filter_name in filter_keys_no_options:
-        if filter_opts[filter_name]:
-            pygments_lexer.add_filter(pygments_translations.get(filter_name, filter_name))
-    for filter_name, opt_name in filter_keys_one_option.items():
-        if filter_opts[filter_name]:
-            if filter_name in filter_keys_one_option_preproc:
-                pygments_lexer.add_filter(
-                    pygments_translations.get(filter_name, filter_name),
-                    **{opt_name: filter_keys_one_option_preproc[filter_name](filter_opts[filter_name])}
-                )
-            else:
-                pygments_lexer.add_filter(
-                    pygments_translations.get(filter_name, filter_name),
-                    **{opt_name: filter_opts[filter_name]}
-                )
-    escapeinside: str = formatter_opts.get('escapeinside', '')
-    if len(escapeinside) == 2:
-        pygments_lexer = LatexEmbeddedLexer(escapeinside[0], escapeinside[1], pygments_lexer)
-
-    translated_formatter_opts = {pygments_translations.get(k, k): v for k, v in formatter_opts.items()}
-    pygments_formatter = LatexFormatter(**translated_formatter_opts)
-
-    highlighted = pygments_highlight(code, pygments_lexer, pygments_formatter)
-    highlighted_path = MintedTempRestrictedPath(data['cachepath']) / minted_opts['highlightfilename']
-    try:
-        highlighted_path.write_text(highlighted, encoding='utf8')
-    except PermissionError:
-        messages.append_error(r'Insufficient permission to write highlighted code')
+    lexer_and_formatter = make_lexer_and_formatter(
+        messages=messages, py_opts=py_opts, custom_lexer_opts=custom_lexer_opts, lexer_opts=lexer_opts,
+        filter_opts=filter_opts, formatter_opts=formatter_opts, load_custom_lexer=load_custom_lexer
+    )
+    if lexer_and_formatter is None:
         return
-    except PathSecurityError:
-        messages.append_error(
-            r'Cannot write highlighted code outside working directory, \detokenize{TEXMFOUTPUT}, and \detokenize{TEXMF_OUTPUT_DIRECTORY}'
+    pygments_lexer, pygments_formatter = lexer_and_formatter
+
+    stats.count('bytes_lexed', len(code.encode('utf8')))
+    if latexminted_config.lexing.is_supervised:
+        highlighted = highlight_supervised(
+            messages=messages, code=code, py_opts=py_opts, custom_lexer_opts=custom_lexer_opts,
+            lexer_opts=lexer_opts, filter_opts=filter_opts, formatter_opts=formatter_opts
+        )
+        if highlighted is None:
+            return
+    elif (latexminted_config.cache.incremental_min_lines is not None and 'code' not in minted_opts and
+            is_hash_cache_file_name(minted_opts['highlightfilename']) and
+            code.count('\n') + 1 >= latexminted_config.cache.incremental_min_lines and
+            supports_incremental_lexing(pygments_lexer)):
+        highlighted = highlight_incremental(
+            cache_path=MintedTempRestrictedPath(data['cachepath']), input_file=minted_opts['inputfilepath'],
+            highlight_file_name=minted_opts['highlightfilename'], code=code, lexer=pygments_lexer,
+            formatter=pygments_formatter
         )
+    elif (latexminted_config.lexing.parallel_min_lines is not None and
+            code.count('\n') + 1 >= latexminted_config.lexing.parallel_min_lines and
+            supports_parallel_lexing(pygments_lexer)):
+        stats.count('parallel_lexes')
+        tokens, _ = lex_parallel(pygments_lexer, pygments_lexer._preprocess_lexer_input(code),
+                                 jobs=latexminted_config.lexing.parallel_jobs or os.cpu_count() or 1)
+        highlighted = format_tokens(pygments_lexer, pygments_formatter, tokens)
+    else:
+        highlighted = pygments_highlight(code, pygments_lexer, pygments_formatter)
+    if latexminted_config.cache.skip_existing and is_hash_cache_file_name(minted_opts['highlightfilename']):
+        highlighted = append_digest_trailer(highlighted)
+    highlighted_path = MintedTempRestrictedPath(data['cachepath']) / minted_opts['highlightfilename']
+    if output_writer is not None:
+        output_writer(highlighted_path, highlighted)
+        return minted_opts['highlightfilename']
+    if not write_highlighted(messages=messages, name=minted_opts['highlightfilename'],
+                             highlighted_path=highlighted_path, highlighted=highlighted):
         return
+    stats.count('outputs_written')
     return minted_opts['highlightfilename']
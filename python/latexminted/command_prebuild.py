@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from json import loads as json_loads
+from pathlib import Path
+from typing import Any
+from .cache import alternate_layout_cache_file_name, is_hash_cache_file_name
+from .processes import spawn_context
+
+
+
+
+# Ahead-of-time highlighting outside LaTeX.  `latexminted prebuild` loads
+# data files saved from previous compiles (`_<md5>.data.minted` files kept by
+# the minted package option `debug` as `_<md5>_<n>.data.minted`) and fills the
+# cache directory in parallel, so that a following compile finds all
+# highlighted code in the cache.  Highlighting uses the same functions and the
+# same LaTeX security settings as when `latexminted` runs within LaTeX, so it
+# must run in the document directory, and the TeX installation must be on
+# PATH.
+
+def init_tex_environment():
+    '''
+    Set the environment variables that LaTeX sets for shell escape and that
+    are required by latexrestricted, based on the TeX installation on PATH.
+    Existing values are kept.
+    '''
+    if os.getenv('SELFAUTOLOC') or os.getenv('TEXSYSTEM', '').lower() == 'miktex':
+        return
+    which_kpsewhich = shutil.which('kpsewhich')
+    if which_kpsewhich is None:
+        sys.exit('latexminted prebuild: failed to find TeX installation ("kpsewhich" is not on PATH)')
+    if shutil.which('initexmf') and not shutil.which('tlmgr'):
+        os.environ['TEXSYSTEM'] = 'miktex'
+    else:
+        os.environ['TEXSYSTEM'] = 'texlive'
+        os.environ['SELFAUTOLOC'] = str(Path(which_kpsewhich).resolve().parent)
+
+
+_data_file_name_re = re.compile(r'_[0-9a-zA-Z_-]+\.data\.minted')
+
+def find_data_files(paths: list[str]) -> list[Path]:
+    data_file_paths: list[Path] = []
+    for path in paths:
+        path_path = Path(path)
+        if path_path.is_dir():
+            data_file_paths.extend(
+                p for p in sorted(path_path.glob('*.data.minted')) if _data_file_name_re.fullmatch(p.name)
+            )
+        elif path_path.is_file():
+            data_file_paths.append(path_path)
+        else:
+            sys.exit(f'latexminted prebuild: "{path}" does not exist')
+    return data_file_paths
+
+
+def load_prebuild_data(data_file_paths: list[Path]) -> list[dict[str, Any]]:
+    '''
+    Load highlight and styledef data from data files.  Data for other
+    commands is ignored.
+    '''
+    from latex2pydata import loads as latex2pydata_loads
+
+    prebuild_data: list[dict[str, Any]] = []
+    for data_file_path in data_file_paths:
+        try:
+            data = latex2pydata_loads(data_file_path.read_text(encoding='utf8'),
+                                      schema={'cachefiles': 'list[str]'}, schema_missing='verbatim')
+        except Exception as e:
+            print(f'latexminted prebuild: skipping invalid data file "{data_file_path.as_posix()}": {e}',
+                  file=sys.stderr)
+            continue
+        if isinstance(data, dict):
+            data = [data]
+        elif not isinstance(data, list):
+            print(f'latexminted prebuild: skipping invalid data file "{data_file_path.as_posix()}"', file=sys.stderr)
+            continue
+        for d in data:
+            if not isinstance(d, dict):
+                continue
+            if d.get('command') in ('highlight', 'styledef'):
+                prebuild_data.append(d)
+    return prebuild_data
+
+
+def prebuild_output_name(data: dict[str, Any]) -> str:
+    if data['command'] == 'styledef':
+        return data['styledeffilename']
+    return data['highlightfilename']
+
+
+
+
+def _prebuild_worker(task: tuple[str, dict[str, Any]]) -> tuple[str | None, list[str]]:
+    md5, data = task
+    from .messages import latex_message_to_text, Messages
+    messages = Messages(md5=md5)
+    try:
+        if data['command'] == 'styledef':
+            from .command_styledef import styledef
+            name = styledef(md5=md5, timestamp=data['timestamp'], debug=False, messages=messages, data=data,
+                            lease=False)
+        else:
+            from .command_highlight import highlight
+            name = highlight(md5=md5, timestamp=data['timestamp'], debug=False, messages=messages, data=data,
+                             lease=False)
+    except Exception as e:
+        messages.append_error(f'Failed due to unexpected error: {e!r}')
+        name = None
+    return (name, [latex_message_to_text(message) for message in messages.errors])
+
+
+def prebuild(*, data_paths: list[str], index: str | None = None, jobs: int | None = None) -> dict[str, int]:
+    '''
+    Highlight code and generate style definitions from saved data files,
+    skipping cache files that already exist.  With `index`, only cache files
+    listed in that index file are created.  Return counts of files that were
+    written, skipped, and that failed.
+    '''
+    init_tex_environment()
+
+    # Lazy import, since this requires the environment variables above
+    from .cache import acquire_lease
+    from .restricted import latexminted_config, MintedTempRestrictedPath
+
+    if latexminted_config.config_error:
+        sys.exit(f'latexminted prebuild: failed to load latexminted configuration: {latexminted_config.config_error}')
+
+    prebuild_data = load_prebuild_data(find_data_files(data_paths))
+    index_cache_file_names: set[str] | None = None
+    if index is not None:
+        try:
+            index_cache_file_names = set(json_loads(Path(index).read_bytes())['cachefiles'])
+        except Exception as e:
+            sys.exit(f'latexminted prebuild: failed to load index "{index}": {e}')
+
+    # A lease protects the new files from cleaning in other processes until
+    # the following compile writes its index.  The lease is not released; it
+    # expires after `cache.lease_seconds`.
+    md5 = f'prebuild{os.getpid()}'
+    counts = {'written': 0, 'skipped': 0, 'failed': 0}
+    tasks: list[tuple[str, dict[str, Any]]] = []
+    leased_cache_file_names: dict[str, list[str]] = {}
+    seen: set[tuple[str, str]] = set()
+    for d in prebuild_data:
+        name = prebuild_output_name(d)
+        if (d['cachepath'], name) in seen:
+            continue
+        seen.add((d['cachepath'], name))
+        if d['command'] == 'highlight' and not is_hash_cache_file_name(name):
+            # Highlighted code that isn't cached is only useful to the
+            # compile that created it
+            continue
+        if index_cache_file_names is not None and name not in index_cache_file_names:
+            continue
+        cache_path = MintedTempRestrictedPath(d['cachepath'])
+        if (cache_path / name).is_file() or (
+                d['command'] == 'highlight' and (cache_path / alternate_layout_cache_file_name(name)).is_file()):
+            counts['skipped'] += 1
+            continue
+        tasks.append((md5, d))
+        leased_cache_file_names.setdefault(d['cachepath'], []).append(name)
+
+    for cachepath, cache_file_names in leased_cache_file_names.items():
+        cache_path = MintedTempRestrictedPath(cachepath)
+        try:
+            cache_path.mkdir(parents=True, exist_ok=True)
+        except Exception:
+            pass
+        acquire_lease(cache_path, md5=md5, cache_file_names=cache_file_names)
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    context = None
+    if jobs > 1 and len(tasks) > 1:
+        context = spawn_context()
+        if context is None:
+            print('latexminted prebuild: highlighting in a single process, since this Python executable '
+                  'cannot start worker processes', file=sys.stderr)
+    if context is None:
+        results = map(_prebuild_worker, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), mp_context=context)
+        results = executor.map(_prebuild_worker, tasks, chunksize=max(1, len(tasks) // (jobs * 4)))
+    try:
+        for name, errors in results:
+            if name is None:
+                counts['failed'] += 1
+            else:
+                counts['written'] += 1
+            for error in errors:
+                print(f'latexminted prebuild: {error}', file=sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return counts
+
+
+def prebuild_cmdline(*, data_paths: list[str], index: str | None, jobs: int | None):
+    counts = prebuild(data_paths=data_paths, index=index, jobs=jobs)
+    print(
+        f'Wrote {counts["written"]} files, skipped {counts["skipped"]} existing files, '
+        f'failed {counts["failed"]} files'
+    )
+    if counts['failed']:
+        sys.exit(1)
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from json import loads as json_loads
+from json import dumps as json_dumps
+from pathlib import Path
+from typing import Any
+from .command_prebuild import find_data_files, init_tex_environment
+
+
+
+
+# Replaying saved data files outside LaTeX, for profiling and benchmarking.
+# `latexminted replay` takes data files `_<md5>_<n>.data.minted` that are kept
+# by the minted package option `debug`, and runs each one through
+# `cmdline.main()` in a new process, as LaTeX would have, with a sandbox
+# directory as the working directory.  Input files and custom lexers used by
+# the data files are copied into the sandbox from the document directory.  The
+# TeX installation is replaced by a stand-in `kpsewhich` that reports TeX
+# Live's default security settings, so that no TeX installation is needed
+# (except under Windows, where the TeX installation on PATH is used).  Each
+# run is a separate process because `latexrestricted` determines the working
+# directory and the TeX configuration when it is first imported, and because
+# that is how LaTeX runs `latexminted`, so times include startup.
+
+_data_file_md5_re = re.compile(r'_([0-9a-fA-F]{32})(?:_([0-9]+))?\.data\.minted')
+_message_error_re = re.compile(r'^  \\minted@error\{(.*)\}%$', re.MULTILINE)
+
+_kpsewhich_standin = '''\
+#!{executable}
+# Stand-in for kpsewhich, created by "latexminted replay"
+import os
+import sys
+var_values = {{'openin_any': 'a', 'openout_any': 'p', 'shell_escape': 'p'}}
+if len(sys.argv) == 3 and sys.argv[1] == '--var-value':
+    print(var_values.get(sys.argv[2], ''))
+elif len(sys.argv) > 1 and os.path.isfile(sys.argv[-1]):
+    print(sys.argv[-1])
+'''
+
+
+
+
+class ReplayRun(object):
+    '''
+    A saved `latexminted` run:  a command plus its data file.
+    '''
+    def __init__(self, *, data_file_path: Path, md5: str, command: str, timestamp: str, data_text: str):
+        self.data_file_path = data_file_path
+        self.md5 = md5
+        self.command = command
+        self.timestamp = timestamp
+        self.data_text = data_text
+
+
+def _run_sort_key(data_file_path: Path) -> tuple[str, int, str]:
+    # Runs for a document are replayed in the order they were saved.  A data
+    # file without a number is from the last run.
+    match = _data_file_md5_re.fullmatch(data_file_path.name)
+    if match is None:
+        return ('', 0, data_file_path.as_posix())
+    return (match.group(1), int(match.group(2)) if match.group(2) else sys.maxsize, data_file_path.as_posix())
+
+
+def load_replay_runs(data_file_paths: list[Path]) -> tuple[list[ReplayRun], list[dict[str, Any]]]:
+    '''
+    Load runs from data files.  Return the runs plus all highlight data, for
+    locating input files and custom lexers.
+    '''
+    from latex2pydata import loads as latex2pydata_loads
+
+    runs: list[ReplayRun] = []
+    highlight_data: list[dict[str, Any]] = []
+    for data_file_path in sorted(data_file_paths, key=_run_sort_key):
+        match = _data_file_md5_re.fullmatch(data_file_path.name)
+        if match is None:
+            print(f'latexminted replay: skipping data file "{data_file_path.as_posix()}" without MD5 in name',
+                  file=sys.stderr)
+            continue
+        try:
+            data_text = data_file_path.read_text(encoding='utf8')
+            data = latex2pydata_loads(data_text, schema={'cachefiles': 'list[str]'}, schema_missing='verbatim')
+        except Exception as e:
+            print(f'latexminted replay: skipping invalid data file "{data_file_path.as_posix()}": {e}',
+                  file=sys.stderr)
+            continue
+        if isinstance(data, dict):
+            command = data.get('command')
+            timestamp = data.get('timestamp')
+            data_list = [data]
+        elif isinstance(data, list) and data and all(isinstance(d, dict) for d in data):
+            command = 'batch'
+            timestamp = data[0].get('timestamp')
+            data_list = data
+        else:
+            print(f'latexminted replay: skipping invalid data file "{data_file_path.as_posix()}"', file=sys.stderr)
+            continue
+        if not isinstance(command, str) or not isinstance(timestamp, str):
+            print(f'latexminted replay: skipping invalid data file "{data_file_path.as_posix()}"', file=sys.stderr)
+            continue
+        runs.append(ReplayRun(data_file_path=data_file_path, md5=match.group(1).lower(), command=command,
+                              timestamp=timestamp, data_text=data_text))
+        highlight_data.extend(d for d in data_list if d.get('command') == 'highlight')
+    return (runs, highlight_data)
+
+
+def _document_file_names(highlight_data: list[dict[str, Any]]) -> set[str]:
+    # Relative paths of input files and custom lexers that must be copied
+    # into the sandbox.  Absolute paths are used from their original location.
+    file_names: set[str] = set()
+    for d in highlight_data:
+        names: list[str] = []
+        if isinstance(d.get('inputfilepath'), str):
+            names.append(d['inputfilepath'])
+        lexer = d.get('pyopt', {}).get('lexer')
+        if isinstance(lexer, str) and (lexer.endswith('.py') or '.py:' in lexer):
+            names.append(lexer if lexer.endswith('.py') else lexer.rsplit(':', 1)[0])
+        for name in names:
+            path = Path(name)
+            if not path.is_absolute() and '..' not in path.parts:
+                file_names.add(path.as_posix())
+    return file_names
+
+
+def _init_sandbox(sandbox_path: Path, *, document_path: Path, file_names: set[str]) -> dict[str, str]:
+    # Return the environment for runs.  The stand-in `kpsewhich` must not be
+    # under the working directory, so the working directory is a
+    # subdirectory of the sandbox.
+    if sys.platform == 'win32':
+        init_tex_environment()
+        env = os.environ.copy()
+    else:
+        env = os.environ.copy()
+        texbin_path = sandbox_path / 'texbin'
+        texbin_path.mkdir()
+        kpsewhich_path = texbin_path / 'kpsewhich'
+        kpsewhich_path.write_text(_kpsewhich_standin.format(executable=sys.executable), encoding='utf8')
+        kpsewhich_path.chmod(0o755)
+        env['SELFAUTOLOC'] = str(texbin_path.resolve())
+        env['TEXSYSTEM'] = 'texlive'
+    for env_var in ('TEXMFOUTPUT', 'TEXMF_OUTPUT_DIRECTORY'):
+        env.pop(env_var, None)
+    # The package and its dependencies may be running from wheels or other
+    # locations that are only on `sys.path` for the current process, as with
+    # the launcher in TeX installations
+    env['PYTHONPATH'] = os.pathsep.join(os.path.abspath(p) for p in sys.path if p)
+
+    files_path = sandbox_path / 'files'
+    files_path.mkdir()
+    for file_name in sorted(file_names):
+        source_path = document_path / file_name
+        if not source_path.is_file():
+            print(f'latexminted replay: input file "{source_path.as_posix()}" does not exist', file=sys.stderr)
+            continue
+        target_path = files_path / file_name
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(source_path, target_path)
+    (sandbox_path / 'work').mkdir()
+    (sandbox_path / 'replay').mkdir()
+    return env
+
+
+def _reset_work_dir(sandbox_path: Path):
+    # Restore the working directory to its initial state, so that every
+    # repetition does the same work, starting without a cache
+    work_path = sandbox_path / 'work'
+    for path in work_path.iterdir():
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+    for path in (sandbox_path / 'files').iterdir():
+        if path.is_dir():
+            shutil.copytree(path, work_path / path.name)
+        else:
+            shutil.copy2(path, work_path / path.name)
+
+
+
+
+def _replay_worker(request_path: str):
+    # Run in a new process within the sandbox working directory, like
+    # `latexminted` launched by LaTeX
+    request = json_loads(Path(request_path).read_bytes())
+    if request['tracemallocframes'] is not None:
+        import tracemalloc
+        tracemalloc.start(request['tracemallocframes'])
+    profiler = None
+    if request['profile'] is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        from .cmdline import main
+        main([request['command'], '--timestamp', request['timestamp'], request['md5']])
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else 1
+    seconds = time.perf_counter() - start
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(request['profile'])
+
+    from .stats import stats
+    report: dict[str, Any] = {
+        'exitcode': exit_code,
+        'seconds': round(seconds, 6),
+        'stats': stats.as_dict(),
+    }
+    if request['tracemallocframes'] is not None:
+        report['peakbytes'] = tracemalloc.get_traced_memory()[1]
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        report['allocations'] = [
+            {
+                'traceback': [f'{frame.filename}:{frame.lineno}' for frame in stat.traceback],
+                'bytes': stat.size,
+                'count': stat.count,
+            }
+            for stat in snapshot.statistics('traceback')[:10]
+        ]
+    Path(request['report']).write_text(json_dumps(report), encoding='utf8')
+
+
+def _replay_run(run: ReplayRun, *, sandbox_path: Path, env: dict[str, str], run_index: int,
+                profile: bool, tracemalloc_frames: int | None) -> dict[str, Any]:
+    from .messages import latex_message_to_text
+
+    work_path = sandbox_path / 'work'
+    replay_path = sandbox_path / 'replay'
+    (work_path / f'_{run.md5}.data.minted').write_text(run.data_text, encoding='utf8')
+    request_path = replay_path / f'{run_index}.request.json'
+    report_path = replay_path / f'{run_index}.report.json'
+    request_path.write_text(json_dumps({
+        'md5': run.md5,
+        'command': run.command,
+        'timestamp': run.timestamp,
+        'profile': str(replay_path / f'{run_index}.prof') if profile else None,
+        'tracemallocframes': tracemalloc_frames,
+        'report': str(report_path),
+    }), encoding='utf8')
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-m', 'latexminted.command_replay', str(request_path)],
+                          cwd=work_path, env=env, stdin=subprocess.DEVNULL, capture_output=True)
+    process_seconds = time.perf_counter() - start
+    run_report: dict[str, Any] = {
+        'datafile': run.data_file_path.as_posix(),
+        'command': run.command,
+    }
+    try:
+        run_report.update(json_loads(report_path.read_bytes()))
+    except (OSError, ValueError):
+        run_report['exitcode'] = proc.returncode or 1
+        run_report['seconds'] = None
+    run_report['processseconds'] = round(process_seconds, 6)
+    errors: list[str] = []
+    message_path = work_path / f'_{run.md5}.message.minted'
+    if message_path.is_file():
+        errors = [latex_message_to_text(m) for m in _message_error_re.findall(message_path.read_text(encoding='utf8'))]
+    if not report_path.is_file() and proc.stderr:
+        errors.append(proc.stderr.decode('utf8', errors='replace').strip())
+    run_report['errors'] = errors
+    return run_report
+
+
+def replay(*, data_paths: list[str], repeat: int = 1, sandbox: str | None = None, profile: str | None = None,
+           tracemalloc_frames: int | None = None) -> dict[str, Any]:
+    '''
+    Replay saved data files in a sandbox directory, running each in a new
+    process.  With `sandbox`, that directory is used and kept; otherwise, a
+    temporary directory is used.  With `profile`, cProfile stats for all runs
+    are combined and saved to that file.  With `tracemalloc_frames`, memory
+    allocations are traced with that number of frames, and peak memory and
+    the largest allocations still in use are reported for each run.  Return a
+    report.
+    '''
+    document_path = Path.cwd()
+    runs, highlight_data = load_replay_runs(find_data_files(data_paths))
+    if not runs:
+        sys.exit('latexminted replay: no valid data files')
+
+    if sandbox is None:
+        sandbox_path = Path(tempfile.mkdtemp(prefix='latexminted-replay-'))
+        keep_sandbox = False
+    else:
+        sandbox_path = Path(sandbox).resolve()
+        if sandbox_path.exists() and any(sandbox_path.iterdir()):
+            sys.exit(f'latexminted replay: sandbox directory "{sandbox}" is not empty')
+        sandbox_path.mkdir(parents=True, exist_ok=True)
+        keep_sandbox = True
+
+    try:
+        env = _init_sandbox(sandbox_path, document_path=document_path,
+                            file_names=_document_file_names(highlight_data))
+        report_runs: list[dict[str, Any]] = []
+        for n in range(repeat):
+            _reset_work_dir(sandbox_path)
+            for run in runs:
+                run_report = _replay_run(run, sandbox_path=sandbox_path, env=env, run_index=len(report_runs),
+                                         profile=profile is not None, tracemalloc_frames=tracemalloc_frames)
+                run_report['repeat'] = n
+                report_runs.append(run_report)
+        if profile is not None:
+            import pstats
+            profile_paths = [str(p) for p in sorted((sandbox_path / 'replay').glob('*.prof'))]
+            if profile_paths:
+                pstats.Stats(*profile_paths).dump_stats(profile)
+    finally:
+        if not keep_sandbox:
+            shutil.rmtree(sandbox_path, ignore_errors=True)
+
+    return {
+        'sandbox': sandbox_path.as_posix() if keep_sandbox else None,
+        'runs': report_runs,
+        'seconds': round(sum(r['seconds'] or 0 for r in report_runs), 6),
+        'processseconds': round(sum(r['processseconds'] for r in report_runs), 6),
+        'failed': sum(1 for r in report_runs if r['exitcode'] != 0),
+    }
+
+
+def replay_cmdline(*, data_paths: list[str], repeat: int, sandbox: str | None, profile: str | None,
+                   tracemalloc: bool, tracemalloc_frames: int, json: bool):
+    report = replay(data_paths=data_paths, repeat=repeat, sandbox=sandbox, profile=profile,
+                    tracemalloc_frames=tracemalloc_frames if tracemalloc else None)
+    if json:
+        print(json_dumps(report, indent=2))
+    else:
+        for run in report['runs']:
+            line = f'{run["processseconds"]:8.3f} s  {run["command"]:<10} {run["datafile"]}'
+            if 'peakbytes' in run:
+                line += f'  (peak {run["peakbytes"]} bytes)'
+            if run['exitcode'] != 0:
+                line += '  FAILED'
+            print(line)
+            for error in run['errors']:
+                print(f'    {error}')
+            for allocation in run.get('allocations', [])[:3]:
+                print(f'    {allocation["bytes"]} bytes in {allocation["count"]} blocks at '
+                      f'{" <- ".join(reversed(allocation["traceback"]))}')
+        print(
+            f'{report["processseconds"]:8.3f} s  total for {len(report["runs"])} runs '
+            f'({report["seconds"]:.3f} s in main()), {report["failed"]} failed'
+        )
+        if profile is not None and Path(profile).is_file():
+            import pstats
+            pstats.Stats(profile).sort_stats('cumulative').print_stats(25)
+    if report['failed']:
+        sys.exit(1)
+
+
+
+
+if __name__ == '__main__':
+    _replay_worker(sys.argv[1])
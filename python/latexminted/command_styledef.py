@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 #
-# Copyright (c) 2024, Geoffrey M. Poore
+# Copyright (c) 2024-2026, Geoffrey M. Poore
 # All rights reserved.
 #
 # Licensed under the LaTeX Project Public License version 1.3c:
@@ -12,16 +12,21 @@ from __future__ import annotations
 
 from latexrestricted import PathSecurityError
 from pygments.formatters import LatexFormatter
-from pygments.styles import get_style_by_name
 from pygments.util import ClassNotFound
+from .cache import acquire_lease
 from .messages import Messages
+from .registry import get_style_by_name
 from .restricted import MintedTempRestrictedPath
+from .stats import stats, timed
 
 
 
 
-def styledef(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: dict[str, str]) -> str | None:
+@timed('styledef')
+def styledef(*, md5: str, timestamp: str, debug: bool, messages: Messages, data: dict[str, str],
+             lease: bool = True) -> str | None:
     messages.set_context(data)
+    stats.count('styles')
     style = data['style']
     try:
         StyleClass = get_style_by_name(style)
@@ -31,9 +36,12 @@ def styledef(*, md5: str, timestamp: str, debug: bool, messages: Messages, data:
 
     style_defs = LatexFormatter(style=StyleClass, commandprefix=data['commandprefix']).get_style_defs().lstrip()
     styledef_path = MintedTempRestrictedPath(data['cachepath']) / data['styledeffilename']
+    if lease:
+        acquire_lease(styledef_path.parent, md5=md5, cache_file_names=[data['styledeffilename']])
     try:
         styledef_path.parent.mkdir(parents=True, exist_ok=True)
         styledef_path.write_text(style_defs, encoding='utf8')
+        stats.count('outputs_written')
     except PermissionError:
         messages.append_error(rf'Insufficient permission to write style file for \detokenize{{"{style}"}}')
         return
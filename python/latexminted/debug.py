@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 #
-# Copyright (c) 2024, Geoffrey M. Poore
+# Copyright (c) 2024-2026, Geoffrey M. Poore
 # All rights reserved.
 #
 # Licensed under the LaTeX Project Public License version 1.3c:
@@ -11,15 +11,19 @@
 from __future__ import annotations
 
 from latexrestricted import PathSecurityError
+from .command_clean import debug_data_file_number, temp_file_names
 from .restricted import MintedTempRestrictedPath
 
 
 
 
 def debug_mv_data(*, md5, data_path: MintedTempRestrictedPath) -> MintedTempRestrictedPath | None:
+    used_numbers = set(
+        debug_data_file_number(name=name, md5=md5) for name in temp_file_names(path=data_path.parent, md5=md5)
+    )
     for n in range(1, 101):
-        replacement_path = data_path.parent / f'_{md5}_{n}.data.minted'
-        if not replacement_path.is_file():
+        if n not in used_numbers:
+            replacement_path = data_path.parent / f'_{md5}_{n}.data.minted'
             break
     else:
         return None
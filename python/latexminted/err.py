@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 #
-# Copyright (c) 2024, Geoffrey M. Poore
+# Copyright (c) 2024-2026, Geoffrey M. Poore
 # All rights reserved.
 #
 # Licensed under the LaTeX Project Public License version 1.3c:
@@ -21,3 +21,6 @@ class LatexMintedConfigError(LatexMintedError):
 
 class CustomLexerError(LatexMintedError):
     pass
+
+class CacheArchiveError(LatexMintedError):
+    pass
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import re
+from typing import Iterator
+from pygments.formatters.latex import LatexEmbeddedLexer
+from pygments.lexer import do_insertions, Lexer
+from pygments.token import _TokenType, Comment, Error, Escape, String
+
+
+
+
+# Lexing for the `minted` option `escapeinside`.  `LatexEmbeddedLexer` lexes
+# the code, merges tokens that are not comments or strings, and searches the
+# merged text for escapes.  Then it lexes the code again without the escapes,
+# and inserts the escapes into the new tokens.  The merged text is built by
+# repeated string concatenation, and escapes are found by repeatedly
+# partitioning the remaining text.
+#
+# Here, the same steps are performed with a single regex scan of each merged
+# run of tokens and offset arithmetic.  When there are no escapes and the
+# tokens reproduce the code, the code without escapes is the original code,
+# so the tokens from the first pass are used without lexing again.  Output
+# is identical to `LatexEmbeddedLexer`.
+
+
+
+
+class EscapeInsideLexer(LatexEmbeddedLexer):
+    '''
+    `LatexEmbeddedLexer` that avoids lexing twice when there are no escapes.
+    '''
+    def __init__(self, left: str, right: str, lang: Lexer, **options):
+        LatexEmbeddedLexer.__init__(self, left, right, lang, **options)
+        # An escape is the left delimiter plus text up to the next right
+        # delimiter.  A left delimiter without a following right delimiter is
+        # an error.
+        self._escape_re = re.compile(rf'{re.escape(left)}(?:(.*?){re.escape(right)})?', re.DOTALL)
+
+    def get_tokens_unprocessed(self, text: str) -> Iterator[tuple[int, _TokenType, str]]:
+        tokens = list(self.lang.get_tokens_unprocessed(text))
+        if self.left not in text and ''.join(v for _, _, v in tokens) == text:
+            yield from tokens
+            return
+
+        left_len = len(self.left)
+        escape_re = self._escape_re
+        is_safe_type: dict[_TokenType, bool] = {}
+        buffered: list[str] = []
+        buffered_len = 0
+        insertions: list[tuple[int, list[tuple[int, _TokenType, str]]]] = []
+        insertion_buf: list[tuple[int, _TokenType, str]] = []
+
+        def append_buffered(value: str):
+            nonlocal buffered_len, insertion_buf
+            if insertion_buf:
+                insertions.append((buffered_len, insertion_buf))
+                insertion_buf = []
+            buffered.append(value)
+            buffered_len += len(value)
+
+        def scan_run(index: int, run: str):
+            # As in `LatexEmbeddedLexer._find_escape_tokens()`
+            last = 0
+            for match in escape_re.finditer(run):
+                start = match.start()
+                if start != last:
+                    append_buffered(run[last:start])
+                escaped = match.group(1)
+                if escaped is None:
+                    insertion_buf.append((index + start, Error, self.left))
+                else:
+                    insertion_buf.append((index + start + left_len, Escape, escaped))
+                last = match.end()
+            if last != len(run):
+                append_buffered(run[last:])
+
+        # Runs of tokens that are not comments or strings, as in
+        # `LatexEmbeddedLexer._filter_to()`
+        run_index = 0
+        run_values: list[str] = []
+        run_is_empty = True
+        for index, ttype, value in tokens:
+            try:
+                is_safe = is_safe_type[ttype]
+            except KeyError:
+                is_safe = is_safe_type[ttype] = ttype in Comment or ttype in String
+            if is_safe:
+                if not run_is_empty:
+                    scan_run(run_index, ''.join(run_values))
+                    run_values = []
+                    run_is_empty = True
+                append_buffered(value)
+            else:
+                if run_is_empty:
+                    run_index = index
+                    run_is_empty = not value
+                run_values.append(value)
+        if not run_is_empty:
+            scan_run(run_index, ''.join(run_values))
+        if insertion_buf:
+            insertions.append((buffered_len, insertion_buf))
+
+        buffered_text = ''.join(buffered)
+        if not insertions and buffered_text == text:
+            yield from tokens
+            return
+        yield from do_insertions(insertions, self.lang.get_tokens_unprocessed(buffered_text))
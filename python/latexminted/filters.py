@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import re
+from itertools import chain
+from typing import Callable, Iterator
+from pygments.filter import Filter
+from pygments.filters import CodeTagFilter, GobbleFilter, KeywordCaseFilter, TokenMergeFilter
+from pygments.lexer import Lexer
+from pygments.token import _TokenType, Comment, Keyword, String
+
+
+
+
+# Fused filters for the `minted` options `tokenmerge`, `codetagify`,
+# `keywordcase`, and `gobblefilter`.  Pygments applies each filter as a
+# separate generator that processes every token.  When several of these
+# filters are used, they are replaced with a single filter that performs all
+# of them in one pass, with the same output as applying the Pygments filters
+# in sequence.  Checks of token types, which are relatively expensive in
+# Pygments, are performed only once for each token type.  Options are
+# processed by creating the Pygments filters as usual, so invalid options
+# give the same errors.
+
+# Filters that can be fused, in the order in which they must be applied
+fusable_filter_types: tuple[type[Filter], ...] = (TokenMergeFilter, CodeTagFilter, KeywordCaseFilter, GobbleFilter)
+
+_end_of_stream = object()
+
+
+
+
+class FusedFilter(Filter):
+    '''
+    Apply a sequence of Pygments filters in one pass.  Filters must be
+    instances of `fusable_filter_types`, in that order, with each type used
+    at most once.
+    '''
+    def __init__(self, filters: list[Filter]):
+        Filter.__init__(self)
+        self.filters = filters
+        self.tokenmerge: bool = False
+        self.codetag_re: re.Pattern | None = None
+        self.keyword_convert: Callable[[str], str] | None = None
+        self.gobble_n: int | None = None
+        for f in filters:
+            if isinstance(f, TokenMergeFilter):
+                self.tokenmerge = True
+            elif isinstance(f, CodeTagFilter):
+                self.codetag_re = f.tag_re
+            elif isinstance(f, KeywordCaseFilter):
+                self.keyword_convert = f.convert
+            elif isinstance(f, GobbleFilter):
+                self.gobble_n = f.n
+            else:
+                raise TypeError
+
+    def filter(self, lexer: Lexer, stream: Iterator[tuple[_TokenType, str]]) -> Iterator[tuple[_TokenType, str]]:
+        codetag_re = self.codetag_re
+        keyword_convert = self.keyword_convert
+        gobble_n = self.gobble_n
+        # Whether token types get code tags and keyword case conversion
+        is_codetag_type: dict[_TokenType, bool] = {}
+        is_keyword_type: dict[_TokenType, bool] = {}
+        # Characters left to gobble in the current line
+        gobble_left = gobble_n
+        special = Comment.Special
+
+        tokenmerge = self.tokenmerge
+        if tokenmerge:
+            # A token is only complete once a token with a different type
+            # follows, so an end marker follows the last token
+            stream = chain(stream, ((_end_of_stream, ''),))
+        merged_type: _TokenType | None = None
+        merged_value: str = ''
+        for ttype, value in stream:
+            if tokenmerge:
+                # As in `TokenMergeFilter.filter()`
+                if ttype is merged_type:
+                    merged_value += value
+                    continue
+                ttype, value, merged_type, merged_value = merged_type, merged_value, ttype, value
+                if ttype is None:
+                    continue
+            if codetag_re is not None:
+                try:
+                    is_codetag = is_codetag_type[ttype]
+                except KeyError:
+                    is_codetag = is_codetag_type[ttype] = (
+                        ttype in String.Doc or ttype in Comment and ttype not in Comment.Preproc
+                    )
+            else:
+                is_codetag = False
+            if is_codetag:
+                # As in `pygments.filters._replace_special()`
+                pieces: list[tuple[_TokenType, str]] = []
+                last = 0
+                for match in codetag_re.finditer(value):
+                    start, end = match.start(), match.end()
+                    if start != last:
+                        pieces.append((ttype, value[last:start]))
+                    pieces.append((special, value[start:end]))
+                    last = end
+                if last != len(value):
+                    pieces.append((ttype, value[last:]))
+            else:
+                pieces = [(ttype, value)]
+            for ttype, value in pieces:
+                if keyword_convert is not None:
+                    try:
+                        is_keyword = is_keyword_type[ttype]
+                    except KeyError:
+                        is_keyword = is_keyword_type[ttype] = ttype in Keyword
+                    if is_keyword:
+                        value = keyword_convert(value)
+                if gobble_n is not None:
+                    # As in `GobbleFilter.filter()`:  remove characters that
+                    # are left to gobble from the first line, and `n` from
+                    # all others
+                    if '\n' in value:
+                        parts = value.split('\n')
+                        for index, part in enumerate(parts):
+                            left = gobble_left if index == 0 else gobble_n
+                            if left < len(part):
+                                parts[index] = part[left:]
+                                gobble_left = 0
+                            else:
+                                parts[index] = ''
+                                gobble_left = left - len(part)
+                        value = '\n'.join(parts)
+                    elif gobble_left:
+                        if gobble_left < len(value):
+                            value = value[gobble_left:]
+                            gobble_left = 0
+                        else:
+                            gobble_left -= len(value)
+                            value = ''
+                    if value == '':
+                        continue
+                yield ttype, value
+
+
+
+
+def fuse_filters(filters: list[Filter]) -> list[Filter]:
+    '''
+    Replace filters with a `FusedFilter` when there are at least two filters
+    and they can be fused.  Otherwise, return the filters unchanged.
+    '''
+    if len(filters) < 2:
+        return filters
+    index = 0
+    for f in filters:
+        while index < len(fusable_filter_types) and type(f) is not fusable_filter_types[index]:
+            index += 1
+        if index == len(fusable_filter_types):
+            return filters
+        index += 1
+    return [FusedFilter(filters)]
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import re
+import string
+from pygments.formatters.latex import _get_ttype_name, LatexFormatter
+from pygments.token import _TokenType, Token
+from typing import Iterable, TextIO
+
+
+
+
+# Compact output for the `minted` option `compactoutput`.  `LatexFormatter`
+# wraps each line of each token in `\PYG{<styles>}{...}` and escapes special
+# characters as `\PYGZ<xx>{}`.  When highlighted code is typeset, `\PYG`
+# applies the definitions `\PYG@tok@<style>` from the style definitions for
+# the current style, and styles without a definition have no effect.  Given
+# the style that will be used, the compact formatter only includes styles
+# that have definitions and that are not entirely overridden by a following
+# style, omits `\PYG` for tokens without any definitions, merges adjacent
+# tokens within a line that have the same styles, and omits the `{}` after
+# escapes when the following character ends the control word anyway.  Raw
+# LaTeX from `escapeinside`, `texcomments`, and `mathescape` may contain
+# declarations like `\bfseries`, so text after it within a line is always
+# kept in a group, which is `{...}` if there is no `\PYG`, and tokens after
+# it are never merged into that group.  The result is typeset identically.  Line breaking with the `fvextra` options
+# `breakbytoken` and `breakbytokenanywhere` depends on the individual tokens,
+# so the `minted` LaTeX package doesn't request compact output when either
+# option is enabled.
+
+_escape_names: dict[str, str] = {
+    '\\': 'Zbs',
+    '{': 'Zob',
+    '}': 'Zcb',
+    '^': 'Zca',
+    '_': 'Zus',
+    '&': 'Zam',
+    '<': 'Zlt',
+    '>': 'Zgt',
+    '#': 'Zsh',
+    '%': 'Zpc',
+    '$': 'Zdl',
+    '-': 'Zhy',
+    "'": 'Zsq',
+    '"': 'Zdq',
+    '~': 'Zti',
+}
+_escape_re = re.compile('[' + re.escape(''.join(_escape_names)) + ']')
+_style_macro_re = re.compile(r'@(bf|it|ul|ff|tc|bc)')
+
+# Characters that end a control word and are never skipped after one.  Spaces
+# are only safe within verbatim environments, where they are active, so they
+# are not included.  `@` may be a letter.
+_control_word_terminators: frozenset[str] = frozenset((string.digits + string.punctuation).replace('@', ''))
+
+
+
+
+def compact_escape_tex(text: str, commandprefix: str, next_char: str | None) -> str:
+    '''
+    Escape text like `pygments.formatters.latex.escape_tex()`, omitting `{}`
+    after escapes where possible.  `next_char` is the character that will
+    follow the escaped text, or `None` if that is unknown.
+    '''
+    def replace(match: re.Match) -> str:
+        end = match.end()
+        following = text[end] if end < len(text) else next_char
+        if following is not None and following in _control_word_terminators:
+            return f'\\{commandprefix}{_escape_names[match.group()]}'
+        return f'\\{commandprefix}{_escape_names[match.group()]}{{}}'
+    return _escape_re.sub(replace, text)
+
+
+
+
+class CompactLatexFormatter(LatexFormatter):
+    '''
+    `LatexFormatter` with compact output for the style given by the `style`
+    option.  Output is only valid with the style definitions for that style.
+    '''
+    name = 'LaTeX (compact)'
+    aliases = []
+    filenames = []
+
+    def __init__(self, **options):
+        LatexFormatter.__init__(self, **options)
+        self._styleval_cache: dict[_TokenType, str] = {}
+        # Formatting macros (`\PYG@bf`, `\PYG@tc`, etc.) that each style
+        # definition sets
+        self._style_macros: dict[str, frozenset[str]] = {
+            name: frozenset(_style_macro_re.findall(cmndef)) for name, cmndef in self.cmd2def.items()
+        }
+
+    def _styleval(self, ttype: _TokenType) -> str:
+        # The styles that `LatexFormatter` would use, less those without
+        # definitions and those whose formatting macros are all set again by
+        # a later style
+        try:
+            return self._styleval_cache[ttype]
+        except KeyError:
+            pass
+        styles: list[str] = []
+        later_macros: set[str] = set()
+        t = ttype
+        while t is not Token:
+            try:
+                name = self.ttype2name[t]
+            except KeyError:
+                name = _get_ttype_name(t)
+            if name in self.cmd2def and not self._style_macros[name] <= later_macros:
+                styles.append(name)
+                later_macros.update(self._style_macros[name])
+            t = t.parent
+        styleval = self._styleval_cache[ttype] = '+'.join(reversed(styles))
+        return styleval
+
+    def _segments(self, ttype: _TokenType, value: str) -> list[tuple[str, bool]]:
+        # Split a token value into text that needs escaping and raw LaTeX,
+        # in the same way as `LatexFormatter.format_unencoded()`.  Segments
+        # are `(text, is_raw)`.
+        if ttype in Token.Comment:
+            if self.texcomments:
+                start = value[0:1]
+                for i in range(1, len(value)):
+                    if start[0] != value[i]:
+                        break
+                    start += value[i]
+                return [(start, False), (value[len(start):], True)]
+            if self.mathescape:
+                segments: list[tuple[str, bool]] = []
+                for i, part in enumerate(value.split('$')):
+                    if i > 0:
+                        segments.append(('$', True))
+                    segments.append((part, i % 2 == 1))
+                return segments
+            if self.escapeinside:
+                segments = []
+                text = value
+                while text:
+                    a, sep1, text = text.partition(self.left)
+                    if sep1:
+                        b, sep2, text = text.partition(self.right)
+                        if sep2:
+                            segments.append((a, False))
+                            segments.append((b, True))
+                        else:
+                            segments.append((a + sep1 + b, False))
+                    else:
+                        segments.append((a, False))
+                return segments
+            return [(value, False)]
+        if ttype in Token.Escape:
+            return [(value, True)]
+        return [(value, False)]
+
+    def _write_run(self, outfile: TextIO, styleval: str, run: list[tuple[str, bool]]):
+        cp = self.commandprefix
+        grouped = bool(styleval) or any(is_raw for _, is_raw in run)
+        parts: list[str] = []
+        for n, (text, is_raw) in enumerate(run):
+            if is_raw:
+                parts.append(text)
+                continue
+            if n + 1 < len(run):
+                next_char = run[n+1][0][0]
+            elif grouped:
+                next_char = '}'
+            else:
+                next_char = None
+            parts.append(compact_escape_tex(text, cp, next_char))
+        if styleval:
+            outfile.write(f'\\{cp}{{{styleval}}}{{{"".join(parts)}}}')
+        elif grouped:
+            outfile.write(f'{{{"".join(parts)}}}')
+        else:
+            outfile.write(''.join(parts))
+
+    def format_unencoded(self, tokensource: Iterable[tuple[_TokenType, str]], outfile: TextIO):
+        if self.full:
+            # Standalone documents are never used by minted
+            return LatexFormatter.format_unencoded(self, tokensource, outfile)
+
+        if not self.nowrap:
+            outfile.write('\\begin{' + self.envname + '}[commandchars=\\\\\\{\\}')
+            if self.linenos:
+                start, step = self.linenostart, self.linenostep
+                outfile.write(',numbers=left' +
+                              (start and ',firstnumber=%d' % start or '') +
+                              (step and ',stepnumber=%d' % step or ''))
+            if self.mathescape or self.texcomments or self.escapeinside:
+                outfile.write(',codes={\\catcode`\\$=3\\catcode`\\^=7'
+                              '\\catcode`\\_=8\\relax}')
+            if self.verboptions:
+                outfile.write(',' + self.verboptions)
+            outfile.write(']\n')
+
+        # The current run of text within a line that has the same styles, as
+        # a list of segments in which adjacent segments differ in whether
+        # they are raw
+        run_styleval: str = ''
+        run: list[tuple[str, bool]] = []
+        run_has_raw: bool = False
+        for ttype, value in tokensource:
+            styleval = self._styleval(ttype)
+            if run_has_raw:
+                # Raw LaTeX applies until the end of its token, so it is never
+                # merged with a following token
+                self._write_run(outfile, run_styleval, run)
+                run = []
+                run_has_raw = False
+            for text, is_raw in self._segments(ttype, value):
+                lines = text.split('\n')
+                for line_number, line in enumerate(lines):
+                    if line_number > 0:
+                        if run:
+                            self._write_run(outfile, run_styleval, run)
+                            run = []
+                            run_has_raw = False
+                        outfile.write('\n')
+                    if not line:
+                        continue
+                    if run and styleval != run_styleval:
+                        self._write_run(outfile, run_styleval, run)
+                        run = []
+                    run_styleval = styleval
+                    if run and run[-1][1] == is_raw:
+                        run[-1] = (run[-1][0] + line, is_raw)
+                    else:
+                        run.append((line, is_raw))
+                    run_has_raw = run_has_raw or is_raw
+        if run:
+            self._write_run(outfile, run_styleval, run)
+
+        if not self.nowrap:
+            outfile.write('\\end{' + self.envname + '}\n')
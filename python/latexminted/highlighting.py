@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024-2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import re
+import textwrap
+from typing import Any, Callable
+from pygments.filter import Filter
+from pygments.filters import get_filter_by_name
+from pygments.formatters.latex import LatexFormatter
+from pygments.lexer import Lexer
+from pygments.token import Keyword
+from pygments.util import ClassNotFound
+from .err import CustomLexerError
+from .escapeinside import EscapeInsideLexer
+from .filters import fuse_filters
+from .formatter import CompactLatexFormatter
+from .keywords import extra_keywords_lexer_class
+from .messages import Messages
+from .registry import find_lexer_class_by_name, get_style_by_name
+
+
+
+
+# This module contains the parts of highlighting that do not depend on LaTeX
+# security settings:  processing options, preprocessing code, and creating
+# Pygments lexers and formatters.  It is used by `highlight()` within LaTeX
+# and by the `latexminted.api` library interface.
+
+# Some Pygments options are given a different name in LaTeX.  These are always
+# referred to by their names in LaTeX.  Options are translated using this dict
+# immediately before being passed to Pygments.
+pygments_translations: dict[str, str] = {
+    'gobblefilter': 'gobble',
+    'literalenvname': 'envname',
+}
+
+# Sets and dicts for checking Python-related options and converting values to
+# Python types
+bool_keys: set[str] = set([
+    'autogobble',
+    'compactoutput',
+    'funcnamehighlighting',
+    'mathescape',
+    'python3',
+    'rangeregexdotall',
+    'rangeregexmultiline',
+    'startinline',
+    'stripall',
+    'stripnl',
+    'texcl',
+    'texcomments',
+    'tokenmerge',
+])
+nonnegative_int_re = re.compile('[1-9][0-9]*|0')
+nonnegative_int_or_none_keys: set[str] = set([
+    'gobble',
+    'gobblefilter',
+])
+positive_int_re = re.compile('[1-9][0-9]*')
+positive_int_keys: set[str] = set([
+    'rangeregexmatchnumber',
+])
+other_keys_value_sets: dict[str, set[str]] = {
+    'keywordcase': set(['lower', 'upper', 'capitalize', 'none']),
+}
+other_keys_comma_or_space_delim_set = set([
+    'extrakeywords',
+    'extrakeywordsconstant',
+    'extrakeywordsdeclaration',
+    'extrakeywordsnamespace',
+    'extrakeywordspseudo',
+    'extrakeywordsreserved',
+    'extrakeywordstype',
+])
+other_keys_unchecked_str_value: set[str] = set([
+    'codetagify',
+    'commandprefix',
+    'encoding',
+    'literalenvname',
+    'literatecomment',
+    'escapeinside',
+    'lexer',
+    'rangestartstring',
+    'rangestartstringline',
+    'rangestartafterstring',
+    'rangestartafterstringline',
+    'rangestopstring',
+    'rangestopstringline',
+    'rangestopbeforestring',
+    'rangestopbeforestringline',
+    'rangeregex',
+    'style',
+])
+all_keys = bool_keys | nonnegative_int_or_none_keys | positive_int_keys | set(other_keys_value_sets) | other_keys_unchecked_str_value
+
+# Keys for manipulating code within Python
+code_keys = set([
+    'autogobble',
+    'gobble',
+    'literatecomment',
+    'rangestartstring',
+    'rangestartstringline',
+    'rangestartafterstring',
+    'rangestartafterstringline',
+    'rangestopstring',
+    'rangestopstringline',
+    'rangestopbeforestring',
+    'rangestopbeforestringline',
+    'rangeregex',
+    'rangeregexmatchnumber',
+    'rangeregexdotall',
+    'rangeregexmultiline',
+])
+# Keys for creating customized subclasses of Pygments lexers
+custom_lexer_keys = set([
+    'extrakeywords',
+    'extrakeywordsconstant',
+    'extrakeywordsdeclaration',
+    'extrakeywordsnamespace',
+    'extrakeywordspseudo',
+    'extrakeywordsreserved',
+    'extrakeywordstype',
+])
+# Categorize Pygments options into lexer, filter, or formatter
+lexer_keys: set[str] = set([
+    'funcnamehighlighting',
+    'python3',
+    'startinline',
+    'stripall',
+    'stripnl',
+])
+filter_keys_no_options: set[str] = set([
+    'tokenmerge',
+])
+filter_keys_one_option: dict[str, str] = {
+    'codetagify': 'codetags',
+    'keywordcase': 'case',
+    'gobblefilter': 'n',
+}
+filter_keys_one_option_preproc: dict[str, Callable[[str], str | list[str]]] = {
+    'codetagify': lambda x: [x_i.strip() for x_i in x.split(',')] if ',' in x else x
+}
+filter_keys = filter_keys_no_options | set(filter_keys_one_option)
+formatter_keys: set[str] = set([
+    'commandprefix',
+    'compactoutput',
+    'literalenvname',
+    'escapeinside',
+    'mathescape',
+    'style',
+    'texcl',
+    'texcomments',
+])
+# Formatter keys that select the formatter rather than being passed to it
+formatter_keys_minted: set[str] = set([
+    'compactoutput',
+    'style',
+])
+pygments_keys = lexer_keys | filter_keys | formatter_keys
+
+
+
+
+def process_highlight_data(*, messages: Messages, data: dict[str, Any]) -> tuple[dict[str, Any], ...] | None:
+    minted_opts: dict[str, str] = {k: v for k, v in data.items() if k != 'pyopt'}
+    py_opts = {}
+    code_opts = {}
+    custom_lexer_opts = {}
+    lexer_opts = {}
+    filter_opts = {}
+    formatter_opts = {}
+
+    for k, v in data['pyopt'].items():
+        if k in lexer_keys:
+            current_opts = lexer_opts
+        elif k in filter_keys:
+            current_opts = filter_opts
+        elif k in formatter_keys:
+            current_opts = formatter_opts
+        elif k in code_keys:
+            current_opts = code_opts
+        elif k in custom_lexer_keys:
+            current_opts = custom_lexer_opts
+        elif k in all_keys:
+            current_opts = py_opts
+        else:
+            messages.append_error(rf'Key "{k}" is unknown and will be ignored')
+            continue
+
+        if k in bool_keys:
+            if v in ('true', 'false'):
+                current_opts[k] = v == 'true'
+            else:
+                messages.append_error(rf'Key "{k}" has invalid value \detokenize{{"{v}"}} (expected "true" or "false")')
+        elif k in nonnegative_int_or_none_keys:
+            if v == 'none':
+                current_opts[k] = 0
+            elif nonnegative_int_re.fullmatch(v):
+                current_opts[k] = int(v)
+            else:
+                messages.append_error(rf'Key "{k}" has invalid value \detokenize{{"{v}"}} (expected non-negative integer or "none")')
+        elif k in positive_int_keys:
+            if positive_int_re.fullmatch(v):
+                current_opts[k] = int(v)
+            else:
+                messages.append_error(rf'Key "{k}" has invalid value \detokenize{{"{v}"}} (expected positive integer)')
+        elif k in other_keys_value_sets:
+            if v in other_keys_value_sets[k]:
+                if v == 'none':
+                    current_opts[k] = None
+                else:
+                    current_opts[k] = v
+            else:
+                valid_options = ', '.join(f'"{opt}"' for opt in other_keys_value_sets[k])
+                messages.append_error(rf'Key "{k}" has invalid value \detokenize{{"{v}"}} (expected {valid_options})')
+        elif k in other_keys_comma_or_space_delim_set:
+            if ',' in v:
+                current_opts[k] = set(v_i for v_i in (x.strip() for x in v.split(',')) if v_i)
+            else:
+                current_opts[k] = set(v_i for v_i in (x.strip() for x in v.split(' ')) if v_i)
+        elif k in other_keys_unchecked_str_value:
+            current_opts[k] = v
+        else:
+            raise TypeError(rf'Key "{k}" lacks a type checking function')
+
+    # Additional data processing
+    if 'inputfilemdfivesum' in minted_opts:
+        minted_opts['inputfilemdfivesum'] = minted_opts['inputfilemdfivesum'].lower()
+
+    if messages.has_errors():
+        return None
+    return minted_opts, py_opts, code_opts, custom_lexer_opts, lexer_opts, filter_opts, formatter_opts
+
+
+
+
+
+def preprocess_code(code: str, *, messages: Messages,
+                    autogobble: bool, gobble: int, literatecomment: str,
+                    rangestartstring: str, rangestartstringline: str,
+                    rangestartafterstring: str, rangestartafterstringline: str,
+                    rangestopstring: str, rangestopstringline: str,
+                    rangestopbeforestring: str, rangestopbeforestringline: str,
+                    rangeregex: str, rangeregexmatchnumber: int, rangeregexdotall: bool, rangeregexmultiline: bool) -> str | None:
+    start_string_options = (rangestartstring, rangestartstringline, rangestartafterstring, rangestartafterstringline)
+    stop_string_options = (rangestopstring, rangestopstringline, rangestopbeforestring, rangestopbeforestringline)
+    if rangeregex and (any(start_string_options) or any(stop_string_options)):
+        messages.append_error('Cannot use "rangeregex" at the same time as range string options')
+        return
+    if sum(1 for x in start_string_options if x) > 1:
+        messages.append_error('Cannot use multiple "rangestart" options at the same time')
+        return
+    if sum(1 for x in stop_string_options if x) > 1:
+        messages.append_error('Cannot use multiple "rangestop" options at the same time')
+        return
+
+    if rangeregex:
+        try:
+            flags = re.NOFLAG
+        except AttributeError:  # Python < 3.11
+            flags = re.RegexFlag(0)
+        if rangeregexdotall:
+            flags |= re.DOTALL
+        if rangeregexmultiline:
+            flags |= re.MULTILINE
+        try:
+            pattern = re.compile(rangeregex, flags)
+        except Exception as e:
+            messages.append_error(
+                rf'Failed to compile "rangeregex" regular expression (see \detokenize{{{messages.errlog_file_name}}} if it exists)'
+            )
+            messages.append_errlog(e)
+            return
+        regex_match: re.Match | None = None
+        did_match: bool = False
+        for n, match_n in enumerate(pattern.finditer(code), start=1):
+            did_match = True
+            if n == rangeregexmatchnumber:
+                regex_match = match_n
+                break
+        if not did_match:
+            messages.append_error('Failed to find match with regular expression "rangeregex"')
+            return
+        if not regex_match:
+            messages.append_error(f'Failed to find match number {rangeregexmatchnumber} with regular expression "rangeregex"')
+            return
+        code = regex_match.group()
+
+    if rangestartstring:
+        index = code.find(rangestartstring)
+        if index == -1:
+            messages.append_error('Failed to find string for "rangestartstring"')
+            return
+        code = code[index:]
+    if rangestartstringline:
+        string_index = code.find(rangestartstringline)
+        if string_index == -1:
+            messages.append_error('Failed to find string for "rangestartstringline"')
+            return
+        newline_index = code.rfind('\n', 0, string_index)
+        index = newline_index + 1
+        code = code[index:]
+    if rangestartafterstring:
+        index = code.find(rangestartafterstring)
+        if index == -1:
+            messages.append_error('Failed to find string for "rangestartafterstring"')
+            return
+        code = code[index+len(rangestartafterstring):]
+    if rangestartafterstringline:
+        string_index = code.find(rangestartafterstringline)
+        if string_index == -1:
+            messages.append_error('Failed to find string for "rangestartafterstringline"')
+            return
+        newline_index = code.find('\n', string_index + len(rangestartafterstring))
+        if newline_index == -1:
+            index = len(code)
+        else:
+            index = newline_index + 1
+        code = code[index:]
+
+    if rangestopstring:
+        index = code.find(rangestopstring)
+        if index == -1:
+            messages.append_error('Failed to find string for "rangestopstring"')
+            return
+        code = code[:index+len(rangestopstring)]
+    if rangestopstringline:
+        string_index = code.find(rangestopstringline)
+        if string_index == -1:
+            messages.append_error('Failed to find string for "rangestopstringline"')
+            return
+        newline_index = code.find('\n', string_index + len(rangestopstringline))
+        if newline_index == -1:
+            index = len(code)
+        else:
+            index = newline_index + 1
+        code = code[:index]
+    if rangestopbeforestring:
+        index = code.find(rangestopbeforestring)
+        if index == -1:
+            messages.append_error('Failed to find string for "rangestopbeforestring"')
+            return
+        code = code[:index]
+    if rangestopbeforestringline:
+        string_index = code.find(rangestopbeforestringline)
+        if string_index == -1:
+            messages.append_error('Failed to find string for "rangestopbeforestringline"')
+            return
+        newline_index = code.rfind('\n', 0, string_index)
+        index = newline_index + 1
+        code = code[:index]
+
+    if literatecomment:
+        code_lines = code.splitlines(True)
+        if all(line.startswith(literatecomment) for line in code_lines):
+            len_literatecomment = len(literatecomment)
+            code = ''.join(line[len_literatecomment:] for line in code_lines)
+    if autogobble:
+        code = textwrap.dedent(code)
+    if gobble:
+        code = ''.join(line[gobble:] or '\n' for line in code.splitlines(True))
+
+    if not code.endswith('\n'):
+        code += '\n'
+
+    return code
+
+
+
+
+def make_lexer_and_formatter(*, messages: Messages, py_opts: dict[str, Any], custom_lexer_opts: dict[str, Any],
+                             lexer_opts: dict[str, Any], filter_opts: dict[str, Any], formatter_opts: dict[str, Any],
+                             load_custom_lexer: Callable[[str], type[Lexer]] | None = None
+                             ) -> tuple[Lexer, LatexFormatter] | None:
+    '''
+    Create the Pygments lexer (with filters) and formatter for processed
+    highlighting options.  Custom lexers in standalone Python files are only
+    available when a `load_custom_lexer` function is provided, since loading
+    them depends on LaTeX security settings.
+    '''
+    translated_lexer_opts = {pygments_translations.get(k, k): v for k, v in lexer_opts.items()}
+    pygments_lexer: Lexer
+    try:
+        PygmentsLexer = find_lexer_class_by_name(py_opts['lexer'])
+    except ClassNotFound:
+        if not py_opts['lexer'].endswith('.py') and '.py:' not in py_opts['lexer']:
+            messages.append_error(rf'''Pygments lexer \detokenize{{"{py_opts['lexer']}"}} is unknown''')
+            return
+        if load_custom_lexer is None:
+            messages.append_error(
+                rf'''Custom lexer \detokenize{{"{py_opts['lexer']}"}} can only be used when latexminted runs within LaTeX'''
+            )
+            return
+        try:
+            PygmentsLexer = load_custom_lexer(py_opts['lexer'])
+        except CustomLexerError as e:
+            messages.append_error(rf'\detokenize{{{str(e)}}}')
+            return
+        except Exception as e:
+            messages.append_error(
+                rf'''Failed to load custom lexer \detokenize{{"{py_opts['lexer']}"}}; see \detokenize{{{messages.errlog_file_name}}} if it exists''')
+            messages.append_errlog(e)
+            return
+
+    if any(custom_lexer_opts.values()):
+        extra_tokens = {}
+        for v in custom_lexer_opts['extrakeywords']:
+            extra_tokens[v] = Keyword
+        for v in custom_lexer_opts['extrakeywordsconstant']:
+            extra_tokens[v] = Keyword.Constant
+        for v in custom_lexer_opts['extrakeywordsdeclaration']:
+            extra_tokens[v] = Keyword.Declaration
+        for v in custom_lexer_opts['extrakeywordsnamespace']:
+            extra_tokens[v] = Keyword.Namespace
+        for v in custom_lexer_opts['extrakeywordspseudo']:
+            extra_tokens[v] = Keyword.Pseudo
+        for v in custom_lexer_opts['extrakeywordsreserved']:
+            extra_tokens[v] = Keyword.Reserved
+        for v in custom_lexer_opts['extrakeywordstype']:
+            extra_tokens[v] = Keyword.Type
+
+        PygmentsLexer = extra_keywords_lexer_class(PygmentsLexer, extra_tokens)
+
+    pygments_lexer = PygmentsLexer(**translated_lexer_opts)
+
+    # Filters are created first and then added, so that they can be fused
+    filters: list[Filter] = []
+    for filter_name in filter_keys_no_options:
+        if filter_opts[filter_name]:
+            filters.append(get_filter_by_name(pygments_translations.get(filter_name, filter_name)))
+    for filter_name, opt_name in filter_keys_one_option.items():
+        if filter_opts[filter_name]:
+            if filter_name in filter_keys_one_option_preproc:
+                filters.append(get_filter_by_name(
+                    pygments_translations.get(filter_name, filter_name),
+                    **{opt_name: filter_keys_one_option_preproc[filter_name](filter_opts[filter_name])}
+                ))
+            else:
+                filters.append(get_filter_by_name(
+                    pygments_translations.get(filter_name, filter_name),
+                    **{opt_name: filter_opts[filter_name]}
+                ))
+    for pygments_filter in fuse_filters(filters):
+        pygments_lexer.add_filter(pygments_filter)
+    escapeinside: str = formatter_opts.get('escapeinside', '')
+    if len(escapeinside) == 2:
+        pygments_lexer = EscapeInsideLexer(escapeinside[0], escapeinside[1], pygments_lexer)
+
+    translated_formatter_opts = {
+        pygments_translations.get(k, k): v for k, v in formatter_opts.items() if k not in formatter_keys_minted
+    }
+    pygments_formatter: LatexFormatter
+    if formatter_opts.get('compactoutput'):
+        # Compact output depends on which tokens have style definitions
+        style = formatter_opts.get('style', 'default')
+        try:
+            StyleClass = get_style_by_name(style)
+        except ClassNotFound:
+            messages.append_error(rf'Pygments style \detokenize{{"{style}"}} was not found')
+            return
+        pygments_formatter = CompactLatexFormatter(style=StyleClass, **translated_formatter_opts)
+    else:
+        pygments_formatter = LatexFormatter(**translated_formatter_opts)
+
+    return pygments_lexer, pygments_formatter
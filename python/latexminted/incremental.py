@@ -0,0 +1,628 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import hashlib
+import io
+from json import dumps as json_dumps
+from typing import Any, Iterator
+from pygments import __version__ as pygments_version
+from pygments.filter import apply_filters
+from pygments.formatter import Formatter
+from pygments.lexer import Lexer, RegexLexer, ExtendedRegexLexer
+from pygments.token import _TokenType, Error, string_to_tokentype, Whitespace
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:
+    # Python < 3.11
+    import sre_constants  # type: ignore
+    import sre_parse  # type: ignore
+
+
+
+
+# Incremental re-highlighting of large input files.  When a `RegexLexer`
+# lexes a file, the lexer state stack is recorded at periodic line
+# boundaries ("checkpoints") and saved along with all tokens.  When a modified
+# version of the same file is highlighted later, lexing resumes from the last
+# checkpoint that cannot have been affected by the modification, and stops as
+# soon as the lexer reaches a checkpoint after the modification with the same
+# state stack.  Tokens before and after that are reused.
+#
+# A checkpoint is only valid for resuming if all regex match attempts before
+# it only examined text before the first modified line.  Regexes are analyzed
+# to determine how many newlines each can consume (including lookahead), and
+# each checkpoint records the last line that any previous match attempt could
+# have reached.  Lines are counted as non-blank lines, so that a repeated
+# whitespace character class like `\s+` counts as a single newline:  it can
+# consume any number of newlines, but only by consuming blank lines in
+# between.  Regexes that can consume an unlimited number of newlines
+# otherwise make all following checkpoints invalid for resuming, but they can
+# still be used for stopping, which only depends on the text after the
+# checkpoint.
+#
+# This only supports lexers that use the standard `RegexLexer` algorithm with
+# token types, `bygroups()`, and `using()` as actions, since arbitrary
+# callbacks could depend on other state.  Output is always identical to
+# lexing the full file.
+
+checkpoint_format_version = 1
+checkpoint_interval_lines = 50
+
+# Line reach for regexes that can consume an unlimited number of newlines
+_unbounded = 1 << 60
+# Line reach for regexes that only examine text up to the end of the match
+_dynamic = -1
+
+
+
+
+def _is_whitespace_set(op: Any, av: Any) -> bool:
+    if op is sre_constants.LITERAL:
+        return chr(av).isspace()
+    if op is not sre_constants.IN:
+        return False
+    for item_op, item_av in av:
+        if item_op is sre_constants.LITERAL:
+            if not chr(item_av).isspace():
+                return False
+        elif item_op is sre_constants.RANGE:
+            if item_av[1] - item_av[0] > 64 or not all(chr(c).isspace() for c in range(item_av[0], item_av[1] + 1)):
+                return False
+        elif item_op is sre_constants.CATEGORY:
+            if item_av not in (sre_constants.CATEGORY_SPACE, sre_constants.CATEGORY_LINEBREAK):
+                return False
+        else:
+            return False
+    return True
+
+
+def _set_can_match_newline(items: list[tuple[Any, Any]]) -> bool:
+    negate = False
+    matches = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            if av == 10:
+                matches = True
+        elif op is sre_constants.RANGE:
+            if av[0] <= 10 <= av[1]:
+                matches = True
+        elif op is sre_constants.CATEGORY:
+            if av in (sre_constants.CATEGORY_NOT_DIGIT, sre_constants.CATEGORY_SPACE,
+                      sre_constants.CATEGORY_NOT_WORD, sre_constants.CATEGORY_LINEBREAK):
+                matches = True
+        else:
+            return True
+    return matches != negate
+
+
+def _max_newlines(subpattern: Any, dotall: bool) -> int | None:
+    '''
+    Maximum number of newlines that a parsed regex can consume, including
+    newlines in lookahead, with each unlimited repeat of a whitespace
+    character class counted as a single newline.  `None` means unlimited.
+    '''
+    total = 0
+    for op, av in subpattern:
+        n: int | None
+        if op is sre_constants.LITERAL:
+            n = 1 if av == 10 else 0
+        elif op is sre_constants.NOT_LITERAL:
+            n = 0 if av == 10 else 1
+        elif op is sre_constants.ANY:
+            n = 1 if dotall else 0
+        elif op is sre_constants.IN:
+            n = 1 if _set_can_match_newline(av) else 0
+        elif op is sre_constants.AT:
+            n = 0
+        elif op is sre_constants.BRANCH:
+            n = 0
+            for branch in av[1]:
+                n_branch = _max_newlines(branch, dotall)
+                if n_branch is None:
+                    return None
+                n = max(n, n_branch)
+        elif op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, p = av
+            n = _max_newlines(p, (dotall or bool(add_flags & sre_parse.SRE_FLAG_DOTALL)) and
+                              not del_flags & sre_parse.SRE_FLAG_DOTALL)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                    getattr(sre_constants, 'POSSESSIVE_REPEAT', sre_constants.MAX_REPEAT)):
+            _, max_repeat, p = av
+            n = _max_newlines(p, dotall)
+            if n is not None and n > 0:
+                if max_repeat != sre_constants.MAXREPEAT:
+                    n = n * max_repeat
+                elif len(p) == 1 and _is_whitespace_set(*p[0]):
+                    n = 1
+                else:
+                    n = None
+        elif op is getattr(sre_constants, 'ATOMIC_GROUP', None):
+            n = _max_newlines(av, dotall)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            direction, p = av
+            n = _max_newlines(p, dotall) if direction == 1 else 0
+        elif op is sre_constants.GROUPREF_EXISTS:
+            _, p_yes, p_no = av
+            n = _max_newlines(p_yes, dotall)
+            if n is not None and p_no is not None:
+                n_no = _max_newlines(p_no, dotall)
+                n = None if n_no is None else max(n, n_no)
+        else:
+            return None
+        if n is None:
+            return None
+        total += n
+    return total
+
+
+def _max_lookbehind(subpattern: Any) -> int:
+    '''
+    Maximum number of characters before the current position that a parsed
+    regex can examine.
+    '''
+    width = 0
+    for op, av in subpattern:
+        if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            direction, p = av
+            if direction == -1:
+                width = max(width, p.getwidth()[1])
+            width = max(width, _max_lookbehind(p))
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                width = max(width, _max_lookbehind(branch))
+        elif op is sre_constants.SUBPATTERN:
+            width = max(width, _max_lookbehind(av[3]))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                    getattr(sre_constants, 'POSSESSIVE_REPEAT', sre_constants.MAX_REPEAT)):
+            width = max(width, _max_lookbehind(av[2]))
+        elif op is getattr(sre_constants, 'ATOMIC_GROUP', None):
+            width = max(width, _max_lookbehind(av))
+        elif op is sre_constants.GROUPREF_EXISTS:
+            width = max(width, _max_lookbehind(av[1]))
+            if av[2] is not None:
+                width = max(width, _max_lookbehind(av[2]))
+    return width
+
+
+def _is_supported_action(action: Any) -> bool:
+    if action is None or type(action) is _TokenType:
+        return True
+    if getattr(action, '__module__', None) != 'pygments.lexer':
+        return False
+    qualname = getattr(action, '__qualname__', None)
+    if qualname == 'using.<locals>.callback':
+        return True
+    if qualname == 'bygroups.<locals>.callback':
+        for cell in action.__closure__ or ():
+            if isinstance(cell.cell_contents, tuple):
+                return all(_is_supported_action(group_action) for group_action in cell.cell_contents)
+        return False
+    return False
+
+
+
+
+def _is_run(subpattern: Any) -> bool:
+    '''
+    Whether a parsed regex is a single repeated character class, like
+    `[^"]+`.  The regex then only examines text up to the end of the match,
+    plus the following character.
+    '''
+    items = list(subpattern)
+    while len(items) == 1 and items[0][0] is sre_constants.SUBPATTERN:
+        items = list(items[0][1][3])
+    if len(items) != 1:
+        return False
+    op, av = items[0]
+    if op not in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT,
+                  getattr(sre_constants, 'POSSESSIVE_REPEAT', sre_constants.MAX_REPEAT)):
+        return False
+    min_repeat, max_repeat, p = av
+    return (min_repeat <= 1 and max_repeat == sre_constants.MAXREPEAT and len(p) == 1 and
+            p[0][0] in (sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.IN, sre_constants.ANY))
+
+
+class _LexerAnalysis(object):
+    '''
+    For each state of a lexer class, the maximum number of non-blank lines
+    beyond the current line that match attempts can examine when the first
+    `n` rules of the state fail (index `n`), and that rule `n` can examine
+    when it matches (index `n`; `_dynamic` means up to the end of the match).
+    Plus the maximum number of characters before the current position that
+    any rule can examine.
+    '''
+    def __init__(self, tokendefs: dict[str, list[tuple[Any, Any, Any]]]):
+        self.state_fail_reach: dict[str, list[int]] = {}
+        self.state_match_reach: dict[str, list[int]] = {}
+        self.lookbehind: int = 1
+        for state, rules in tokendefs.items():
+            fail_reach_list: list[int] = [0]
+            match_reach_list: list[int] = []
+            for rexmatch, _, _ in rules:
+                pattern = rexmatch.__self__
+                parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+                n = _max_newlines(parsed, bool(parsed.state.flags & sre_parse.SRE_FLAG_DOTALL))
+                if n is not None:
+                    fail_reach_list.append(max(fail_reach_list[-1], n))
+                    match_reach_list.append(n)
+                elif _is_run(parsed):
+                    # Can only fail at the first character
+                    fail_reach_list.append(fail_reach_list[-1])
+                    match_reach_list.append(_dynamic)
+                else:
+                    fail_reach_list.append(_unbounded)
+                    match_reach_list.append(_unbounded)
+                self.lookbehind = max(self.lookbehind, _max_lookbehind(parsed))
+            self.state_fail_reach[state] = fail_reach_list
+            self.state_match_reach[state] = match_reach_list
+
+
+_standard_regex_lexer_cache: dict[type[Lexer], bool] = {}
+
+def is_standard_regex_lexer(lexer: Lexer) -> bool:
+    '''
+    Whether a lexer is one of Pygments' built-in `RegexLexer`s that uses the
+    standard lexing algorithm, with only token types, `bygroups()`, and
+    `using()` as actions.  Lexing then only depends on the position in the
+    text and the state stack, so it can be resumed from any point where those
+    are known.
+    '''
+    lexer_class = type(lexer)
+    try:
+        return _standard_regex_lexer_cache[lexer_class]
+    except KeyError:
+        pass
+    is_standard = False
+    if (isinstance(lexer, RegexLexer) and not isinstance(lexer, ExtendedRegexLexer) and
+            lexer_class.__module__.startswith('pygments.lexers.') and
+            lexer_class.get_tokens is Lexer.get_tokens and
+            lexer_class.get_tokens_unprocessed is RegexLexer.get_tokens_unprocessed and
+            hasattr(lexer, '_preprocess_lexer_input')):
+        is_standard = all(
+            _is_supported_action(action) and
+            (new_state is None or isinstance(new_state, (tuple, int)) or new_state == '#push')
+            for rules in lexer._tokens.values() for _, action, new_state in rules
+        )
+    _standard_regex_lexer_cache[lexer_class] = is_standard
+    return is_standard
+
+
+_lexer_analysis_cache: dict[type[Lexer], _LexerAnalysis | None] = {}
+
+def _lexer_analysis(lexer: Lexer) -> _LexerAnalysis | None:
+    lexer_class = type(lexer)
+    try:
+        return _lexer_analysis_cache[lexer_class]
+    except KeyError:
+        pass
+    analysis: _LexerAnalysis | None = None
+    if is_standard_regex_lexer(lexer):
+        try:
+            analysis = _LexerAnalysis(lexer._tokens)
+        except Exception:
+            analysis = None
+    _lexer_analysis_cache[lexer_class] = analysis
+    return analysis
+
+
+def supports_incremental_lexing(lexer: Lexer) -> bool:
+    '''
+    Whether a lexer can be used for incremental lexing.  Only Pygments'
+    built-in `RegexLexer`s without custom token processing are supported.
+    '''
+    return _lexer_analysis(lexer) is not None
+
+
+def checkpoint_key(*, input_file: str, lexer: Lexer) -> str:
+    '''
+    Key for the checkpoints of an input file.  Checkpoints can only be reused
+    for the same file with the same lexer, lexer options, and Pygments
+    version.
+    '''
+    lexer_class = type(lexer)
+    key_data = {
+        'file': input_file,
+        'lexer': f'{lexer_class.__module__}.{lexer_class.__qualname__}',
+        'options': lexer.options,
+        'pygments': pygments_version,
+        'version': checkpoint_format_version,
+    }
+    hasher = hashlib.md5()
+    hasher.update(json_dumps(key_data, sort_keys=True, default=str).encode('utf8'))
+    return hasher.hexdigest()
+
+
+
+
+class _Checkpoint(object):
+    __slots__ = ('pos', 'line', 'reach', 'stack')
+
+    def __init__(self, pos: int, line: int, reach: int, stack: tuple[str, ...]):
+        self.pos = pos
+        self.line = line
+        # Last line that any match attempt before `pos` could have examined,
+        # as an index of non-blank lines
+        self.reach = reach
+        self.stack = stack
+
+
+class _PreviousLex(object):
+    '''
+    Text, tokens, and checkpoints from a previous lex, loaded from checkpoint
+    data.
+    '''
+    def __init__(self, data: dict[str, Any]):
+        if data['version'] != checkpoint_format_version:
+            raise ValueError
+        self.text: str = data['text']
+        tokentypes = [string_to_tokentype(t) for t in data['tokentypes']]
+        token_data: list[int] = data['tokens']
+        self.token_starts: list[int] = []
+        self.token_types: list[_TokenType] = []
+        self.token_lengths: list[int] = []
+        end = 0
+        for n in range(0, len(token_data), 3):
+            start = end + token_data[n]
+            end = start + token_data[n+2]
+            self.token_starts.append(start)
+            self.token_types.append(tokentypes[token_data[n+1]])
+            self.token_lengths.append(token_data[n+2])
+        self.checkpoints: list[_Checkpoint] = [
+            _Checkpoint(pos, line, _unbounded if reach is None else reach, tuple(stack))
+            for pos, line, reach, stack in data['checkpoints']
+        ]
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    # Binary search with slice comparisons, which is much faster than
+    # comparing characters in Python
+    lo = 0
+    hi = min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_length(a: str, b: str, max_length: int) -> int:
+    lo = 0
+    hi = max_length
+    len_a = len(a)
+    len_b = len(b)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len_a-mid:len_a-lo] == b[len_b-mid:len_b-lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+
+
+class IncrementalLexResult(object):
+    '''
+    Tokens from incremental lexing, plus checkpoint data for the next lex
+    (`None` if the tokens cannot be saved).  `relexed_chars` is the number of
+    characters that were actually lexed.
+    '''
+    def __init__(self, *, tokens: list[tuple[int, _TokenType, str]], checkpoint_data: dict[str, Any] | None,
+                 relexed_chars: int):
+        self.tokens = tokens
+        self.checkpoint_data = checkpoint_data
+        self.relexed_chars = relexed_chars
+
+
+def lex_incremental(lexer: Lexer, text: str, previous_data: dict[str, Any] | None) -> IncrementalLexResult:
+    '''
+    Lex text that has already been preprocessed by the lexer, reusing tokens
+    from `previous_data` (checkpoint data from lexing a previous version of
+    the text) where possible.  The lexer must support incremental lexing.
+    '''
+    analysis = _lexer_analysis(lexer)
+    if analysis is None:
+        raise TypeError
+    previous: _PreviousLex | None = None
+    if previous_data is not None:
+        try:
+            previous = _PreviousLex(previous_data)
+        except Exception:
+            previous = None
+
+    # Number of non-blank lines before each line
+    nonblank_lines: list[int] = [0]
+    for text_line in text.split('\n'):
+        nonblank_lines.append(nonblank_lines[-1] + 1 if text_line.strip() else nonblank_lines[-1])
+
+    tokens: list[tuple[int, _TokenType, str]] = []
+    checkpoints: list[_Checkpoint] = []
+    start = _Checkpoint(0, 0, -1, ('root',))
+    delta = 0
+    line_delta = 0
+    suffix_start = len(text)
+    previous_checkpoints: dict[int, _Checkpoint] = {}
+    if previous is not None:
+        if previous.text == text:
+            for token_start, token_type, token_length in zip(previous.token_starts, previous.token_types,
+                                                              previous.token_lengths):
+                tokens.append((token_start, token_type, text[token_start:token_start+token_length]))
+            return IncrementalLexResult(tokens=tokens, checkpoint_data=previous_data, relexed_chars=0)
+        prefix_length = _common_prefix_length(previous.text, text)
+        suffix_length = _common_suffix_length(previous.text, text,
+                                              min(len(previous.text), len(text)) - prefix_length)
+        first_changed_line = text.count('\n', 0, prefix_length)
+        for checkpoint in previous.checkpoints:
+            if checkpoint.reach >= nonblank_lines[first_changed_line]:
+                break
+            checkpoints.append(checkpoint)
+        if checkpoints:
+            start = checkpoints.pop()
+        for token_start, token_type, token_length in zip(previous.token_starts, previous.token_types,
+                                                          previous.token_lengths):
+            if token_start >= start.pos:
+                break
+            tokens.append((token_start, token_type, text[token_start:token_start+token_length]))
+        delta = len(text) - len(previous.text)
+        line_delta = text.count('\n') - previous.text.count('\n')
+        nonblank_line_delta = nonblank_lines[-1] - sum(1 for x in previous.text.split('\n') if x.strip())
+        suffix_start = len(text) - suffix_length
+        previous_checkpoints = {checkpoint.pos: checkpoint for checkpoint in previous.checkpoints}
+
+    # Standard `RegexLexer.get_tokens_unprocessed()` algorithm, plus tracking
+    # lines, line reach, and checkpoints
+    tokendefs = lexer._tokens
+    state_fail_reach = analysis.state_fail_reach
+    state_match_reach = analysis.state_match_reach
+    lookbehind = analysis.lookbehind
+    pos = start.pos
+    line = start.line
+    reach = start.reach
+    statestack = list(start.stack)
+    statetokens = tokendefs[statestack[-1]]
+    statefailreach = state_fail_reach[statestack[-1]]
+    statematchreach = state_match_reach[statestack[-1]]
+    last_checkpoint_line = -checkpoint_interval_lines
+    converged_pos: int | None = None
+    while True:
+        if pos == 0 or text[pos-1] == '\n':
+            if pos - lookbehind >= suffix_start:
+                previous_checkpoint = previous_checkpoints.get(pos - delta)
+                if previous_checkpoint is not None and previous_checkpoint.stack == tuple(statestack):
+                    converged_pos = pos
+                    break
+            if line - last_checkpoint_line >= checkpoint_interval_lines:
+                checkpoints.append(_Checkpoint(pos, line, reach, tuple(statestack)))
+                last_checkpoint_line = line
+        for n, (rexmatch, action, new_state) in enumerate(statetokens):
+            m = rexmatch(text, pos)
+            if m:
+                if action is not None:
+                    if type(action) is _TokenType:
+                        tokens.append((pos, action, m.group()))
+                    else:
+                        tokens.extend(action(lexer, m))
+                end = m.end()
+                if reach < _unbounded:
+                    reach = max(reach, nonblank_lines[line] + statefailreach[n])
+                    line += text.count('\n', pos, end)
+                    if statematchreach[n] == _dynamic:
+                        reach = max(reach, nonblank_lines[line])
+                    else:
+                        reach = max(reach, nonblank_lines[line] + statematchreach[n])
+                else:
+                    line += text.count('\n', pos, end)
+                pos = end
+                if new_state is not None:
+                    if isinstance(new_state, tuple):
+                        for state in new_state:
+                            if state == '#pop':
+                                if len(statestack) > 1:
+                                    statestack.pop()
+                            elif state == '#push':
+                                statestack.append(statestack[-1])
+                            else:
+                                statestack.append(state)
+                    elif isinstance(new_state, int):
+                        if abs(new_state) >= len(statestack):
+                            del statestack[1:]
+                        else:
+                            del statestack[new_state:]
+                    else:
+                        statestack.append(statestack[-1])
+                    statetokens = tokendefs[statestack[-1]]
+                    statefailreach = state_fail_reach[statestack[-1]]
+                    statematchreach = state_match_reach[statestack[-1]]
+                break
+        else:
+            if reach < _unbounded:
+                reach = max(reach, nonblank_lines[line] + statefailreach[-1])
+            if pos >= len(text):
+                break
+            if text[pos] == '\n':
+                statestack = ['root']
+                statetokens = tokendefs['root']
+                statefailreach = state_fail_reach['root']
+                statematchreach = state_match_reach['root']
+                tokens.append((pos, Whitespace, '\n'))
+                line += 1
+                pos += 1
+                continue
+            tokens.append((pos, Error, text[pos]))
+            pos += 1
+
+    relexed_chars = (len(text) if converged_pos is None else converged_pos) - start.pos
+    if converged_pos is not None and previous is not None:
+        previous_pos = converged_pos - delta
+        for token_start, token_type, token_length in zip(previous.token_starts, previous.token_types,
+                                                          previous.token_lengths):
+            if token_start >= previous_pos:
+                token_start += delta
+                tokens.append((token_start, token_type, text[token_start:token_start+token_length]))
+        for checkpoint in previous.checkpoints:
+            if checkpoint.pos >= previous_pos:
+                if reach >= _unbounded or checkpoint.reach >= _unbounded:
+                    checkpoint_reach = _unbounded
+                else:
+                    checkpoint_reach = max(reach, checkpoint.reach + nonblank_line_delta)
+                checkpoints.append(_Checkpoint(checkpoint.pos + delta, checkpoint.line + line_delta,
+                                               checkpoint_reach, checkpoint.stack))
+
+    return IncrementalLexResult(tokens=tokens, checkpoint_data=_checkpoint_data(text, tokens, checkpoints),
+                                relexed_chars=relexed_chars)
+
+
+def _checkpoint_data(text: str, tokens: list[tuple[int, _TokenType, str]],
+                     checkpoints: list[_Checkpoint]) -> dict[str, Any] | None:
+    # Tokens are saved as start offsets relative to the end of the previous
+    # token, token type indices, and lengths.  This requires that tokens are
+    # in order and that token values are slices of the text, which is not
+    # guaranteed for tokens from callbacks.
+    tokentype_indices: dict[_TokenType, int] = {}
+    token_data: list[int] = []
+    end = 0
+    for token_start, token_type, token_value in tokens:
+        if token_start < end or text[token_start:token_start+len(token_value)] != token_value:
+            return None
+        try:
+            tokentype_index = tokentype_indices[token_type]
+        except KeyError:
+            tokentype_index = tokentype_indices[token_type] = len(tokentype_indices)
+        token_data.extend((token_start - end, tokentype_index, len(token_value)))
+        end = token_start + len(token_value)
+    return {
+        'version': checkpoint_format_version,
+        'text': text,
+        'tokentypes': [str(t) for t in tokentype_indices],
+        'tokens': token_data,
+        'checkpoints': [
+            [c.pos, c.line, None if c.reach >= _unbounded else c.reach, list(c.stack)] for c in checkpoints
+        ],
+    }
+
+
+
+
+def format_tokens(lexer: Lexer, formatter: Formatter, tokens: list[tuple[int, _TokenType, str]]) -> str:
+    '''
+    Apply the lexer's filters to tokens and format them, as in
+    `pygments.highlight()`.
+    '''
+    stream: Iterator[tuple[_TokenType, str]] = ((t, v) for _, t, v in tokens)
+    stream = apply_filters(stream, lexer.filters, lexer)
+    outfile = io.StringIO()
+    formatter.format(stream, outfile)
+    return outfile.getvalue()
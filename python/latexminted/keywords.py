@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import re
+from typing import Any, Callable, Iterator
+from pygments.lexer import Lexer, RegexLexer
+from pygments.token import _TokenType, Name
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:
+    # Python < 3.11
+    import sre_constants  # type: ignore
+    import sre_parse  # type: ignore
+
+
+
+
+# Lexers for the `minted` options `extrakeywords*`.  Tokens of type `Name`
+# whose values are extra keywords are given keyword token types instead.
+# Rather than checking every token that a lexer produces, a `RegexLexer` is
+# subclassed with modified token definitions, so that extra keywords are
+# recognized during lexing.
+#
+# Before each rule that produces `Name` tokens with a regex of the form
+# `[a-z_][a-z0-9_]*` (a fixed number of single characters followed by a
+# repeated character class), a rule is inserted that matches the extra
+# keywords that the regex can match, as long as they are not followed by a
+# character that the regex would include in the match.  The inserted rule
+# thus only matches when the original rule would produce a `Name` token whose
+# value is an extra keyword, and it has the same state transition.  Other
+# rules that can produce `Name` tokens, including callbacks like `bygroups()`
+# and `using()`, are wrapped so that only their tokens are checked.  Output
+# is identical to checking every token.
+#
+# Lexers that are not `RegexLexer`s, or that process tokens after the
+# standard `RegexLexer` algorithm, are subclassed to check every token.
+# Lexer classes are cached for each set of extra keywords.
+
+_extra_keywords_lexer_cache: dict[tuple[type[Lexer], frozenset[tuple[str, _TokenType]]], type[Lexer]] = {}
+
+_single_char_ops = (sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.IN)
+_repeat_ops = (sre_constants.MAX_REPEAT, getattr(sre_constants, 'POSSESSIVE_REPEAT', sre_constants.MAX_REPEAT))
+_category_escapes: dict[Any, str] = {
+    sre_constants.CATEGORY_DIGIT: r'\d',
+    sre_constants.CATEGORY_NOT_DIGIT: r'\D',
+    sre_constants.CATEGORY_SPACE: r'\s',
+    sre_constants.CATEGORY_NOT_SPACE: r'\S',
+    sre_constants.CATEGORY_WORD: r'\w',
+    sre_constants.CATEGORY_NOT_WORD: r'\W',
+}
+
+
+
+
+def _char_class(op: Any, av: Any) -> str | None:
+    '''
+    Regex character class for a parsed regex item that matches a single
+    character, or `None` if it can't be converted.
+    '''
+    if op is sre_constants.LITERAL:
+        return f'[\\U{av:08x}]'
+    if op is sre_constants.NOT_LITERAL:
+        return f'[^\\U{av:08x}]'
+    if op is not sre_constants.IN:
+        return None
+    parts: list[str] = []
+    for index, (item_op, item_av) in enumerate(av):
+        if item_op is sre_constants.NEGATE and index == 0:
+            parts.append('^')
+        elif item_op is sre_constants.LITERAL:
+            parts.append(f'\\U{item_av:08x}')
+        elif item_op is sre_constants.RANGE:
+            parts.append(f'\\U{item_av[0]:08x}-\\U{item_av[1]:08x}')
+        elif item_op is sre_constants.CATEGORY and item_av in _category_escapes:
+            parts.append(_category_escapes[item_av])
+        else:
+            return None
+    return f'[{"".join(parts)}]'
+
+
+def _name_run_class(pattern: re.Pattern) -> str | None:
+    '''
+    For a regex that consists of single characters followed by a greedy
+    repeated character class, return the repeated character class, which
+    determines where matches end.  Return an empty string if the regex only
+    consists of single characters, and `None` for other regexes.
+    '''
+    try:
+        items = list(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception:
+        return None
+    while len(items) == 1 and items[0][0] is sre_constants.SUBPATTERN:
+        _, add_flags, del_flags, subpattern = items[0][1]
+        if add_flags or del_flags:
+            return None
+        items = list(subpattern)
+    if not items:
+        return None
+    *prefix_items, (last_op, last_av) = items
+    if not all(op in _single_char_ops for op, _ in prefix_items):
+        return None
+    if last_op in _single_char_ops:
+        return ''
+    if last_op not in _repeat_ops:
+        return None
+    min_repeat, max_repeat, subpattern = last_av
+    if max_repeat != sre_constants.MAXREPEAT or len(subpattern) != 1:
+        return None
+    return _char_class(*subpattern[0])
+
+
+def _may_yield_name(action: Any) -> bool:
+    if action is None or type(action) is _TokenType:
+        return action is Name
+    if (getattr(action, '__module__', None) == 'pygments.lexer' and
+            getattr(action, '__qualname__', None) == 'bygroups.<locals>.callback'):
+        for cell in action.__closure__ or ():
+            if isinstance(cell.cell_contents, tuple):
+                return any(_may_yield_name(group_action) for group_action in cell.cell_contents)
+    return True
+
+
+def _map_name_callback(callback: Callable[..., Iterator[tuple[int, _TokenType, str]]],
+                       extra_tokens: dict[str, _TokenType]) -> Callable[..., Iterator[tuple[int, _TokenType, str]]]:
+    def mapped_callback(lexer, match, *args):
+        for index, token, value in callback(lexer, match, *args):
+            if token is Name and value in extra_tokens:
+                yield index, extra_tokens[value], value
+            else:
+                yield index, token, value
+    return mapped_callback
+
+
+def _map_name_token(extra_tokens: dict[str, _TokenType]) -> Callable[..., Iterator[tuple[int, _TokenType, str]]]:
+    def name_callback(lexer, match):
+        value = match.group()
+        yield match.start(), extra_tokens.get(value, Name), value
+    return name_callback
+
+
+def _extra_keywords_tokendefs(tokendefs: dict[str, list[tuple[Any, Any, Any]]],
+                              extra_tokens: dict[str, _TokenType]) -> dict[str, list[tuple[Any, Any, Any]]]:
+    '''
+    Modify processed `RegexLexer` token definitions so that `Name` tokens
+    that are extra keywords get keyword token types.
+    '''
+    name_callback = _map_name_token(extra_tokens)
+    new_tokendefs: dict[str, list[tuple[Any, Any, Any]]] = {}
+    for state, rules in tokendefs.items():
+        new_rules: list[tuple[Any, Any, Any]] = []
+        for rexmatch, action, new_state in rules:
+            if action is Name:
+                pattern = rexmatch.__self__
+                run_class = _name_run_class(pattern)
+                if run_class is None:
+                    new_rules.append((rexmatch, name_callback, new_state))
+                    continue
+                keywords: dict[_TokenType, list[str]] = {}
+                for value, token in extra_tokens.items():
+                    if value and pattern.fullmatch(value):
+                        keywords.setdefault(token, []).append(value)
+                for token, values in keywords.items():
+                    values.sort(key=lambda x: (-len(x), x))
+                    keyword_regex = f'(?-i:{"|".join(re.escape(v) for v in values)})'
+                    if run_class:
+                        keyword_regex += f'(?!{run_class})'
+                    keyword_pattern = re.compile(keyword_regex, pattern.flags & ~re.VERBOSE)
+                    new_rules.append((keyword_pattern.match, token, new_state))
+                new_rules.append((rexmatch, action, new_state))
+            elif _may_yield_name(action):
+                new_rules.append((rexmatch, _map_name_callback(action, extra_tokens), new_state))
+            else:
+                new_rules.append((rexmatch, action, new_state))
+        new_tokendefs[state] = new_rules
+    return new_tokendefs
+
+
+def _uses_standard_algorithm(lexer_class: type[Lexer]) -> bool:
+    return (issubclass(lexer_class, RegexLexer) and
+            lexer_class.get_tokens_unprocessed is RegexLexer.get_tokens_unprocessed and
+            not getattr(lexer_class, 'token_variants', False))
+
+
+
+
+def extra_keywords_lexer_class(lexer_class: type[Lexer], extra_tokens: dict[str, _TokenType]) -> type[Lexer]:
+    '''
+    Subclass of a lexer class that gives `Name` tokens whose values are keys
+    of `extra_tokens` the corresponding token types.
+    '''
+    cache_key = (lexer_class, frozenset(extra_tokens.items()))
+    try:
+        return _extra_keywords_lexer_cache[cache_key]
+    except KeyError:
+        pass
+    extra_tokens = dict(extra_tokens)
+    class_dict: dict[str, Any] = {'__module__': __name__, 'EXTRA_TOKENS': extra_tokens}
+    if _uses_standard_algorithm(lexer_class):
+        # As in `RegexLexerMeta.__call__()`, but the processed token
+        # definitions are modified before they are used
+        ExtraKeywordsLexer = type(lexer_class)(lexer_class.__name__, (lexer_class,), class_dict)
+        ExtraKeywordsLexer._all_tokens = {}
+        ExtraKeywordsLexer._tmpname = 0
+        tokendefs = ExtraKeywordsLexer.process_tokendef('', ExtraKeywordsLexer.get_tokendefs())
+        ExtraKeywordsLexer._tokens = _extra_keywords_tokendefs(tokendefs, extra_tokens)
+    else:
+        # https://pygments.org/docs/lexerdevelopment/
+        def get_tokens_unprocessed(self, *args, **kwargs):
+            for index, token, value in lexer_class.get_tokens_unprocessed(self, *args, **kwargs):
+                if token is Name and value in extra_tokens:
+                    yield index, extra_tokens[value], value
+                else:
+                    yield index, token, value
+        class_dict['get_tokens_unprocessed'] = get_tokens_unprocessed
+        ExtraKeywordsLexer = type(lexer_class)(lexer_class.__name__, (lexer_class,), class_dict)
+    _extra_keywords_lexer_cache[cache_key] = ExtraKeywordsLexer
+    return ExtraKeywordsLexer
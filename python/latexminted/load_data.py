@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 #
-# Copyright (c) 2024, Geoffrey M. Poore
+# Copyright (c) 2024-2026, Geoffrey M. Poore
 # All rights reserved.
 #
 # Licensed under the LaTeX Project Public License version 1.3c:
@@ -69,7 +69,7 @@ def load_data(*, md5: str, messages: Messages, timestamp: str, command: str) ->
                 rf'''minted data file \detokenize{{"{data_file_name}"}} is for "batch", but expected "{command}"'''
             )
             return None
-        valid_commands = set(['styledef', 'highlight', 'clean'])
+        valid_commands = set(['config', 'styledef', 'highlight', 'clean'])
         if not all(d['command'] in valid_commands for d in data):
             messages.append_error(
                 rf'''minted data file \detokenize{{"{data_file_name}"}} is for "batch", but contains invalid data'''
@@ -10,10 +10,11 @@
 
 from __future__ import annotations
 
+import re
 import textwrap
 import traceback
+from pathlib import PurePath
 from typing import Any
-from .restricted import MintedTempRestrictedPath
 
 
 
@@ -52,7 +53,7 @@ class Messages(object):
 
         if self._currentfilepath:
             path = self._currentfilepath
-            if not MintedTempRestrictedPath(path).is_absolute() and not path.startswith('.'):
+            if not PurePath(path).is_absolute() and not path.startswith('.'):
                 path = f'./{path}'
             if not path.endswith('/'):
                 path += '/'
@@ -91,11 +92,39 @@ class Messages(object):
     def has_errors(self) -> bool:
         return len(self._errors) > 0
 
+    @property
+    def errors(self) -> list[str]:
+        return self._errors.copy()
+
+    def extend(self, other: Messages):
+        '''
+        Append messages that were collected separately, for example in another
+        thread.
+        '''
+        self._warnings.extend(other._warnings)
+        self._errors.extend(other._errors)
+        self._errlogs.extend(other._errlogs)
+
+    def checkpoint(self) -> tuple[int, int, int]:
+        return (len(self._warnings), len(self._errors), len(self._errlogs))
+
+    def rollback(self, checkpoint: tuple[int, int, int]):
+        '''
+        Discard all messages added after a checkpoint.
+        '''
+        del self._warnings[checkpoint[0]:]
+        del self._errors[checkpoint[1]:]
+        del self._errlogs[checkpoint[2]:]
+
 
     def communicate(self):
         if not self._warnings and not self._errors and not self._errlogs:
             return
 
+        # Lazy import, so that messages can also be collected outside LaTeX
+        # (`latexminted.api`)
+        from .restricted import MintedTempRestrictedPath
+
         message_lines = []
         if self._warnings:
             message_lines.append(r'\def\minted@exec@warning{%')
@@ -131,3 +160,17 @@ class Messages(object):
                     continue
                 else:
                     break
+
+
+
+
+_detokenize_re = re.compile(r'\\detokenize\{(.*?)\}')
+
+def latex_message_to_text(message: str) -> str:
+    '''
+    Convert a warning or error message that is formatted for LaTeX into plain
+    text, for use outside LaTeX.
+    '''
+    if message.startswith('^^J => '):
+        message = message[len('^^J => '):]
+    return _detokenize_re.sub(lambda m: m.group(1), message)
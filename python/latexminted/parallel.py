@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+from pygments.lexer import Lexer
+from pygments.token import _TokenType, Error, string_to_tokentype, Whitespace
+from .incremental import is_standard_regex_lexer
+from .processes import spawn_context
+
+
+
+
+# Parallel lexing of very large code.  The text is split into chunks at line
+# boundaries, and each chunk is lexed in a separate process starting from the
+# lexer's root state.  Each chunk is lexed within the full text, so that
+# lookbehind and anchors work as usual, until the lexer reaches the start of
+# the next chunk.  A chunk's tokens are only used if the previous chunk ended
+# exactly at the start of the chunk with the lexer in its root state, since
+# lexing a `RegexLexer` only depends on the position and the state stack.
+# Otherwise, lexing continues serially from where the previous chunk ended,
+# until it reaches the start of a later chunk in the root state.  Output is
+# always identical to serial lexing.  Workers never import from the document
+# directory (see `processes.py`).  When worker processes can't be started,
+# everything is lexed serially.
+
+# Chunks are at least this many lines, so that the cost of a mismatched
+# chunk boundary is limited
+min_chunk_lines = 1000
+chunks_per_job = 2
+
+_root_stack: tuple[str, ...] = ('root',)
+
+
+
+
+def lex_range(lexer: Lexer, text: str, pos: int, stack: tuple[str, ...],
+              stop: int | None) -> tuple[list[tuple[int, _TokenType, str]], int, tuple[str, ...]]:
+    '''
+    Lex text that has already been preprocessed by the lexer, starting at
+    `pos` with state stack `stack`, using the standard
+    `RegexLexer.get_tokens_unprocessed()` algorithm.  Stop when the next match
+    would start at or after `stop`.  Return tokens plus the position and
+    state stack where lexing stopped.
+    '''
+    tokens: list[tuple[int, _TokenType, str]] = []
+    tokendefs = lexer._tokens
+    statestack = list(stack)
+    statetokens = tokendefs[statestack[-1]]
+    while stop is None or pos < stop:
+        for rexmatch, action, new_state in statetokens:
+            m = rexmatch(text, pos)
+            if m:
+                if action is not None:
+                    if type(action) is _TokenType:
+                        tokens.append((pos, action, m.group()))
+                    else:
+                        tokens.extend(action(lexer, m))
+                pos = m.end()
+                if new_state is not None:
+                    if isinstance(new_state, tuple):
+                        for state in new_state:
+                            if state == '#pop':
+                                if len(statestack) > 1:
+                                    statestack.pop()
+                            elif state == '#push':
+                                statestack.append(statestack[-1])
+                            else:
+                                statestack.append(state)
+                    elif isinstance(new_state, int):
+                        if abs(new_state) >= len(statestack):
+                            del statestack[1:]
+                        else:
+                            del statestack[new_state:]
+                    else:
+                        statestack.append(statestack[-1])
+                    statetokens = tokendefs[statestack[-1]]
+                break
+        else:
+            if pos >= len(text):
+                break
+            if text[pos] == '\n':
+                statestack = ['root']
+                statetokens = tokendefs['root']
+                tokens.append((pos, Whitespace, '\n'))
+                pos += 1
+                continue
+            tokens.append((pos, Error, text[pos]))
+            pos += 1
+    return (tokens, pos, tuple(statestack))
+
+
+def split_points(text: str, chunks: int) -> list[int]:
+    '''
+    Start positions of chunks.  Chunks preferably start after a blank line,
+    where lexers are most likely to be in their root state.
+    '''
+    starts = [0]
+    chunk_length = len(text) // chunks
+    for n in range(1, chunks):
+        target = n * chunk_length
+        if target <= starts[-1]:
+            continue
+        blank_line_index = text.find('\n\n', target, target + chunk_length // 8)
+        if blank_line_index != -1:
+            start = blank_line_index + 2
+        else:
+            newline_index = text.find('\n', target)
+            if newline_index == -1:
+                break
+            start = newline_index + 1
+        if start >= len(text):
+            break
+        starts.append(start)
+    return starts
+
+
+
+
+_worker_lexer: Lexer | None = None
+_worker_text: str | None = None
+
+def _init_worker(lexer_class: type[Lexer], lexer_options: dict[str, Any], text: str):
+    global _worker_lexer, _worker_text
+    _worker_lexer = lexer_class(**lexer_options)
+    _worker_text = text
+
+
+def _lex_chunk(chunk: tuple[int, int | None]) -> tuple[list[str], list[int], int, tuple[str, ...]] | None:
+    # Tokens are returned as token type names plus flat lists of start
+    # offsets, token type indices, and lengths, since token types can't be
+    # pickled as such, and token values are slices of the text.  Return
+    # `None` if a token value is not a slice of the text.
+    start, stop = chunk
+    text = _worker_text
+    tokens, pos, stack = lex_range(_worker_lexer, text, start, _root_stack, stop)
+    tokentype_indices: dict[_TokenType, int] = {}
+    token_data: list[int] = []
+    for token_start, token_type, token_value in tokens:
+        if text[token_start:token_start+len(token_value)] != token_value:
+            return None
+        try:
+            tokentype_index = tokentype_indices[token_type]
+        except KeyError:
+            tokentype_index = tokentype_indices[token_type] = len(tokentype_indices)
+        token_data.extend((token_start, tokentype_index, len(token_value)))
+    return ([str(t) for t in tokentype_indices], token_data, pos, stack)
+
+
+def supports_parallel_lexing(lexer: Lexer) -> bool:
+    return is_standard_regex_lexer(lexer)
+
+
+def lex_parallel(lexer: Lexer, text: str, *, jobs: int) -> tuple[list[tuple[int, _TokenType, str]], int]:
+    '''
+    Lex text that has already been preprocessed by the lexer, in parallel
+    chunks.  The lexer must support parallel lexing.  Return tokens plus the
+    number of chunks that had to be lexed serially.
+    '''
+    chunks = min(jobs * chunks_per_job, text.count('\n') // min_chunk_lines)
+    context = None
+    if jobs >= 2 and chunks >= 2:
+        context = spawn_context()
+    if context is None:
+        tokens, _, _ = lex_range(lexer, text, 0, _root_stack, None)
+        return (tokens, 1)
+    starts = split_points(text, chunks)
+    stops: list[int | None] = [*starts[1:], None]
+
+    tokens: list[tuple[int, _TokenType, str]] = []
+    serial_chunks = 0
+    pos = 0
+    stack = _root_stack
+    with ProcessPoolExecutor(max_workers=min(jobs, len(starts)), mp_context=context, initializer=_init_worker,
+                             initargs=(type(lexer), lexer.options, text)) as executor:
+        for start, stop, result in zip(starts, stops, executor.map(_lex_chunk, zip(starts, stops))):
+            if stop is not None and pos >= stop:
+                # Serial lexing already continued past this chunk
+                continue
+            if result is not None and pos == start and stack == _root_stack:
+                tokentype_names, token_data, pos, stack = result
+                tokentypes = [string_to_tokentype(t) for t in tokentype_names]
+                for n in range(0, len(token_data), 3):
+                    token_start = token_data[n]
+                    tokens.append((token_start, tokentypes[token_data[n+1]],
+                                   text[token_start:token_start+token_data[n+2]]))
+            else:
+                serial_tokens, pos, stack = lex_range(lexer, text, pos, stack, stop)
+                tokens.extend(serial_tokens)
+                serial_chunks += 1
+    return (tokens, serial_chunks)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from multiprocessing import spawn as multiprocessing_spawn
+from multiprocessing import util as multiprocessing_util
+from multiprocessing.context import BaseContext, SpawnContext, SpawnProcess
+from pathlib import Path
+from typing import Any, Iterator
+
+
+
+
+# Worker processes are always started with `spawn`, rather than the platform
+# default, so that behavior is the same on all operating systems and so that
+# workers are never forked while batch mode threads are reading and writing
+# files.
+#
+# `multiprocessing` starts workers (and, under POSIX, its resource tracker)
+# with `python -c`, which puts the working directory first on `sys.path`.
+# Under LaTeX, that is the document directory, which documents can write to,
+# so a file like `multiprocessing.py` there would be run by every worker.  A
+# spawned worker also imports the main module of the parent process again,
+# which runs a `latexminted` launcher without an
+# `if __name__ == '__main__':` guard as a whole new command.  To prevent both,
+# processes are started in isolated mode (`-I`), which never puts the working
+# directory on `sys.path`, and without the main module.  Workers then get the
+# absolute `sys.path` entries of the parent process.  Worker functions are
+# always in the `latexminted` package, so the main module is never needed.
+# `multiprocessing` has no options for this, so the functions that create
+# command lines and preparation data are replaced while processes start.
+
+_spawn_lock = threading.RLock()
+
+
+@contextmanager
+def _isolated_spawning() -> Iterator[None]:
+    with _spawn_lock:
+        args_from_interpreter_flags = multiprocessing_util._args_from_interpreter_flags
+        get_preparation_data = multiprocessing_spawn.get_preparation_data
+
+        def isolated_args_from_interpreter_flags() -> list[str]:
+            args = args_from_interpreter_flags()
+            if '-I' not in args:
+                args.append('-I')
+            return args
+
+        def preparation_data_without_main(name: str) -> dict[str, Any]:
+            data = get_preparation_data(name)
+            data.pop('init_main_from_name', None)
+            data.pop('init_main_from_path', None)
+            if 'sys_path' in data:
+                data['sys_path'] = [p for p in data['sys_path'] if os.path.isabs(p)]
+            return data
+
+        multiprocessing_util._args_from_interpreter_flags = isolated_args_from_interpreter_flags
+        multiprocessing_spawn.get_preparation_data = preparation_data_without_main
+        try:
+            yield
+        finally:
+            multiprocessing_util._args_from_interpreter_flags = args_from_interpreter_flags
+            multiprocessing_spawn.get_preparation_data = get_preparation_data
+
+
+class IsolatedSpawnProcess(SpawnProcess):
+    '''
+    `SpawnProcess` that is started in isolated mode, without the main module.
+    '''
+    @staticmethod
+    def _Popen(process_obj):
+        with _isolated_spawning():
+            return SpawnProcess._Popen(process_obj)
+
+
+class IsolatedSpawnContext(SpawnContext):
+    Process = IsolatedSpawnProcess
+
+
+_isolated_spawn_context = IsolatedSpawnContext()
+
+
+
+
+def spawn_context() -> BaseContext | None:
+    '''
+    `multiprocessing` context for starting worker processes, or `None` if
+    workers can't be started (in frozen executables, which can't be started
+    in isolated mode).
+    '''
+    if getattr(sys, 'frozen', False):
+        return None
+    if sys.platform != 'win32':
+        # Queues and locks start the resource tracker before any workers
+        from multiprocessing import resource_tracker
+        with _isolated_spawning():
+            resource_tracker.ensure_running()
+    return _isolated_spawn_context
+
+
+
+# Other Python processes, such as background garbage collection, run
+# `latexminted` commands.  With `python -m` or `python -c`, the working
+# directory would be first on `sys.path`.  Under LaTeX, that is the document
+# directory, which documents can write to, so a file like `latexminted.py`
+# there would be run instead of the package.  These processes are started in
+# isolated mode (`-I`), which never puts the working directory on `sys.path`
+# and ignores `PYTHON*` environment variables.  They get the `sys.path`
+# entries of the current process explicitly, since the package and its
+# dependencies may only be on `sys.path` for the current process (for
+# example, with the TeX distribution's launcher and its wheels).  The working
+# directory is the directory containing the package, which is outside the
+# document directory.
+
+def safe_cwd() -> str:
+    '''
+    Working directory for Python processes that must not run in the document
+    directory:  the directory containing the `latexminted` package.  For a
+    package imported from a wheel or other zip file, this is the directory
+    containing the zip file.
+    '''
+    path = Path(__file__).resolve().parent.parent
+    while not path.is_dir() and path.parent != path:
+        path = path.parent
+    return str(path)
+
+
+def latexminted_command(*args: str) -> list[str]:
+    '''
+    Command for running `latexminted` with arguments in a new Python process
+    that uses the `sys.path` of the current process, without relative paths
+    or the working directory.  It should be run with `safe_cwd()` as its
+    working directory.
+    '''
+    cwd = os.getcwd()
+    sys_path = [p for p in sys.path if os.path.isabs(p) and os.path.normcase(p) != os.path.normcase(cwd)]
+    prog = f'import sys; sys.path[:] = {sys_path!r}; from latexminted.cmdline import main; main()'
+    return [sys.executable, '-I', '-c', prog, *args]
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+from importlib import import_module
+from importlib.metadata import entry_points, EntryPoint
+from pathlib import Path
+from typing import Any
+from pygments import __version__ as pygments_version
+from pygments.lexer import Lexer
+from pygments.lexers import find_lexer_class_by_name as pygments_find_lexer_class_by_name
+from pygments.lexers._mapping import LEXERS
+from pygments.style import Style
+from pygments.styles import get_style_by_name as pygments_get_style_by_name, STYLE_MAP
+from pygments.util import ClassNotFound
+
+
+
+
+# Lookup of Pygments lexers and styles by name, with the same results as
+# `pygments.lexers.find_lexer_class_by_name()` and
+# `pygments.styles.get_style_by_name()`.  When a name is not built in,
+# Pygments loads every plugin from package entry points, which requires
+# scanning all installed distributions with `importlib.metadata` and
+# importing all plugin modules.  That can take tens or even hundreds of
+# milliseconds, and it happens for every custom lexer, since a custom lexer
+# file name is only tried after the lookup fails.
+#
+# Here, built-in names are looked up in dicts, and other names are looked up
+# in an index of plugins that is saved in a user-level cache directory.  The
+# index is keyed by the Pygments version plus the directories on `sys.path`
+# with their modification times, since installing, upgrading, or removing a
+# distribution modifies the directory that contains its metadata.  It is
+# rebuilt when the key changes.  A lookup only imports the module that
+# defines the lexer or style.
+#
+# Plugins are imported from module names in the index, so the index must not
+# be writable by LaTeX.  As for the wheel cache of the `latexminted.py`
+# launcher, it must be under a hidden (dot) directory, since LaTeX is not
+# allowed to write dotfiles except with `openout_any = a`.  If the index
+# can't be used, lookups fall back to Pygments.
+
+index_format_version = 1
+
+_lexer_aliases: dict[str, tuple[str, str]] | None = None
+_plugin_index: dict[str, Any] | None = None
+_did_load_plugin_index: bool = False
+
+
+
+
+def registry_cache_path() -> Path | None:
+    if os.getenv('LATEXMINTED_NO_REGISTRY_CACHE'):
+        return None
+    env_XDG_CACHE_HOME = os.getenv('XDG_CACHE_HOME')
+    if sys.platform != 'win32' and env_XDG_CACHE_HOME and Path(env_XDG_CACHE_HOME).is_absolute():
+        cache_root = Path(env_XDG_CACHE_HOME)
+    else:
+        try:
+            cache_root = Path.home() / '.cache'
+        except RuntimeError:
+            return None
+    registry_path = cache_root / 'latexminted' / 'registry' / sys.implementation.cache_tag
+    try:
+        registry_path_resolved = registry_path.resolve()
+    except OSError:
+        return None
+    for path in (registry_path, registry_path_resolved):
+        if not any(part.startswith('.') and part not in ('.', '..') for part in path.parts):
+            return None
+    return registry_path_resolved
+
+
+def index_sys_path() -> list[str]:
+    '''
+    Directories on `sys.path` that may contain distributions.  The current
+    directory is omitted, since it is the document directory within LaTeX,
+    and it is modified by every compile.
+    '''
+    cwd = os.getcwd()
+    return [path for path in sys.path if path and path != cwd]
+
+
+def plugin_index_key() -> dict[str, Any]:
+    '''
+    Key for the plugin index.  This only requires a `stat()` for each
+    directory on `sys.path`, rather than scanning installed distributions.
+    '''
+    sys_path_mtimes: list[tuple[str, int | None]] = []
+    for path in index_sys_path():
+        try:
+            sys_path_mtimes.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            sys_path_mtimes.append((path, None))
+    return {
+        'format': index_format_version,
+        'pygments': pygments_version,
+        'sys_path': sys_path_mtimes,
+    }
+
+
+def build_plugin_index() -> dict[str, Any]:
+    '''
+    Index of plugin lexer aliases and style names, as entry point values.
+    Built-in lexers and styles take precedence over plugins, and the first
+    plugin with a given name takes precedence over later plugins, as in
+    Pygments.  Lexer classes must be loaded to find their aliases.
+    '''
+    groups = entry_points()
+    if hasattr(groups, 'select'):
+        lexer_entry_points = groups.select(group='pygments.lexers')
+        style_entry_points = groups.select(group='pygments.styles')
+    else:
+        lexer_entry_points = groups.get('pygments.lexers', [])
+        style_entry_points = groups.get('pygments.styles', [])
+    builtin_aliases = builtin_lexer_aliases()
+    lexers: dict[str, str] = {}
+    styles: dict[str, str] = {}
+    distributions: dict[str, str] = {}
+    for entry_point in lexer_entry_points:
+        lexer_class = entry_point.load()
+        for alias in lexer_class.aliases:
+            if alias not in builtin_aliases:
+                lexers.setdefault(alias, entry_point.value)
+    for entry_point in style_entry_points:
+        if entry_point.name not in STYLE_MAP:
+            styles.setdefault(entry_point.name, entry_point.value)
+    for entry_point in [*lexer_entry_points, *style_entry_points]:
+        # `EntryPoint.dist` requires Python 3.10+
+        dist = getattr(entry_point, 'dist', None)
+        if dist is not None:
+            distributions[dist.metadata['Name']] = dist.version
+    return {
+        'key': plugin_index_key(),
+        'distributions': distributions,
+        'lexers': lexers,
+        'styles': styles,
+    }
+
+
+def _is_valid_plugin_index(index: Any) -> bool:
+    if not isinstance(index, dict):
+        return False
+    for k in ('lexers', 'styles'):
+        v = index.get(k)
+        if not isinstance(v, dict) or not all(isinstance(x, str) for kv in v.items() for x in kv):
+            return False
+    return True
+
+
+def load_plugin_index() -> dict[str, Any] | None:
+    '''
+    Load the plugin index from the cache, rebuilding it if it is missing or
+    out of date.  Return `None` if the index can't be loaded or built, in
+    which case lookups fall back to Pygments.
+    '''
+    global _plugin_index, _did_load_plugin_index
+    if _did_load_plugin_index:
+        return _plugin_index
+    _did_load_plugin_index = True
+
+    cache_path = registry_cache_path()
+    if cache_path is None:
+        return None
+    key = plugin_index_key()
+    # Separate environments (virtual environments, TeX installations with
+    # bundled wheels) have separate indexes, so that they don't repeatedly
+    # invalidate each other's index
+    sys_path_hash = hashlib.sha256(json.dumps([sys.prefix, index_sys_path()]).encode('utf8')).hexdigest()[:16]
+    index_path = cache_path / f'plugins-{sys_path_hash}.json'
+    try:
+        index = json.loads(index_path.read_text(encoding='utf8'))
+    except (OSError, ValueError):
+        index = None
+    if _is_valid_plugin_index(index) and index['key'] == json.loads(json.dumps(key)):
+        _plugin_index = index
+        return index
+
+    try:
+        index = build_plugin_index()
+    except Exception:
+        # A plugin failed to load, so the same error will occur within
+        # Pygments
+        return None
+    try:
+        cache_path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        temp_path = index_path.with_name(f'{index_path.name}.tmp-{os.getpid()}')
+        temp_path.write_text(json.dumps(index, indent=2), encoding='utf8')
+        os.replace(temp_path, index_path)
+    except OSError:
+        pass
+    _plugin_index = index
+    return index
+
+
+
+
+def builtin_lexer_aliases() -> dict[str, tuple[str, str]]:
+    global _lexer_aliases
+    if _lexer_aliases is None:
+        lexer_aliases: dict[str, tuple[str, str]] = {}
+        for cls, (module, _, aliases, _, _) in LEXERS.items():
+            for alias in aliases:
+                lexer_aliases.setdefault(alias, (module, cls))
+        _lexer_aliases = lexer_aliases
+    return _lexer_aliases
+
+
+def find_lexer_class_by_name(alias: str) -> type[Lexer]:
+    '''
+    Return the lexer class with the given alias, like Pygments'
+    `find_lexer_class_by_name()`.  Raise `ClassNotFound` if there is none.
+    '''
+    if not alias:
+        raise ClassNotFound(f'no lexer for alias {alias!r} found')
+    alias = alias.lower()
+    try:
+        module, cls = builtin_lexer_aliases()[alias]
+    except KeyError:
+        pass
+    else:
+        return getattr(import_module(module), cls)
+    index = load_plugin_index()
+    if index is None:
+        return pygments_find_lexer_class_by_name(alias)
+    try:
+        value = index['lexers'][alias]
+    except KeyError:
+        raise ClassNotFound(f'no lexer for alias {alias!r} found')
+    return EntryPoint(name=alias, value=value, group='pygments.lexers').load()
+
+
+def get_style_by_name(name: str) -> type[Style]:
+    '''
+    Return the style class with the given name, like Pygments'
+    `get_style_by_name()`.  Raise `ClassNotFound` if there is none.
+    '''
+    if name in STYLE_MAP:
+        return pygments_get_style_by_name(name)
+    index = load_plugin_index()
+    if index is None:
+        return pygments_get_style_by_name(name)
+    try:
+        value = index['styles'][name]
+    except KeyError:
+        pass
+    else:
+        return EntryPoint(name=name, value=value, group='pygments.styles').load()
+    # Like Pygments, look for a style that is not built in but has been added
+    # to the Pygments styles package
+    module_name = f'pygments.styles.{name}'
+    class_name = name.title() + 'Style'
+    try:
+        module = import_module(module_name)
+    except ImportError:
+        raise ClassNotFound(f'Could not find style module {module_name!r}.')
+    try:
+        return getattr(module, class_name)
+    except AttributeError:
+        raise ClassNotFound(f'Could not find style class {class_name!r} in style module.')
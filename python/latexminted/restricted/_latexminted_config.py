@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 #
-# Copyright (c) 2024, Geoffrey M. Poore
+# Copyright (c) 2024-2026, Geoffrey M. Poore
 # All rights reserved.
 #
 # Licensed under the LaTeX Project Public License version 1.3c:
@@ -106,11 +106,168 @@ class LatexMintedConfigSecurity(object):
             raise LatexMintedConfigError(f'"security" contains unknown keys {unknowns_keys}')
 
 
+class LatexMintedConfigCache(object):
+    def __init__(self):
+        self._clean_mode: Literal['sync'] | Literal['background'] | Literal['manual'] = 'sync'
+        self._eviction_dry_run: bool = False
+        self._incremental_min_lines: int | None = None
+        self._lease_seconds: int = 3600
+        self._max_age_days: int = 30
+        self._max_bytes: int | None = None
+        self._max_files: int | None = None
+        self._skip_existing: bool = False
+
+    @property
+    def clean_mode(self):
+        return self._clean_mode
+
+    @property
+    def eviction_dry_run(self):
+        return self._eviction_dry_run
+
+    @property
+    def incremental_min_lines(self):
+        return self._incremental_min_lines
+
+    @property
+    def lease_seconds(self):
+        return self._lease_seconds
+
+    @property
+    def max_age_days(self):
+        return self._max_age_days
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    @property
+    def max_files(self):
+        return self._max_files
+
+    @property
+    def skip_existing(self):
+        return self._skip_existing
+
+    def update(self, **kwargs):
+        clean_mode = kwargs.pop('clean_mode', None)
+        if clean_mode is not None:
+            if clean_mode not in ('sync', 'background', 'manual'):
+                raise LatexMintedConfigError('"cache.clean_mode" must be "sync", "background", or "manual"')
+            self._clean_mode = clean_mode
+
+        eviction_dry_run = kwargs.pop('eviction_dry_run', None)
+        if eviction_dry_run is not None:
+            if eviction_dry_run not in (True, False):
+                raise LatexMintedConfigError('"cache.eviction_dry_run" must be boolean')
+            self._eviction_dry_run = eviction_dry_run
+
+        for key in ('incremental_min_lines', 'lease_seconds', 'max_age_days', 'max_bytes', 'max_files'):
+            value = kwargs.pop(key, None)
+            if value is not None:
+                if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                    raise LatexMintedConfigError(f'"cache.{key}" must be a positive integer')
+                setattr(self, f'_{key}', value)
+
+        skip_existing = kwargs.pop('skip_existing', None)
+        if skip_existing is not None:
+            if skip_existing not in (True, False):
+                raise LatexMintedConfigError('"cache.skip_existing" must be boolean')
+            self._skip_existing = skip_existing
+
+        if kwargs:
+            unknowns_keys = ', '.join(f'"{k}"' for k in kwargs)
+            raise LatexMintedConfigError(f'"cache" contains unknown keys {unknowns_keys}')
+
+
+class LatexMintedConfigLexing(object):
+    def __init__(self):
+        self._max_memory_mb: int | None = None
+        self._parallel_jobs: int | None = None
+        self._parallel_min_lines: int | None = None
+        self._timeout_seconds: int | float | None = None
+
+    @property
+    def max_memory_mb(self):
+        return self._max_memory_mb
+
+    @property
+    def parallel_jobs(self):
+        return self._parallel_jobs
+
+    @property
+    def parallel_min_lines(self):
+        return self._parallel_min_lines
+
+    @property
+    def timeout_seconds(self):
+        return self._timeout_seconds
+
+    @property
+    def is_supervised(self) -> bool:
+        return self._timeout_seconds is not None or self._max_memory_mb is not None
+
+    def update(self, **kwargs):
+        for key in ('max_memory_mb', 'parallel_jobs', 'parallel_min_lines'):
+            value = kwargs.pop(key, None)
+            if value is not None:
+                if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                    raise LatexMintedConfigError(f'"lexing.{key}" must be a positive integer')
+                setattr(self, f'_{key}', value)
+
+        timeout_seconds = kwargs.pop('timeout_seconds', None)
+        if timeout_seconds is not None:
+            if (not isinstance(timeout_seconds, (int, float)) or isinstance(timeout_seconds, bool) or
+                    timeout_seconds <= 0):
+                raise LatexMintedConfigError('"lexing.timeout_seconds" must be a positive number')
+            self._timeout_seconds = timeout_seconds
+
+        if kwargs:
+            unknowns_keys = ', '.join(f'"{k}"' for k in kwargs)
+            raise LatexMintedConfigError(f'"lexing" contains unknown keys {unknowns_keys}')
+
+
+class LatexMintedConfigStats(object):
+    def __init__(self):
+        self._enable: bool = False
+        self._prometheus_textfile: str | None = None
+
+    @property
+    def enable(self):
+        return self._enable
+
+    @property
+    def prometheus_textfile(self):
+        return self._prometheus_textfile
+
+    def update(self, **kwargs):
+        enable = kwargs.pop('enable', None)
+        if enable is not None:
+            if enable not in (True, False):
+                raise LatexMintedConfigError('"stats.enable" must be boolean')
+            self._enable = enable
+
+        prometheus_textfile = kwargs.pop('prometheus_textfile', None)
+        if prometheus_textfile is not None:
+            if not isinstance(prometheus_textfile, str) or not prometheus_textfile.endswith('.prom'):
+                raise LatexMintedConfigError(
+                    '"stats.prometheus_textfile" must be a string path to a file with extension ".prom"'
+                )
+            self._prometheus_textfile = prometheus_textfile
+
+        if kwargs:
+            unknowns_keys = ', '.join(f'"{k}"' for k in kwargs)
+            raise LatexMintedConfigError(f'"stats" contains unknown keys {unknowns_keys}')
+
+
 class LatexMintedConfig(object):
     def __init__(self, *, load_config_file: bool = True, config_error: LatexMintedConfigError | None = None):
+        self._cache: LatexMintedConfigCache = LatexMintedConfigCache()
         self._custom_lexers: dict[str, set[str]] = defaultdict(set)
         self._did_load_config_file: bool = False
+        self._lexing: LatexMintedConfigLexing = LatexMintedConfigLexing()
         self._security: LatexMintedConfigSecurity = LatexMintedConfigSecurity()
+        self._stats: LatexMintedConfigStats = LatexMintedConfigStats()
         self._tex_cwd = LatexMintedConfigPath(latex_config.tex_cwd)
 
         self.config_error = config_error
@@ -134,14 +291,26 @@ class LatexMintedConfig(object):
     def is_custom_lexer_enabled(self, *, name: str, hash: str):
         return hash.lower() in self._custom_lexers[name]
 
+    @property
+    def cache(self):
+        return self._cache
+
     @property
     def did_load_config_file(self):
         return self._did_load_config_file
 
+    @property
+    def lexing(self):
+        return self._lexing
+
     @property
     def security(self):
         return self._security
 
+    @property
+    def stats(self):
+        return self._stats
+
 
     _loaders = [json_loads, literal_eval]
     if toml_loads is not None:
@@ -222,6 +391,39 @@ class LatexMintedConfig(object):
             except LatexMintedConfigError as e:
                 raise LatexMintedConfigError(f'Invalid config file "{path.as_posix()}":  {e}')
 
+        cache = data.pop('cache', None)
+        if cache:
+            if not (isinstance(cache, dict) and all(isinstance(k, str) for k in cache)):
+                raise LatexMintedConfigError(
+                    f'Invalid config file "{path.as_posix()}":  "cache" must be a dict with string keys'
+                )
+            try:
+                self._cache.update(**cache)
+            except LatexMintedConfigError as e:
+                raise LatexMintedConfigError(f'Invalid config file "{path.as_posix()}":  {e}')
+
+        lexing = data.pop('lexing', None)
+        if lexing:
+            if not (isinstance(lexing, dict) and all(isinstance(k, str) for k in lexing)):
+                raise LatexMintedConfigError(
+                    f'Invalid config file "{path.as_posix()}":  "lexing" must be a dict with string keys'
+                )
+            try:
+                self._lexing.update(**lexing)
+            except LatexMintedConfigError as e:
+                raise LatexMintedConfigError(f'Invalid config file "{path.as_posix()}":  {e}')
+
+        stats = data.pop('stats', None)
+        if stats:
+            if not (isinstance(stats, dict) and all(isinstance(k, str) for k in stats)):
+                raise LatexMintedConfigError(
+                    f'Invalid config file "{path.as_posix()}":  "stats" must be a dict with string keys'
+                )
+            try:
+                self._stats.update(**stats)
+            except LatexMintedConfigError as e:
+                raise LatexMintedConfigError(f'Invalid config file "{path.as_posix()}":  {e}')
+
         if data:
             unknowns_keys = ', '.join(f'"{k}"' for k in data)
             raise LatexMintedConfigError(
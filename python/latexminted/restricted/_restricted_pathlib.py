@@ -19,8 +19,18 @@ from ._latexminted_config import latexminted_config
 
 
 # `[0-9a-zA-Z_-]+` covers temp file names `_<MD5 hash>` plus code cache file
-# names `<MD5 hash>` plus style names `<style name>`.
-_minted_temp_file_re = re.compile(r'[0-9a-zA-Z_-]+\.(?:config|data|errlog|highlight|index|message|style)\.minted')
+# names `<MD5 hash>` plus style names `<style name>` plus the cache lock file
+# `_latexminted`.
+_minted_temp_file_re = re.compile(
+    r'[0-9a-zA-Z_-]+\.'
+    r'(?:bundle|checkpoint|config|configcache|configpending|data|errlog|eviction|highlight|index|lease|lock|message|'
+    r'stats|style)'
+    r'\.minted'
+)
+# With `cachelayout=sharded`, cache files for highlighted code are stored in
+# subdirectories `<hash[:2]>/<hash[2:4]>/` of the cache directory.
+_minted_hash_file_re = re.compile(r'([0-9a-f]{4})[0-9a-f]{28}\.highlight\.minted')
+_minted_shard_dir_re = re.compile(r'[0-9a-f]{2}')
 
 
 if latexminted_config.security.file_path_analysis == 'resolve':
@@ -40,6 +50,15 @@ class MintedTempRestrictedPath(MintedBaseRestrictedPath):
             return self._writable_file_cache[self.cache_key]
         except KeyError:
             if _minted_temp_file_re.fullmatch(self.name):
+                hash_match = _minted_hash_file_re.fullmatch(self.name)
+                if (hash_match and _minted_shard_dir_re.fullmatch(self.parent.name) and
+                        _minted_shard_dir_re.fullmatch(self.parent.parent.name) and
+                        hash_match.group(1) != f'{self.parent.parent.name}{self.parent.name}'):
+                    self._writable_file_cache[self.cache_key] = (
+                        False,
+                        f'file name "{self.name}" does not match its shard subdirectories in the minted cache'
+                    )
+                    return self._writable_file_cache[self.cache_key]
                 return super().writable_file()
             self._writable_file_cache[self.cache_key] = (
                 False,
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import functools
+import os
+import re
+import time
+from collections import defaultdict
+from json import loads as json_loads
+from json import dumps as json_dumps
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+from .cache import file_lock
+
+
+
+
+# Counters describing how effective the cache is and where time is spent.
+# These are accumulated in the module-level `stats` object by `highlight()`,
+# `styledef()`, and `clean()`, and saved at the end of each `latexminted`
+# run when the `.latexminted_config` setting `stats.enable` is true.
+
+counter_descriptions: dict[str, str] = {
+    'snippets': 'Code snippets requested for highlighting',
+    'cache_hits': 'Highlighted code found in the cache without lexing',
+    'cache_misses': 'Highlighted code that required lexing',
+    'bytes_lexed': 'Bytes of code lexed (UTF-8)',
+    'incremental_lexes': 'Highlighted code lexed incrementally from saved lexer checkpoints',
+    'parallel_lexes': 'Highlighted code lexed in parallel chunks',
+    'budget_exceeded': 'Highlighting stopped for exceeding the lexing time or memory budget',
+    'styles': 'Style definitions requested',
+    'outputs_written': 'Highlighted code and style definition files written',
+    'index_files_scanned': 'Cache index files read while cleaning',
+    'files_evicted': 'Cache files deleted while cleaning',
+}
+
+stages: tuple[str, ...] = ('highlight', 'styledef', 'clean')
+
+
+class Stats(object):
+    def __init__(self):
+        self._counters: dict[str, int] = defaultdict(int)
+        self._seconds: dict[str, float] = defaultdict(float)
+
+    def count(self, counter: str, n: int = 1):
+        self._counters[counter] += n
+
+    def add_seconds(self, stage: str, seconds: float):
+        self._seconds[stage] += seconds
+
+    def as_dict(self) -> dict[str, dict[str, int] | dict[str, float]]:
+        return {
+            'counters': {k: self._counters[k] for k in counter_descriptions},
+            'seconds': {k: round(self._seconds[k], 6) for k in stages},
+        }
+
+    def clear(self):
+        self._counters.clear()
+        self._seconds.clear()
+
+    def snapshot(self) -> tuple[dict[str, int], dict[str, float]]:
+        return (self._counters.copy(), self._seconds.copy())
+
+    def restore(self, snapshot: tuple[dict[str, int], dict[str, float]]):
+        self.clear()
+        self._counters.update(snapshot[0])
+        self._seconds.update(snapshot[1])
+
+
+stats = Stats()
+
+
+FuncType = TypeVar('FuncType', bound=Callable[..., Any])
+
+def timed(stage: str) -> Callable[[FuncType], FuncType]:
+    '''
+    Decorator that adds the time spent in a function to a stage.
+    '''
+    def decorator(func: FuncType) -> FuncType:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats.add_seconds(stage, time.perf_counter() - start)
+        return wrapper  # type: ignore
+    return decorator
+
+
+
+
+def accumulate_job_stats(job_stats: dict[str, Any] | None, *, md5: str, timestamp: str) -> dict[str, Any]:
+    '''
+    Add the current run's stats to existing stats for the job.  A compile
+    may involve several `latexminted` runs (for example, without batch
+    mode), so stats are accumulated for runs with the same compile
+    timestamp.  Stats from earlier compiles are replaced.
+    '''
+    current = stats.as_dict()
+    if job_stats is None or job_stats.get('timestamp') != timestamp:
+        return {'md5': md5, 'timestamp': timestamp, 'runs': 1, **current}
+    job_stats['runs'] += 1
+    for group in ('counters', 'seconds'):
+        for k, v in current[group].items():
+            job_stats[group][k] = job_stats[group].get(k, 0) + v
+        if group == 'seconds':
+            job_stats[group] = {k: round(v, 6) for k, v in job_stats[group].items()}
+    return job_stats
+
+
+def save_job_stats(*, md5: str, timestamp: str) -> bool:
+    '''
+    Save stats for the current job to `_<md5>.stats.minted` (JSON), in the
+    first writable location for temp files.
+    '''
+    # Lazy import, since this depends on LaTeX security settings while the
+    # rest of the module does not
+    from latexrestricted import PathSecurityError
+    from .restricted import MintedTempRestrictedPath
+
+    stats_file_name = f'_{md5}.stats.minted'
+    for write_path in MintedTempRestrictedPath.tex_openout_roots():
+        stats_path = write_path / stats_file_name
+        try:
+            job_stats = json_loads(stats_path.read_bytes())
+        except Exception:
+            job_stats = None
+        job_stats = accumulate_job_stats(job_stats, md5=md5, timestamp=timestamp)
+        try:
+            stats_path.write_text(json_dumps(job_stats, indent=2), encoding='utf8')
+        except (PermissionError, PathSecurityError):
+            continue
+        return True
+    return False
+
+
+
+
+_prometheus_sample_re = re.compile(r'([a-zA-Z_:][a-zA-Z0-9_:]*(?:\{[^}]*\})?) ([^ ]+)')
+
+def prometheus_samples() -> dict[str, float]:
+    '''
+    Current run's stats as Prometheus counter samples.
+    '''
+    current = stats.as_dict()
+    samples: dict[str, float] = {'latexminted_runs_total': 1}
+    for k, v in current['counters'].items():
+        samples[f'latexminted_{k}_total'] = v
+    for k, v in current['seconds'].items():
+        samples[f'latexminted_stage_seconds_total{{stage="{k}"}}'] = v
+    return samples
+
+
+def _format_sample_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return f'{value:.6f}'
+
+
+def update_prometheus_textfile(textfile: str) -> bool:
+    '''
+    Add the current run's stats to the counters in a Prometheus node exporter
+    textfile collector file.  The file is locked while it is updated, and is
+    replaced atomically so that the exporter never reads a partial file.
+
+    The textfile location is typically outside of locations that LaTeX can
+    write, so this uses standard paths.  It is only ever set by the
+    `.latexminted_config` setting `stats.prometheus_textfile`, and config
+    files are required to be non-writable by LaTeX.
+    '''
+    textfile_path = Path(textfile)
+    with file_lock(textfile_path.with_name(f'.{textfile_path.name}.lock')):
+        samples: dict[str, float] = defaultdict(float)
+        try:
+            old_text = textfile_path.read_text(encoding='utf8')
+        except FileNotFoundError:
+            old_text = ''
+        except OSError:
+            return False
+        for line in old_text.splitlines():
+            match = _prometheus_sample_re.fullmatch(line)
+            if match and match.group(1).startswith('latexminted_'):
+                try:
+                    samples[match.group(1)] += float(match.group(2))
+                except ValueError:
+                    continue
+        for k, v in prometheus_samples().items():
+            samples[k] += v
+
+        lines: list[str] = []
+        lines.append('# HELP latexminted_runs_total Runs of the latexminted executable')
+        lines.append('# TYPE latexminted_runs_total counter')
+        lines.append(f'latexminted_runs_total {_format_sample_value(samples["latexminted_runs_total"])}')
+        for k, v in counter_descriptions.items():
+            lines.append(f'# HELP latexminted_{k}_total {v}')
+            lines.append(f'# TYPE latexminted_{k}_total counter')
+            lines.append(f'latexminted_{k}_total {_format_sample_value(samples[f"latexminted_{k}_total"])}')
+        lines.append('# HELP latexminted_stage_seconds_total Time spent in each stage')
+        lines.append('# TYPE latexminted_stage_seconds_total counter')
+        for k in stages:
+            v = samples[f'latexminted_stage_seconds_total{{stage="{k}"}}']
+            lines.append(f'latexminted_stage_seconds_total{{stage="{k}"}} {_format_sample_value(v)}')
+
+        temp_path = textfile_path.with_name(f'.{textfile_path.name}.{os.getpid()}.tmp')
+        try:
+            temp_path.write_text('\n'.join(lines) + '\n', encoding='utf8')
+            os.replace(temp_path, textfile_path)
+        except OSError:
+            try:
+                temp_path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            return False
+    return True
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import multiprocessing
+import traceback
+from multiprocessing.connection import Connection
+from typing import Any
+from .processes import spawn_context
+
+
+
+
+# Lexing with a time and memory budget for each snippet, for the
+# `.latexminted_config` settings `lexing.timeout_seconds` and
+# `lexing.max_memory_mb`.  Code is highlighted in a separate worker process,
+# so that a lexer that never finishes (for example, due to catastrophic regex
+# backtracking) or that uses too much memory can be killed without affecting
+# the rest of the batch.  The worker is reused for all snippets in a run, and
+# is only restarted after it is killed or fails.  It is started with `spawn`,
+# since forking while batch mode threads are reading and writing files is not
+# safe, and the startup cost is only paid once per run.  The worker never
+# imports from the document directory (see `processes.py`).  If a worker
+# can't be started, highlighting fails rather than running without the
+# budget.
+
+class SupervisedHighlightError(Exception):
+    '''
+    Highlighting in the worker failed.  `latex_errors` are error messages
+    from the worker that are ready for `Messages.append_error()`; otherwise,
+    the exception message describes the failure.
+    '''
+    def __init__(self, message: str = '', *, latex_errors: list[str] | None = None):
+        super().__init__(message)
+        self.latex_errors: list[str] = latex_errors or []
+
+
+class SupervisedHighlightTimeout(SupervisedHighlightError):
+    pass
+
+
+class SupervisedHighlightMemoryError(SupervisedHighlightError):
+    pass
+
+
+
+
+def _worker_main(conn: Connection, max_memory_mb: int | None):
+    from pygments import highlight as pygments_highlight
+    from .highlighting import make_lexer_and_formatter
+    from .messages import Messages
+    from .restricted import load_custom_lexer
+
+    if max_memory_mb is not None:
+        try:
+            import resource
+        except ImportError:
+            # Memory limits are only available on POSIX systems
+            pass
+        else:
+            limit = max_memory_mb * 1024**2
+            try:
+                resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+            except (OSError, ValueError):
+                pass
+    conn.send(('ready', None))
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        code, py_opts, custom_lexer_opts, lexer_opts, filter_opts, formatter_opts = request
+        try:
+            messages = Messages(md5='supervised')
+            lexer_and_formatter = make_lexer_and_formatter(
+                messages=messages, py_opts=py_opts, custom_lexer_opts=custom_lexer_opts, lexer_opts=lexer_opts,
+                filter_opts=filter_opts, formatter_opts=formatter_opts, load_custom_lexer=load_custom_lexer
+            )
+            if lexer_and_formatter is None:
+                conn.send(('messages', messages.errors))
+                continue
+            pygments_lexer, pygments_formatter = lexer_and_formatter
+            highlighted = pygments_highlight(code, pygments_lexer, pygments_formatter)
+        except MemoryError:
+            # The worker may not be usable after running out of memory, so it
+            # exits and is restarted for the next snippet
+            conn.send(('memory', None))
+            break
+        except Exception:
+            conn.send(('exception', traceback.format_exc()))
+            continue
+        conn.send(('ok', highlighted))
+
+
+
+
+class HighlightSupervisor(object):
+    '''
+    Highlight code in a worker process, killing the worker if a snippet takes
+    longer than `timeout_seconds`.  With `max_memory_mb`, the address space
+    of the worker is limited (POSIX only).
+    '''
+    def __init__(self, *, timeout_seconds: int | float | None, max_memory_mb: int | None):
+        self.timeout_seconds = timeout_seconds
+        self.max_memory_mb = max_memory_mb
+        self._process: multiprocessing.process.BaseProcess | None = None
+        self._conn: Connection | None = None
+
+    def _start(self):
+        context = spawn_context()
+        if context is None:
+            raise SupervisedHighlightError(latex_errors=[
+                r'Cannot highlight with a time or memory limit '
+                r'(\detokenize{"lexing.timeout_seconds"} or \detokenize{"lexing.max_memory_mb"} '
+                r'in \detokenize{.latexminted_config}), '
+                r'since this Python executable cannot start worker processes'
+            ])
+        conn, worker_conn = context.Pipe()
+        process = context.Process(target=_worker_main, args=(worker_conn, self.max_memory_mb), daemon=True)
+        process.start()
+        worker_conn.close()
+        try:
+            conn.recv()
+        except EOFError:
+            process.join()
+            conn.close()
+            raise SupervisedHighlightError('worker process failed to start')
+        self._process = process
+        self._conn = conn
+
+    def _kill(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def highlight(self, code: str, *, py_opts: dict[str, Any], custom_lexer_opts: dict[str, Any],
+                  lexer_opts: dict[str, Any], filter_opts: dict[str, Any], formatter_opts: dict[str, Any]) -> str:
+        '''
+        Highlight code with the lexer and formatter for processed highlighting
+        options.  Raise `SupervisedHighlightError` (or a subclass) if the
+        budget is exceeded or the worker fails.
+        '''
+        if self._process is None:
+            self._start()
+        assert self._conn is not None
+        try:
+            self._conn.send((code, py_opts, custom_lexer_opts, lexer_opts, filter_opts, formatter_opts))
+            if not self._conn.poll(self.timeout_seconds):
+                self._kill()
+                raise SupervisedHighlightTimeout
+            status, result = self._conn.recv()
+        except (EOFError, OSError):
+            self._kill()
+            raise SupervisedHighlightError('worker process exited unexpectedly')
+        if status == 'memory':
+            self._kill()
+            raise SupervisedHighlightMemoryError
+        if status == 'messages':
+            raise SupervisedHighlightError(latex_errors=result)
+        if status == 'exception':
+            raise SupervisedHighlightError(result)
+        return result
+
+    def close(self):
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self._process.join(1)
+        self._kill()
+
+
+
+
+_supervisor: HighlightSupervisor | None = None
+
+def get_supervisor(*, timeout_seconds: int | float | None, max_memory_mb: int | None) -> HighlightSupervisor:
+    '''
+    Shared supervisor, so that the worker process is reused across snippets.
+    '''
+    global _supervisor
+    if _supervisor is None:
+        _supervisor = HighlightSupervisor(timeout_seconds=timeout_seconds, max_memory_mb=max_memory_mb)
+    return _supervisor
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import zipfile
+from json import dumps as json_dumps
+from pathlib import Path
+from typing import Any
+import pytest
+
+
+
+
+# Commands that run within LaTeX are tested by running them in a new
+# process, as LaTeX would, since latexrestricted determines the working
+# directory and the TeX configuration when it is first imported.  The TeX
+# installation is replaced by a stand-in `kpsewhich` that reports TeX Live's
+# default security settings, as in `latexminted replay`.
+
+package_root_path = Path(__file__).resolve().parent.parent
+repo_root_path = package_root_path.parent
+
+timestamp = '20260615120000'
+
+_kpsewhich_standin = '''\
+#!{executable}
+import os
+import sys
+var_values = {{'openin_any': 'a', 'openout_any': 'p', 'shell_escape': 'p'}}
+if len(sys.argv) == 3 and sys.argv[1] == '--var-value':
+    print(var_values.get(sys.argv[2], ''))
+elif len(sys.argv) > 1 and os.path.isfile(sys.argv[-1]):
+    print(sys.argv[-1])
+'''
+
+_message_error_re = re.compile(r'^  \\minted@error\{(.*)\}%$', re.MULTILINE)
+_message_warning_re = re.compile(r'^  \\minted@warning\{(.*)\}%$', re.MULTILINE)
+
+
+def dumps_data(data: dict[str, Any] | list[dict[str, Any]]) -> str:
+    '''
+    Data in the format of `.data.minted` files.  Values of `pyopt` are
+    written with `pyopt.<key>` keys, and `cachefiles` is written as a list.
+    '''
+    def dumps_dict(d: dict[str, Any]) -> str:
+        items: list[str] = []
+        for k, v in d.items():
+            if k == 'pyopt':
+                items.extend(f'{f"pyopt.{pyopt_k}"!r}: {pyopt_v!r}' for pyopt_k, pyopt_v in v.items())
+            elif k == 'cachefiles':
+                items.append(f'{k!r}: {repr(v)!r}')
+            else:
+                items.append(f'{k!r}: {v!r}')
+        return '{\n' + ''.join(f'{item},\n' for item in items) + '}'
+    if isinstance(data, dict):
+        return dumps_dict(data) + '\n'
+    return '[\n' + ''.join(f'{dumps_dict(d)},\n' for d in data) + ']\n'
+
+
+def highlight_data(code: str, lexer: str, *, highlightfilename: str, cachepath: str = '_minted',
+                   inputlineno: int = 1, **pyopt: str) -> dict[str, Any]:
+    from latexminted.api import default_options
+    return {
+        'command': 'highlight',
+        'jobname': 'doc',
+        'timestamp': timestamp,
+        'currentfilepath': '',
+        'currentfile': 'doc.tex',
+        'inputlineno': str(inputlineno),
+        'cachepath': cachepath,
+        'highlightfilename': highlightfilename,
+        'code': code,
+        'pyopt': {**default_options, 'lexer': lexer, **pyopt},
+    }
+
+
+def styledef_data(*, styledeffilename: str, cachepath: str = '_minted', style: str = 'default') -> dict[str, Any]:
+    return {
+        'command': 'styledef',
+        'jobname': 'doc',
+        'timestamp': timestamp,
+        'currentfilepath': '',
+        'currentfile': 'doc.tex',
+        'inputlineno': '1',
+        'cachepath': cachepath,
+        'styledeffilename': styledeffilename,
+        'style': style,
+        'commandprefix': 'PYG',
+    }
+
+
+def clean_data(*, cachefiles: list[str], cachepath: str = '_minted', **kwargs: str) -> dict[str, Any]:
+    return {
+        'command': 'clean',
+        'jobname': 'doc',
+        'timestamp': timestamp,
+        'cachepath': cachepath,
+        'cachefiles': cachefiles,
+        **kwargs,
+    }
+
+
+
+
+class TexSandbox(object):
+    '''
+    Working directory and environment for running `latexminted` commands as
+    LaTeX would.  Config files are loaded from a sandbox config directory.
+    '''
+    def __init__(self, path: Path):
+        self.path = path
+        self.work_path = path / 'work'
+        self.work_path.mkdir()
+        # The cache directory is created by LaTeX
+        (self.work_path / '_minted').mkdir()
+        texbin_path = path / 'texbin'
+        texbin_path.mkdir()
+        kpsewhich_path = texbin_path / 'kpsewhich'
+        kpsewhich_path.write_text(_kpsewhich_standin.format(executable=sys.executable), encoding='utf8')
+        kpsewhich_path.chmod(0o755)
+        self.config_path = path / 'config' / 'latexminted' / '.latexminted_config'
+        self.config_path.parent.mkdir(parents=True)
+        self.env = os.environ.copy()
+        for env_var in ('TEXMFOUTPUT', 'TEXMF_OUTPUT_DIRECTORY', 'PYTHONPATH'):
+            self.env.pop(env_var, None)
+        self.env['SELFAUTOLOC'] = str(texbin_path.resolve())
+        self.env['TEXSYSTEM'] = 'texlive'
+        self.env['HOME'] = str(path / 'home')
+        self.env['XDG_CONFIG_HOME'] = str(path / 'config')
+        self.env['LATEXMINTED_NO_WHEEL_CACHE'] = '1'
+
+    def write_config(self, config: dict[str, Any]):
+        self.config_path.write_text(json_dumps(config), encoding='utf8')
+
+    def write_data(self, md5: str, data: dict[str, Any] | list[dict[str, Any]], *, name: str | None = None):
+        (self.work_path / (name or f'_{md5}.data.minted')).write_text(dumps_data(data), encoding='utf8')
+
+    def run(self, *args: str, launcher: Path | None = None, python: str = sys.executable,
+            timeout: float = 120) -> subprocess.CompletedProcess:
+        '''
+        Run `latexminted` with arguments in the working directory.  With
+        `launcher`, run that launcher script without site-packages, so that
+        dependencies are only available from its bundled wheels.  Otherwise,
+        run the package from this repository.  `python` is the Python
+        executable; processes started with `sys.executable` also use it.
+        '''
+        env = self.env.copy()
+        if launcher is not None:
+            cmd = [python, '-S', str(launcher), *args]
+        else:
+            cmd = [python, '-m', 'latexminted', *args]
+            env['PYTHONPATH'] = str(package_root_path)
+        return subprocess.run(cmd, cwd=self.work_path, env=env, stdin=subprocess.DEVNULL, capture_output=True,
+                              timeout=timeout)
+
+    def run_command(self, command: str, md5: str, *, launcher: Path | None = None) -> subprocess.CompletedProcess:
+        return self.run(command, '--timestamp', timestamp, md5, launcher=launcher)
+
+    def errors(self, md5: str) -> list[str]:
+        message_path = self.work_path / f'_{md5}.message.minted'
+        if not message_path.is_file():
+            return []
+        return _message_error_re.findall(message_path.read_text(encoding='utf8'))
+
+    def warnings(self, md5: str) -> list[str]:
+        message_path = self.work_path / f'_{md5}.message.minted'
+        if not message_path.is_file():
+            return []
+        return _message_warning_re.findall(message_path.read_text(encoding='utf8'))
+
+
+@pytest.fixture
+def tex_sandbox(tmp_path: Path) -> TexSandbox:
+    if sys.platform == 'win32':
+        pytest.skip('stand-in kpsewhich requires a POSIX system')
+    return TexSandbox(tmp_path)
+
+
+
+
+def _zip_package(wheel_path: Path, package_path: Path):
+    with zipfile.ZipFile(wheel_path, 'w') as wheel_zip:
+        for path in sorted(package_path.rglob('*')):
+            if path.is_file() and '__pycache__' not in path.parts and path.suffix != '.pyc':
+                wheel_zip.write(path, path.relative_to(package_path.parent).as_posix())
+
+
+@pytest.fixture(scope='session')
+def launcher_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    '''
+    The `latexminted.py` launcher for TeX installations, with bundled wheels
+    for this repository's `latexminted` and the installed dependencies.
+    '''
+    import latex2pydata
+    import latexrestricted
+    import pygments
+
+    launcher_dir_path = tmp_path_factory.mktemp('launcher')
+    launcher_path = launcher_dir_path / 'latexminted.py'
+    shutil.copy(repo_root_path / 'latex' / 'restricted' / 'latexminted.py', launcher_path)
+    _zip_package(launcher_dir_path / 'latexminted-0-py3-none-any.whl', package_root_path / 'latexminted')
+    for module in (latex2pydata, latexrestricted, pygments):
+        _zip_package(launcher_dir_path / f'{module.__name__}-{module.__version__}-py3-none-any.whl',
+                     Path(module.__file__).parent)
+    return launcher_path
+
+
+def unguarded_launcher(launcher_path: Path) -> Path:
+    '''
+    Copy of the launcher that runs `main()` without an
+    `if __name__ == '__main__':` guard, like launchers before `minted` 3.9.
+    '''
+    launcher_source = launcher_path.read_text(encoding='utf8')
+    unguarded_launcher_source = launcher_source.replace(
+        "if __name__ == '__main__':\n    from latexminted.cmdline import main\n    main()",
+        'from latexminted.cmdline import main\nmain()'
+    )
+    assert unguarded_launcher_source != launcher_source
+    unguarded_launcher_path = launcher_path.parent / 'latexminted_unguarded.py'
+    unguarded_launcher_path.write_text(unguarded_launcher_source, encoding='utf8')
+    return unguarded_launcher_path
+
+
+def write_hostile_module(dir_path: Path, module_name: str) -> Path:
+    '''
+    Write a module that shadows `module_name` and creates a marker file when
+    it is imported, for checking that `dir_path` is never on `sys.path`.
+    Return the path of the marker file, which is outside `dir_path`.
+    '''
+    marker_path = dir_path.parent / f'imported-{module_name}-from-{dir_path.name}'
+    (dir_path / f'{module_name}.py').write_text(f'open({str(marker_path)!r}, "w").close()\n', encoding='utf8')
+    return marker_path
+
+
+@pytest.fixture(scope='session')
+def bare_python(tmp_path_factory: pytest.TempPathFactory) -> str:
+    '''
+    Python executable of a virtual environment without any packages, for
+    processes that must not find dependencies in site-packages even when
+    they are started without `-S`.
+    '''
+    venv_path = tmp_path_factory.mktemp('venv')
+    subprocess.run([sys.executable, '-m', 'venv', '--without-pip', str(venv_path)], check=True)
+    return str(venv_path / 'bin' / 'python')
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import hashlib
+import subprocess
+import sys
+from json import loads as json_loads
+from conftest import highlight_data, package_root_path, TexSandbox, timestamp
+
+
+
+
+md5 = 'a' * 32
+
+cache_file_names = [
+    f'{1:032x}.highlight.minted',
+    f'ab/cd/abcd{0:028x}.highlight.minted',
+    f'{3:032x}.highlight.minted',
+    f'{4:032x}.highlight.minted',
+]
+
+
+def run_batch(tex_sandbox: TexSandbox, *, failed_write: bool) -> list[str]:
+    '''
+    Highlight all snippets in batch mode, optionally with a failed background
+    write for the second snippet.  Return the cache files listed in the index.
+    '''
+    tex_sandbox.write_data(md5, [
+        highlight_data(f'x = {n}\n', 'python', highlightfilename=name, inputlineno=n)
+        for n, name in enumerate(cache_file_names, 1)
+    ])
+    cache_path = tex_sandbox.work_path / '_minted'
+    if failed_write:
+        # The sharded cache file can't be written when its shard directory is
+        # a file, so the write fails after the snippet is highlighted
+        (cache_path / 'ab').write_text('', encoding='utf8')
+    proc = tex_sandbox.run_command('batch', md5)
+    # Errors are reported to LaTeX with exit code 1
+    assert proc.returncode == (1 if failed_write else 0), proc.stderr
+    return json_loads((cache_path / f'_{md5}.index.minted').read_bytes())['cachefiles']
+
+
+def test_batch_without_failed_write(tex_sandbox: TexSandbox):
+    assert run_batch(tex_sandbox, failed_write=False) == sorted([*cache_file_names, f'_{md5}.index.minted'])
+    assert tex_sandbox.errors(md5) == []
+    for name in cache_file_names:
+        assert (tex_sandbox.work_path / '_minted' / name).is_file()
+
+
+def test_batch_failed_write_rolls_back_to_sequential_result(tex_sandbox: TexSandbox):
+    # Snippets after an error are not highlighted, as when each snippet is
+    # written before the next is highlighted.  Speculative work for later
+    # snippets must be discarded:  no files, no index entries, and only the
+    # error for the failed write.
+    assert run_batch(tex_sandbox, failed_write=True) == [cache_file_names[0], f'_{md5}.index.minted']
+    errors = tex_sandbox.errors(md5)
+    assert len(errors) == 1
+    assert './doc.tex:2:' in errors[0] and 'unexpected error' in errors[0]
+    cache_path = tex_sandbox.work_path / '_minted'
+    assert (cache_path / cache_file_names[0]).is_file()
+    for name in cache_file_names[2:]:
+        assert not (cache_path / name).exists()
+
+
+kpsewhich_logging_script = '''\
+import sys
+import threading
+from latexrestricted import latex_config
+log_path = sys.argv.pop(1)
+kpsewhich_find_file = latex_config.kpsewhich_find_file
+def logged_kpsewhich_find_file(file, **kwargs):
+    with open(log_path, 'a') as log:
+        log.write(f'{file} {threading.current_thread() is threading.main_thread()}\\n')
+    return kpsewhich_find_file(file, **kwargs)
+latex_config.kpsewhich_find_file = logged_kpsewhich_find_file
+from latexminted.cmdline import main
+main()
+'''
+
+
+def test_batch_prefetch_reads_only_working_directory_files(tex_sandbox: TexSandbox):
+    # Input files in the working directory are read by the prefetch threads.
+    # Other files, and files that don't match their MD5 hash, are loaded in
+    # the main thread, which is the only thread that uses kpsewhich.
+    outside_path = tex_sandbox.path / 'outside.py'
+    # Batch mode stops at the first error, so the modified file is last
+    input_files = {'a.py': 'x = 1\n', 'sub/b.py': 'x = 2\n', str(outside_path): 'x = 3\n', 'modified.py': 'x = 4\n'}
+    (tex_sandbox.work_path / 'sub').mkdir()
+    data = []
+    for n, (input_file, code) in enumerate(input_files.items(), 1):
+        (tex_sandbox.work_path / input_file).write_text(code, encoding='utf8')
+        d = highlight_data(code, 'python', highlightfilename=f'{n:032x}.highlight.minted', inputlineno=n)
+        del d['code']
+        d['inputfilepath'] = input_file
+        d['inputfilemdfivesum'] = hashlib.md5(code.encode('utf8')).hexdigest().upper()
+        data.append(d)
+    (tex_sandbox.work_path / 'modified.py').write_text('x = 40\n', encoding='utf8')
+    tex_sandbox.write_data(md5, data)
+
+    script_path = tex_sandbox.path / 'kpsewhich_logging.py'
+    script_path.write_text(kpsewhich_logging_script, encoding='utf8')
+    log_path = tex_sandbox.path / 'kpsewhich.log'
+    proc = subprocess.run([sys.executable, str(script_path), str(log_path), 'batch', '--timestamp', timestamp, md5],
+                          cwd=tex_sandbox.work_path, env={**tex_sandbox.env, 'PYTHONPATH': str(package_root_path)},
+                          capture_output=True, timeout=120)
+    assert proc.returncode == 1, proc.stderr
+    errors = tex_sandbox.errors(md5)
+    assert len(errors) == 1
+    assert './doc.tex:4:' in errors[0] and 'Cannot find the correct input file' in errors[0]
+    assert log_path.read_text(encoding='utf8').splitlines() == ['modified.py True']
+    cache_path = tex_sandbox.work_path / '_minted'
+    for n in (1, 2, 3):
+        assert fr'\PYG{{l+m+mi}}{{{n}}}' in (cache_path / f'{n:032x}.highlight.minted').read_text(encoding='utf8')
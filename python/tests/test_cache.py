@@ -0,0 +1,444 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from json import loads as json_loads
+from json import dumps as json_dumps
+from pathlib import Path
+import pytest
+from pygments import __version__ as pygments_version
+from conftest import highlight_data, TexSandbox
+from latexminted.cache import (
+    acquire_lease, alternate_layout_cache_file_name, cache_lock_file_name, checkpoint_file_name,
+    checkpoint_highlight_file_names, digest_trailer_prefix, flat_cache_file_name, is_hash_cache_file_name,
+    is_sharded_cache_file_name, iter_cache_file_paths, lease_file_name, plan_cache_eviction, read_active_leases,
+    release_lease, sharded_cache_file_name
+)
+from latexminted.command_cache import archive_manifest_name, cache_export, cache_import, CacheScan
+from latexminted.command_gc import gc
+from latexminted.err import CacheArchiveError
+from latexminted.version import __version__
+
+
+
+
+def hash_name(n: int) -> str:
+    return f'{n:032x}.highlight.minted'
+
+
+def sharded(name: str) -> str:
+    return f'{name[:2]}/{name[2:4]}/{name}'
+
+
+def index(timestamp: str, *cache_file_names: str) -> dict:
+    return {'timestamp': timestamp, 'cachefiles': list(cache_file_names)}
+
+
+def plan(*, current: set[str] | None = None, indexes: dict[str, dict] | None = None,
+         sizes: dict[str, int] | None = None, **kwargs) -> dict[str, str]:
+    kwargs.setdefault('max_age_days', 30)
+    kwargs.setdefault('max_bytes', None)
+    kwargs.setdefault('max_files', None)
+    return plan_cache_eviction(timestamp='20260615120000', current_index_name='_current.index.minted',
+                               current_cache_files=current or {'_current.index.minted'},
+                               index_data=indexes or {}, cache_file_sizes=sizes or {}, **kwargs)
+
+
+
+
+def test_layout_cache_file_names():
+    flat_name = f'abcd{0:028x}.highlight.minted'
+    sharded_name = f'ab/cd/{flat_name}'
+    assert sharded_cache_file_name(flat_name) == sharded_cache_file_name(sharded_name) == sharded_name
+    assert flat_cache_file_name(sharded_name) == flat_cache_file_name(flat_name) == flat_name
+    assert alternate_layout_cache_file_name(flat_name) == sharded_name
+    assert alternate_layout_cache_file_name(sharded_name) == flat_name
+    assert is_hash_cache_file_name(flat_name) and not is_sharded_cache_file_name(flat_name)
+    assert is_hash_cache_file_name(sharded_name) and is_sharded_cache_file_name(sharded_name)
+    assert checkpoint_highlight_file_names(checkpoint_file_name('0' * 32, sharded_name)) == (flat_name, sharded_name)
+    assert checkpoint_highlight_file_names(flat_name) is None
+
+
+@pytest.mark.parametrize('name', [
+    f'ab/ce/abcd{0:028x}.highlight.minted',
+    f'cd/ab/abcd{0:028x}.highlight.minted',
+    f'ab/abcd{0:028x}.highlight.minted',
+    f'x/ab/cd/abcd{0:028x}.highlight.minted',
+    f'AB/CD/ABCD{0:028x}.highlight.minted',
+    f'abcd{0:027x}.highlight.minted',
+    '_abcd.index.minted',
+    'default.style.minted',
+])
+def test_invalid_hash_cache_file_names(name: str):
+    assert not is_hash_cache_file_name(name)
+    assert not is_sharded_cache_file_name(name)
+
+
+def test_iter_cache_file_paths_covers_both_layouts(tmp_path: Path):
+    for name in [hash_name(1), sharded(hash_name(2)), '_a.index.minted', cache_lock_file_name, 'x.txt', 'ab/x.minted']:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_text('x', encoding='utf8')
+    assert {name: path for name, path in iter_cache_file_paths(tmp_path)} == {
+        hash_name(1): tmp_path / hash_name(1),
+        sharded(hash_name(2)): tmp_path / sharded(hash_name(2)),
+        '_a.index.minted': tmp_path / '_a.index.minted',
+    }
+
+
+@pytest.mark.parametrize('from_sharded', [False, True])
+def test_highlight_migrates_cache_file_between_layouts(tex_sandbox: TexSandbox, from_sharded: bool):
+    md5 = 'e' * 32
+    cache_path = tex_sandbox.work_path / '_minted'
+    flat_name = f'abcd{0:028x}.highlight.minted'
+    old_name, new_name = (sharded(flat_name), flat_name) if from_sharded else (flat_name, sharded(flat_name))
+    tex_sandbox.write_data(md5, highlight_data('x = 1\n', 'python', highlightfilename=old_name))
+    proc = tex_sandbox.run_command('highlight', md5)
+    assert proc.returncode == 0, proc.stderr
+    assert (cache_path / old_name).is_file() and not (cache_path / new_name).exists()
+    # The file is moved rather than highlighted again
+    (cache_path / old_name).write_text('migrated', encoding='utf8')
+    tex_sandbox.write_data(md5, highlight_data('x = 1\n', 'python', highlightfilename=new_name))
+    proc = tex_sandbox.run_command('highlight', md5)
+    assert proc.returncode == 0, proc.stderr
+    assert tex_sandbox.errors(md5) == []
+    assert (cache_path / new_name).read_text(encoding='utf8') == 'migrated'
+    assert not (cache_path / old_name).exists()
+    # Empty shard subdirectories are removed
+    assert (cache_path / 'ab').exists() == (not from_sharded)
+
+
+def test_highlight_rejects_mismatched_shard_subdirectories(tex_sandbox: TexSandbox):
+    md5 = 'e' * 32
+    name = f'ab/ce/abcd{0:028x}.highlight.minted'
+    tex_sandbox.write_data(md5, highlight_data('x = 1\n', 'python', highlightfilename=name))
+    proc = tex_sandbox.run_command('highlight', md5)
+    assert proc.returncode == 1
+    errors = tex_sandbox.errors(md5)
+    assert len(errors) == 1 and 'Invalid file name' in errors[0]
+    assert not (tex_sandbox.work_path / '_minted' / 'ab').exists()
+
+
+
+
+def test_eviction_expired_index_only_evicts_files_no_other_index_uses():
+    indexes = {
+        '_old.index.minted': index('20260101000000', hash_name(1), hash_name(2)),
+        '_new.index.minted': index('20260610000000', hash_name(2)),
+    }
+    sizes = {name: 10 for name in ['_old.index.minted', '_new.index.minted', hash_name(1), hash_name(2)]}
+    assert plan(indexes=indexes, sizes=sizes) == {'_old.index.minted': 'expired', hash_name(1): 'unused'}
+
+
+def test_eviction_never_evicts_current_files():
+    current = {'_current.index.minted', hash_name(1)}
+    sizes = {'_current.index.minted': 10, hash_name(1): 10, hash_name(2): 10}
+    assert plan(current=current, sizes=sizes) == {hash_name(2): 'unused'}
+    assert plan(current=current, sizes=sizes, max_bytes=0, max_files=0) == {hash_name(2): 'unused'}
+
+
+def test_eviction_budget_evicts_least_recently_used_indexes_first():
+    indexes = {
+        '_a.index.minted': index('20260601000000', hash_name(1)),
+        '_b.index.minted': index('20260602000000', hash_name(2), hash_name(4)),
+        '_c.index.minted': index('20260603000000', hash_name(3), hash_name(4)),
+    }
+    sizes = {name: 100 for name in indexes}
+    sizes.update({hash_name(n): 1000 for n in range(1, 5)})
+    sizes['_current.index.minted'] = 100
+    # 4400 bytes total; evicting `_a` and its file leaves 3300
+    assert plan(indexes=indexes, sizes=sizes, max_bytes=3500) == {
+        '_a.index.minted': 'budget', hash_name(1): 'budget',
+    }
+    # Evicting `_b` does not free the file that `_c` still uses
+    assert plan(indexes=indexes, sizes=sizes, max_files=4) == {
+        '_a.index.minted': 'budget', hash_name(1): 'budget',
+        '_b.index.minted': 'budget', hash_name(2): 'budget',
+    }
+    assert plan(indexes=indexes, sizes=sizes, max_bytes=10**6, max_files=10**6) == {}
+
+
+def test_eviction_checkpoints_follow_their_highlight_files():
+    used = checkpoint_file_name('0' * 32, hash_name(1))
+    unused = checkpoint_file_name('0' * 32, hash_name(2))
+    current = {'_current.index.minted', sharded(hash_name(1))}
+    sizes = {name: 10 for name in ['_current.index.minted', sharded(hash_name(1)), used, unused]}
+    assert plan(current=current, sizes=sizes) == {unused: 'unused'}
+
+
+
+
+def test_lease_acquire_renew_read_and_release(tmp_path: Path):
+    assert acquire_lease(tmp_path, md5='a', cache_file_names=[hash_name(1)])
+    assert acquire_lease(tmp_path, md5='a', cache_file_names=[hash_name(2)])
+    assert acquire_lease(tmp_path, md5='b', cache_file_names=[hash_name(3)])
+    lease_text = (tmp_path / lease_file_name('a')).read_text(encoding='utf8')
+    assert lease_text.splitlines() == [hash_name(1), hash_name(2)]
+
+    assert read_active_leases(tmp_path, lease_seconds=60) == {
+        lease_file_name('a'), hash_name(1), hash_name(2), lease_file_name('b'), hash_name(3),
+    }
+    assert read_active_leases(tmp_path, lease_seconds=60, exclude_md5='a') == {lease_file_name('b'), hash_name(3)}
+
+    release_lease(tmp_path, md5='b')
+    assert not (tmp_path / lease_file_name('b')).exists()
+    assert read_active_leases(tmp_path, lease_seconds=60) == {lease_file_name('a'), hash_name(1), hash_name(2)}
+
+
+def test_lease_cost_is_linear_in_snippets(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    # Without batch mode, each snippet is leased separately, so the lease is
+    # appended to rather than read and rewritten
+    written: list[int] = []
+    path_open = Path.open
+
+    def counting_open(self: Path, *args, **kwargs):
+        file = path_open(self, *args, **kwargs)
+        if self.name == lease_file_name('a'):
+            file_write = file.write
+            file.write = lambda text: written.append(len(text)) or file_write(text)
+        return file
+
+    monkeypatch.setattr(Path, 'open', counting_open)
+    for n in range(200):
+        assert acquire_lease(tmp_path, md5='a', cache_file_names=[hash_name(n)])
+    lease_path = tmp_path / lease_file_name('a')
+    assert sum(written) == lease_path.stat().st_size == 200 * len(f'{hash_name(0)}\n')
+    assert read_active_leases(tmp_path, lease_seconds=60) == {lease_path.name} | {hash_name(n) for n in range(200)}
+
+
+def test_lease_expires_without_renewal(tmp_path: Path):
+    acquire_lease(tmp_path, md5='a', cache_file_names=[hash_name(1)])
+    old = time.time() - 120
+    os.utime(tmp_path / lease_file_name('a'), (old, old))
+    assert read_active_leases(tmp_path, lease_seconds=60) == set()
+    acquire_lease(tmp_path, md5='a', cache_file_names=[])
+    assert read_active_leases(tmp_path, lease_seconds=60) == {lease_file_name('a'), hash_name(1)}
+
+
+
+
+def write_cache_file(cache_path: Path, name: str, *, age_seconds: float = 7200, content: str = 'x') -> Path:
+    path = cache_path / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding='utf8')
+    mtime = time.time() - age_seconds
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_gc_keeps_leased_recent_and_indexed_files(tmp_path: Path):
+    write_cache_file(tmp_path, '_doc.index.minted',
+                     content=json_dumps(index('20260610000000', hash_name(1), sharded(hash_name(2)))))
+    write_cache_file(tmp_path, hash_name(1))
+    write_cache_file(tmp_path, sharded(hash_name(2)))
+    write_cache_file(tmp_path, hash_name(3))
+    write_cache_file(tmp_path, sharded(hash_name(0xab12 << 112)))
+    write_cache_file(tmp_path, hash_name(5), age_seconds=0)
+    write_cache_file(tmp_path, hash_name(6))
+    acquire_lease(tmp_path, md5='job', cache_file_names=[hash_name(6)])
+
+    report = gc(cache_dir=str(tmp_path), timestamp='20260615120000', dry_run=True)
+    assert report['dryrun']
+    assert {e['file']: e['reason'] for e in report['evicted']} == {
+        hash_name(3): 'unused', sharded(hash_name(0xab12 << 112)): 'unused',
+    }
+    assert (tmp_path / hash_name(3)).is_file()
+
+    report_path = tmp_path / 'report.json'
+    gc(cache_dir=str(tmp_path), timestamp='20260615120000', report=str(report_path))
+    assert not (tmp_path / hash_name(3)).exists()
+    assert not (tmp_path / 'ab').exists()
+    for name in [hash_name(1), sharded(hash_name(2)), hash_name(5), hash_name(6)]:
+        assert (tmp_path / name).is_file()
+    assert json_loads(report_path.read_bytes())['evictedfiles'] == 2
+
+
+def test_gc_evicts_files_of_expired_leases(tmp_path: Path):
+    write_cache_file(tmp_path, hash_name(1))
+    acquire_lease(tmp_path, md5='crashed', cache_file_names=[hash_name(1)])
+    lease_path = tmp_path / lease_file_name('crashed')
+    old = time.time() - 7200
+    os.utime(lease_path, (old, old))
+    gc(cache_dir=str(tmp_path), timestamp='20260615120000', lease_seconds=3600)
+    assert not (tmp_path / hash_name(1)).exists()
+    assert not lease_path.exists()
+
+
+
+
+def export_cache(cache_path: Path, archive_path: Path) -> dict:
+    with ThreadPoolExecutor() as executor:
+        scan = CacheScan(str(cache_path), executor=executor)
+        return cache_export(scan, executor=executor, archive=str(archive_path), timestamp='20260615120000',
+                            max_age_days=30)
+
+
+def write_archive(archive_path: Path, manifest: dict, members: dict[str, bytes]):
+    with tarfile.open(archive_path, 'w', format=tarfile.PAX_FORMAT) as tar:
+        for name, data in [(archive_manifest_name, json_dumps(manifest).encode('utf8')), *members.items()]:
+            tarinfo = tarfile.TarInfo(name)
+            tarinfo.size = len(data)
+            tar.addfile(tarinfo, io.BytesIO(data))
+
+
+def archive_manifest(members: dict[str, bytes], **kwargs) -> dict:
+    return {
+        'format': 1,
+        'timestamp': '20260615120000',
+        'latexminted': __version__,
+        'pygments': pygments_version,
+        'files': {
+            name: {'sha256': hashlib.sha256(data).hexdigest(), 'bytes': len(data)} for name, data in members.items()
+        },
+        **kwargs,
+    }
+
+
+def with_digest_trailer(content: str) -> str:
+    return f'{content}{digest_trailer_prefix}{hashlib.sha256(content.encode("utf8")).hexdigest()}\n'
+
+
+def test_cache_export_import_round_trip(tmp_path: Path):
+    cache_path = tmp_path / '_minted'
+    write_cache_file(cache_path, '_doc.index.minted', content=json_dumps(
+        index('20260610000000', hash_name(1), sharded(hash_name(2)), hash_name(3), hash_name(4))
+    ))
+    write_cache_file(cache_path, hash_name(1), content=with_digest_trailer('one'))
+    write_cache_file(cache_path, sharded(hash_name(2)), content='two')
+    # Corrupt:  the digest trailer does not match
+    write_cache_file(cache_path, hash_name(3), content=with_digest_trailer('three') + 'x')
+    write_cache_file(cache_path, '_old.index.minted', content=json_dumps(index('20250101000000', hash_name(5))))
+    write_cache_file(cache_path, hash_name(5))
+    archive_path = tmp_path / 'cache.tar.gz'
+    export_data = export_cache(cache_path, archive_path)
+    assert export_data['files'] == 3 and export_data['indexes'] == 1
+    assert export_data['staleindexes'] == ['_old.index.minted']
+    assert export_data['skippedfiles'] == [hash_name(3)]
+
+    import_path = tmp_path / 'imported'
+    import_data = cache_import(archive=str(archive_path), cache_dir=str(import_path))
+    assert import_data['compatible'] and import_data['importedfiles'] == 3
+    assert import_data['rejectedfiles'] == {} and import_data['droppedfiles'] == []
+    assert (import_path / hash_name(1)).read_text(encoding='utf8') == with_digest_trailer('one')
+    assert (import_path / sharded(hash_name(2))).read_text(encoding='utf8') == 'two'
+    # Indexes only list files that exist
+    assert json_loads((import_path / '_doc.index.minted').read_bytes())['cachefiles'] == sorted([
+        hash_name(1), sharded(hash_name(2)),
+    ])
+    assert not (import_path / hash_name(3)).exists() and not (import_path / '_old.index.minted').exists()
+
+    (import_path / hash_name(1)).write_text('kept', encoding='utf8')
+    import_data = cache_import(archive=str(archive_path), cache_dir=str(import_path))
+    assert import_data['importedfiles'] == 0 and import_data['existingfiles'] == 3
+    assert (import_path / hash_name(1)).read_text(encoding='utf8') == 'kept'
+
+
+def test_cache_import_rejects_files_that_do_not_match_manifest(tmp_path: Path):
+    members = {hash_name(1): b'one', hash_name(2): b'two', '_doc.index.minted': b'{}'}
+    manifest = archive_manifest(members)
+    manifest['files'][hash_name(3)] = {'sha256': hashlib.sha256(b'three').hexdigest(), 'bytes': 5}
+    # Same size, different content
+    members[hash_name(2)] = b'TWO'
+    members['_doc.index.minted'] = json_dumps(index('20260610000000', hash_name(1), hash_name(2))).encode('utf8')
+    members[hash_name(4)] = b'four'
+    archive_path = tmp_path / 'cache.tar'
+    write_archive(archive_path, manifest, members)
+    cache_path = tmp_path / '_minted'
+    import_data = cache_import(archive=str(archive_path), cache_dir=str(cache_path))
+    assert import_data['rejectedfiles'] == {
+        hash_name(2): 'digest does not match manifest',
+        hash_name(3): 'missing from archive',
+        hash_name(4): 'not in manifest or duplicate',
+        '_doc.index.minted': 'digest does not match manifest',
+    }
+    assert sorted(p.name for p in cache_path.iterdir() if p.name != cache_lock_file_name) == [hash_name(1)]
+
+
+def test_cache_import_rejects_unsafe_paths(tmp_path: Path):
+    members = {
+        '../escaped.minted': b'x',
+        (tmp_path / 'absolute.minted').as_posix(): b'x',
+        f'ab/../../{hash_name(1)}': b'x',
+        'sub/file.minted': b'x',
+        '.hidden.minted': b'x',
+        cache_lock_file_name: b'x',
+        lease_file_name('a'): b'x',
+        hash_name(1): b'one',
+    }
+    archive_path = tmp_path / 'cache.tar'
+    write_archive(archive_path, archive_manifest(members), members)
+    cache_path = tmp_path / 'work' / '_minted'
+    import_data = cache_import(archive=str(archive_path), cache_dir=str(cache_path))
+    assert sorted(import_data['rejectedfiles']) == sorted(n for n in members if n != hash_name(1))
+    assert set(import_data['rejectedfiles'].values()) == {'invalid file name or type'}
+    assert import_data['importedfiles'] == 1
+    assert [p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob('*.minted')] == [f'work/_minted/{hash_name(1)}']
+
+    # Links are rejected as well
+    with tarfile.open(archive_path, 'w', format=tarfile.PAX_FORMAT) as tar:
+        manifest_bytes = json_dumps(archive_manifest({hash_name(2): b''})).encode('utf8')
+        tarinfo = tarfile.TarInfo(archive_manifest_name)
+        tarinfo.size = len(manifest_bytes)
+        tar.addfile(tarinfo, io.BytesIO(manifest_bytes))
+        tarinfo = tarfile.TarInfo(hash_name(2))
+        tarinfo.type = tarfile.SYMTYPE
+        tarinfo.linkname = '../../outside.minted'
+        tar.addfile(tarinfo)
+    import_data = cache_import(archive=str(archive_path), cache_dir=str(cache_path))
+    assert import_data['rejectedfiles'] == {hash_name(2): 'invalid file name or type'}
+    assert not os.path.lexists(cache_path / hash_name(2))
+
+
+def test_cache_import_drops_files_from_incompatible_versions(tmp_path: Path):
+    cache_path = tmp_path / '_minted'
+    write_cache_file(cache_path, hash_name(1), content='existing')
+    members = {
+        hash_name(1): b'one',
+        hash_name(2): b'two',
+        '_a.index.minted': json_dumps(index('20260610000000', hash_name(1), hash_name(2))).encode('utf8'),
+        '_b.index.minted': json_dumps(index('20260610000000', hash_name(2))).encode('utf8'),
+    }
+    archive_path = tmp_path / 'cache.tar'
+    write_archive(archive_path, archive_manifest(members, pygments='0.0.0'), members)
+    import_data = cache_import(archive=str(archive_path), cache_dir=str(cache_path))
+    assert not import_data['compatible']
+    assert import_data['droppedfiles'] == sorted([hash_name(1), hash_name(2), '_b.index.minted'])
+    assert import_data['rejectedfiles'] == {}
+    assert (cache_path / hash_name(1)).read_text(encoding='utf8') == 'existing'
+    assert not (cache_path / hash_name(2)).exists() and not (cache_path / '_b.index.minted').exists()
+    # Indexes are imported with the files that already exist
+    assert json_loads((cache_path / '_a.index.minted').read_bytes())['cachefiles'] == [hash_name(1)]
+
+    write_archive(archive_path, archive_manifest(members, latexminted='0.0.0'), members)
+    assert not cache_import(archive=str(archive_path), cache_dir=str(tmp_path / 'other'))['compatible']
+
+
+@pytest.mark.parametrize('manifest, error', [
+    (None, 'does not start with'),
+    ({'format': 2}, 'unsupported archive format'),
+    ({'format': 1, 'latexminted': __version__, 'pygments': pygments_version, 'files': {'x': {}}}, 'invalid'),
+])
+def test_cache_import_rejects_invalid_manifests(tmp_path: Path, manifest: dict | None, error: str):
+    archive_path = tmp_path / 'cache.tar'
+    if manifest is None:
+        with tarfile.open(archive_path, 'w') as tar:
+            tarinfo = tarfile.TarInfo(hash_name(1))
+            tar.addfile(tarinfo, io.BytesIO(b''))
+    else:
+        write_archive(archive_path, manifest, {})
+    with pytest.raises(CacheArchiveError, match=error):
+        cache_import(archive=str(archive_path), cache_dir=str(tmp_path / '_minted'))
+    assert not (tmp_path / '_minted' / hash_name(1)).exists()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+from json import loads as json_loads
+from pathlib import Path
+from conftest import clean_data, highlight_data, package_root_path, TexSandbox, timestamp
+
+
+
+
+md5 = 'c' * 32
+
+cache_file_names = [f'{n:032x}.highlight.minted' for n in range(1, 4)]
+
+
+def highlight(tex_sandbox: TexSandbox, n: int):
+    highlight_md5 = f'{n:032x}'
+    tex_sandbox.write_data(highlight_md5, highlight_data(f'x = {n}\n', 'python',
+                                                         highlightfilename=cache_file_names[n-1]))
+    proc = tex_sandbox.run_command('highlight', highlight_md5)
+    assert proc.returncode == 0, proc.stderr
+
+
+def clean(tex_sandbox: TexSandbox, cachefiles: list[str]):
+    tex_sandbox.write_data(md5, clean_data(cachefiles=cachefiles, cachebundle='true'))
+    proc = tex_sandbox.run_command('clean', md5)
+    assert proc.returncode == 0, proc.stderr
+    assert tex_sandbox.errors(md5) == []
+
+
+def test_clean_rewrites_bundle_only_when_needed(tex_sandbox: TexSandbox):
+    cache_path = tex_sandbox.work_path / '_minted'
+    bundle_path = cache_path / f'_{md5}.bundle.minted'
+    index_path = cache_path / f'_{md5}.index.minted'
+    for n in range(1, 4):
+        highlight(tex_sandbox, n)
+
+    clean(tex_sandbox, cache_file_names[:2])
+    bundle = bundle_path.read_text(encoding='utf8')
+    assert bundle.count('\x03\x01') == 2 and bundle.endswith('\x04')
+
+    # Unchanged index:  the bundle is kept
+    bundle_path.write_text('kept', encoding='utf8')
+    clean(tex_sandbox, cache_file_names[:2])
+    assert bundle_path.read_text(encoding='utf8') == 'kept'
+
+    # Bundle older than the index:  a previous write failed
+    index_mtime_ns = index_path.stat().st_mtime_ns
+    os.utime(bundle_path, ns=(index_mtime_ns - 10**9, index_mtime_ns - 10**9))
+    clean(tex_sandbox, cache_file_names[:2])
+    assert bundle_path.read_text(encoding='utf8') == bundle
+
+    # Missing bundle
+    bundle_path.unlink()
+    clean(tex_sandbox, cache_file_names[:2])
+    assert bundle_path.read_text(encoding='utf8') == bundle
+
+    # Modified index
+    bundle_path.write_text('kept', encoding='utf8')
+    clean(tex_sandbox, cache_file_names)
+    assert bundle_path.read_text(encoding='utf8').count('\x03\x01') == 3
+
+
+
+def test_lease_lists_every_snippet_until_clean(tex_sandbox: TexSandbox):
+    # Without batch mode, each snippet of a compile adds its cache file to
+    # the compile's lease
+    lease_path = tex_sandbox.work_path / '_minted' / f'_{md5}.lease.minted'
+    for n, cache_file_name in enumerate(cache_file_names, 1):
+        tex_sandbox.write_data(md5, highlight_data(f'x = {n}\n', 'python', highlightfilename=cache_file_name))
+        proc = tex_sandbox.run_command('highlight', md5)
+        assert proc.returncode == 0, proc.stderr
+        assert lease_path.read_text(encoding='utf8').splitlines() == cache_file_names[:n]
+    # Existing files are leased again
+    tex_sandbox.write_data(md5, highlight_data('x = 1\n', 'python', highlightfilename=cache_file_names[0]))
+    proc = tex_sandbox.run_command('highlight', md5)
+    assert proc.returncode == 0, proc.stderr
+    assert set(lease_path.read_text(encoding='utf8').splitlines()) == set(cache_file_names)
+    clean(tex_sandbox, cache_file_names)
+    assert not lease_path.exists()
+    assert all((tex_sandbox.work_path / '_minted' / name).is_file() for name in cache_file_names)
+
+
+scandir_logging_script = '''\
+import os
+import sys
+log_path = sys.argv.pop(1)
+scandir = os.scandir
+def logged_scandir(path='.'):
+    with open(log_path, 'a') as log:
+        log.write(f'{os.path.abspath(path)}\\n')
+    return scandir(path)
+os.scandir = logged_scandir
+from latexminted.cmdline import main
+main()
+'''
+
+
+def test_clean_temp_scans_each_tex_root_once(tex_sandbox: TexSandbox):
+    output_path = tex_sandbox.path / 'out'
+    output_path.mkdir()
+    tex_sandbox.env['TEXMF_OUTPUT_DIRECTORY'] = str(output_path)
+    deleted_names = [f'_{md5}.data.minted', f'_{md5}.highlight.minted', f'_{md5}.style.minted', f'_{md5}_3.data.minted']
+    kept_names = [
+        f'_{md5}.errlog.minted', f'_{md5}.index.minted', f'_{md5}_x.data.minted', f'_{md5}.data.txt',
+        f'_{"d" * 32}.data.minted',
+    ]
+    for root_path in (tex_sandbox.work_path, output_path):
+        for name in deleted_names + kept_names:
+            (root_path / name).write_text('', encoding='utf8')
+
+    script_path = tex_sandbox.path / 'scandir_logging.py'
+    script_path.write_text(scandir_logging_script, encoding='utf8')
+    log_path = tex_sandbox.path / 'scandir.log'
+    proc = subprocess.run(
+        [sys.executable, str(script_path), str(log_path), 'cleantemp', '--timestamp', timestamp, md5],
+        cwd=tex_sandbox.work_path, env={**tex_sandbox.env, 'PYTHONPATH': str(package_root_path)},
+        capture_output=True, timeout=120
+    )
+    assert proc.returncode == 0, proc.stderr
+    for root_path in (tex_sandbox.work_path, output_path):
+        assert sorted(p.name for p in root_path.iterdir() if p.is_file()) == sorted(kept_names)
+    scanned = log_path.read_text(encoding='utf8').splitlines()
+    assert sorted(scanned) == sorted(str(root_path.resolve()) for root_path in (tex_sandbox.work_path, output_path))
+
+
+def test_background_gc_does_not_import_from_working_directory(tex_sandbox: TexSandbox, launcher_path: Path):
+    highlight(tex_sandbox, 1)
+    marker_path = tex_sandbox.path / 'imported'
+    (tex_sandbox.work_path / 'latexminted.py').write_text(
+        f'open({str(marker_path)!r}, "w").close()\n', encoding='utf8'
+    )
+    tex_sandbox.write_config({'cache': {'clean_mode': 'background', 'eviction_dry_run': True}})
+    tex_sandbox.write_data(md5, clean_data(cachefiles=cache_file_names[:1]))
+    proc = tex_sandbox.run_command('clean', md5, launcher=launcher_path)
+    assert proc.returncode == 0, proc.stderr
+    assert tex_sandbox.errors(md5) == []
+    # With `eviction_dry_run`, the background process saves a report
+    cache_path = tex_sandbox.work_path / '_minted'
+    report_path = cache_path / f'_{md5}.eviction.minted'
+    deadline = time.monotonic() + 60
+    while not report_path.exists() and not marker_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not marker_path.exists()
+    gc_log = (cache_path / '_latexminted.gclog.minted').read_text(encoding='utf8')
+    assert report_path.exists(), gc_log
+    assert json_loads(report_path.read_bytes())['dryrun']
+    assert gc_log == ''
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+from typing import Any
+from conftest import clean_data, TexSandbox, timestamp
+from latexminted.version import __version_info__
+
+
+
+
+md5 = 'f' * 32
+
+executable_version = f'{__version_info__.major}.{__version_info__.minor}.{__version_info__.micro}'
+
+config_cache_file_name = f'_{md5}.configcache.minted'
+
+
+def config_data(**kwargs: str) -> dict[str, Any]:
+    return {
+        'command': 'config',
+        'mintedversion': '3.8.0',
+        'jobname': 'doc',
+        'timestamp': timestamp,
+        'cachedir': '_minted',
+        'cacheconfig': 'true',
+        **kwargs,
+    }
+
+
+def config_cache_lines(*, date: str = timestamp[:8], version: str = executable_version) -> list[str]:
+    return [
+        r'\xdef\minted@configcache@mintedversion{\detokenize{3.8.0}}%',
+        rf'\xdef\minted@configcache@date{{\detokenize{{{date}}}}}%',
+        r'\xdef\minted@configcache@cachedir{\detokenize{_minted}}%',
+        rf'\xdef\minted@executable@version{{\detokenize{{{version}}}}}%',
+        r'\xdef\minted@config@cachepath{\detokenize{_minted/}}%',
+    ]
+
+
+def read_config_cache(tex_sandbox: TexSandbox) -> list[str]:
+    return (tex_sandbox.work_path / '_minted' / config_cache_file_name).read_text(encoding='utf8').splitlines()
+
+
+def write_config_cache(tex_sandbox: TexSandbox, lines: list[str]):
+    (tex_sandbox.work_path / '_minted' / config_cache_file_name).write_text('\n'.join(lines), encoding='utf8')
+
+
+def test_config_writes_config_cache(tex_sandbox: TexSandbox):
+    tex_sandbox.write_data(md5, config_data())
+    proc = tex_sandbox.run_command('config', md5)
+    assert proc.returncode == 0, proc.stderr
+    assert read_config_cache(tex_sandbox) == config_cache_lines()
+    # The saved config gives LaTeX the same values as detecting the config
+    config_lines = (tex_sandbox.work_path / f'_{md5}.config.minted').read_text(encoding='utf8').splitlines()
+    assert [line for line in config_lines if 'executable@version' in line or 'cachepath' in line] == (
+        config_cache_lines()[-2:]
+    )
+
+
+def test_config_without_cacheconfig_or_old_minted_sty_does_not_write_config_cache(tex_sandbox: TexSandbox):
+    for data in (config_data(cacheconfig='false'), config_data(mintedversion='3.7.0')):
+        tex_sandbox.write_data(md5, data)
+        tex_sandbox.run_command('config', md5)
+        assert not (tex_sandbox.work_path / '_minted' / config_cache_file_name).exists()
+
+
+def test_batch_config_saves_provisional_config_cache_again(tex_sandbox: TexSandbox):
+    # LaTeX used a saved config from an earlier day and marked it as pending
+    write_config_cache(tex_sandbox, config_cache_lines(date='20260614'))
+    pending_path = tex_sandbox.work_path / f'_{md5}.configpending.minted'
+    pending_path.write_text('{}', encoding='utf8')
+    tex_sandbox.write_data(md5, [config_data(cachepath='_minted/')])
+    proc = tex_sandbox.run_command('batch', md5)
+    assert proc.returncode == 0, proc.stderr
+    assert tex_sandbox.errors(md5) == []
+    assert not pending_path.exists()
+    assert read_config_cache(tex_sandbox) == config_cache_lines()
+
+
+def test_batch_config_round_trip_matches_config(tex_sandbox: TexSandbox):
+    tex_sandbox.write_data(md5, config_data())
+    proc = tex_sandbox.run_command('config', md5)
+    assert proc.returncode == 0, proc.stderr
+    saved_by_config = read_config_cache(tex_sandbox)
+    (tex_sandbox.work_path / '_minted' / config_cache_file_name).unlink()
+    tex_sandbox.write_data(md5, [config_data(cachepath='_minted/')])
+    proc = tex_sandbox.run_command('batch', md5)
+    assert proc.returncode == 0, proc.stderr
+    assert read_config_cache(tex_sandbox) == saved_by_config
+
+
+def test_clean_deletes_config_cache_from_other_executable_version(tex_sandbox: TexSandbox):
+    for version, is_kept in [(executable_version, True), ('0.1.0', False), (f'{executable_version}.1', False)]:
+        write_config_cache(tex_sandbox, config_cache_lines(version=version))
+        tex_sandbox.write_data(md5, clean_data(cachefiles=[], cacheconfig='true'))
+        proc = tex_sandbox.run_command('clean', md5)
+        assert proc.returncode == 0, proc.stderr
+        assert (tex_sandbox.work_path / '_minted' / config_cache_file_name).exists() == is_kept
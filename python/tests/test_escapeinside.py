@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import random
+import pytest
+from pygments.formatters.latex import LatexEmbeddedLexer
+from pygments.lexers import get_lexer_by_name
+from latexminted.escapeinside import EscapeInsideLexer
+
+
+
+
+code = {
+    'python': '''\
+def f(x):  # comment with |\\textbf{escape}| and !x!
+    s = 'string |not an escape|' + "!x!"
+    return x |\\emph{y}| + 1  # |unclosed
+''',
+    'c': '''\
+int main(void) { /* |\\textbf{x}| */
+    return !x! + |y| ; // |a|b|
+}
+''',
+    'html': '''\
+<p class="|x|">|\\textit{text}| !y!</p><!-- |z| -->
+''',
+    'sql': '''\
+SELECT |a| FROM t -- |b|
+WHERE x = '|c|' !d! ;
+''',
+}
+
+delimiters = ['||', '!!', '|!', '@@']
+
+
+def tokens(lexer, text: str, *, unprocessed: bool):
+    if unprocessed:
+        return list(lexer.get_tokens_unprocessed(text))
+    return list(lexer.get_tokens(text))
+
+
+@pytest.mark.parametrize('lexer_name', sorted(code))
+@pytest.mark.parametrize('left, right', delimiters)
+@pytest.mark.parametrize('unprocessed', [True, False])
+def test_escapeinside_matches_latex_embedded_lexer(lexer_name: str, left: str, right: str, unprocessed: bool):
+    text = code[lexer_name]
+    lexer = EscapeInsideLexer(left, right, get_lexer_by_name(lexer_name))
+    reference_lexer = LatexEmbeddedLexer(left, right, get_lexer_by_name(lexer_name))
+    assert tokens(lexer, text, unprocessed=unprocessed) == tokens(reference_lexer, text, unprocessed=unprocessed)
+
+
+@pytest.mark.parametrize('lexer_name', sorted(code))
+def test_escapeinside_matches_latex_embedded_lexer_random_text(lexer_name: str):
+    rng = random.Random(lexer_name)
+    pieces = ['|', '!', '|\\x|', '#', '//', '/*', '*/', '--', '<!--', '-->', "'", '"', '\n', ' ', 'x', '1', '+']
+    for _ in range(200):
+        left, right = rng.choice(delimiters)
+        text = ''.join(rng.choice(pieces) for _ in range(rng.randrange(40)))
+        lexer = EscapeInsideLexer(left, right, get_lexer_by_name(lexer_name))
+        reference_lexer = LatexEmbeddedLexer(left, right, get_lexer_by_name(lexer_name))
+        assert list(lexer.get_tokens_unprocessed(text)) == list(reference_lexer.get_tokens_unprocessed(text))
+
+
+def test_escapeinside_without_escapes_lexes_once():
+    lexed: list[str] = []
+    python_lexer = get_lexer_by_name('python')
+    get_tokens_unprocessed = python_lexer.get_tokens_unprocessed
+
+    def counting_get_tokens_unprocessed(text: str):
+        lexed.append(text)
+        return get_tokens_unprocessed(text)
+
+    python_lexer.get_tokens_unprocessed = counting_get_tokens_unprocessed
+    lexer = EscapeInsideLexer('|', '|', python_lexer)
+    # Delimiters within comments and strings are not escapes
+    for text in ['x = 1\n', "x = '|y|'  # |z|\n"]:
+        lexed.clear()
+        assert list(lexer.get_tokens_unprocessed(text)) == list(get_tokens_unprocessed(text))
+        assert lexed == [text]
+    lexed.clear()
+    list(lexer.get_tokens_unprocessed('x = |y| + 1\n'))
+    assert lexed == ['x = |y| + 1\n', 'x =  + 1\n']
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import itertools
+import random
+import pytest
+from pygments.filter import apply_filters, Filter
+from pygments.filters import get_filter_by_name
+from pygments.lexers import get_lexer_by_name
+from latexminted.filters import FusedFilter, fuse_filters
+
+
+
+
+code = {
+    'python': '''\
+    # TODO: fix this XXX and NOTE:BUG
+    def f(x):
+        """Docstring with FIXME and TODOs"""
+        if x is None and not True:
+            return [x, 'TODO', "XXX"]  # NOTE
+
+    class C(object):
+            pass
+''',
+    'c': '''\
+  #include <stdio.h> /* TODO */
+  // FIXME: BUG
+  int main(void) {
+      if (1) { return 0; }  /* XXX
+       * NOTE continued */
+  }
+''',
+    'sql': '''\
+   select a, b FROM t -- TODO
+   WHERE a = 'XXX' And b Is Null;
+''',
+}
+
+
+def filter_options(rng: random.Random) -> dict[str, dict[str, object]]:
+    return {
+        'tokenmerge': {},
+        'codetagify': {'codetags': rng.choice(['', 'TODO', 'TODO XXX', 'NOTE BUG FIXME', 'TODOs'])},
+        'keywordcase': {'case': rng.choice(['lower', 'upper', 'capitalize'])},
+        'gobble': {'n': rng.choice([0, 1, 2, 4, 5, 8, 100])},
+    }
+
+
+def filter_combinations() -> list[tuple[str, ...]]:
+    names = ['tokenmerge', 'codetagify', 'keywordcase', 'gobble']
+    return [c for n in range(2, len(names) + 1) for c in itertools.combinations(names, n)]
+
+
+def stock_tokens(lexer_name: str, text: str, filters: list[Filter]):
+    lexer = get_lexer_by_name(lexer_name)
+    return list(apply_filters(lexer.get_tokens(text), filters, lexer))
+
+
+def fused_tokens(lexer_name: str, text: str, filters: list[Filter]):
+    fused_filters = fuse_filters(filters)
+    assert len(fused_filters) == 1 and isinstance(fused_filters[0], FusedFilter)
+    lexer = get_lexer_by_name(lexer_name)
+    for f in fused_filters:
+        lexer.add_filter(f)
+    return list(lexer.get_tokens(text))
+
+
+@pytest.mark.parametrize('lexer_name', sorted(code))
+@pytest.mark.parametrize('filter_names', filter_combinations())
+def test_fused_filters_match_stock_filter_chain(lexer_name: str, filter_names: tuple[str, ...]):
+    rng = random.Random(f'{lexer_name} {filter_names}')
+    for _ in range(5):
+        options = filter_options(rng)
+        filters = [get_filter_by_name(name, **options[name]) for name in filter_names]
+        text = code[lexer_name]
+        assert fused_tokens(lexer_name, text, filters) == stock_tokens(lexer_name, text, filters)
+
+
+@pytest.mark.parametrize('lexer_name', sorted(code))
+def test_fused_filters_match_stock_filter_chain_random_text(lexer_name: str):
+    # Random lines from the examples with random indentation, so that
+    # gobbling ends at every position within tokens and lines
+    rng = random.Random(lexer_name)
+    lines = code[lexer_name].splitlines()
+    filter_names = ('tokenmerge', 'codetagify', 'keywordcase', 'gobble')
+    for _ in range(50):
+        text = ''.join(
+            ' ' * rng.randrange(6) + rng.choice(lines).lstrip() + rng.choice(['\n', '\n\n', ''])
+            for _ in range(rng.randrange(1, 12))
+        )
+        options = filter_options(rng)
+        filters = [get_filter_by_name(name, **options[name]) for name in filter_names]
+        assert fused_tokens(lexer_name, text, filters) == stock_tokens(lexer_name, text, filters)
+
+
+def test_fuse_filters_only_fuses_supported_sequences():
+    tokenmerge = get_filter_by_name('tokenmerge')
+    codetagify = get_filter_by_name('codetagify')
+    gobble = get_filter_by_name('gobble', n=2)
+    highlight = get_filter_by_name('highlight', names=['x'])
+    # A single filter, or filters out of order, duplicated, or unsupported
+    for filters in ([], [gobble], [gobble, tokenmerge], [gobble, gobble], [tokenmerge, highlight]):
+        assert fuse_filters(filters) == filters
+    fused_filters = fuse_filters([tokenmerge, codetagify, gobble])
+    assert len(fused_filters) == 1 and fused_filters[0].filters == [tokenmerge, codetagify, gobble]
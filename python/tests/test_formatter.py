@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import random
+import re
+import pytest
+from pygments import highlight
+from pygments.formatters.latex import LatexFormatter
+from pygments.lexers import get_lexer_by_name
+from latexminted.escapeinside import EscapeInsideLexer
+from latexminted.formatter import _escape_names, CompactLatexFormatter
+
+
+
+
+# Compact output is compared with `LatexFormatter` output by interpreting
+# both like TeX would with `commandchars=\\\{\}`:  each character is paired
+# with the formatting macros that `\PY` would set for it and with the raw
+# control words (declarations like `\bfseries`) in effect in its group.
+# Control words are read greedily, so an escape followed by a letter without
+# `{}` is an unknown control word and does not match.
+
+_tex_token_re = re.compile(r'\\[A-Za-z]+|\\.|.', re.DOTALL)
+_macro_assignment_re = re.compile(r'\\(?:let|def)\\PY@(\w\w)')
+_escape_chars = {f'\\PY{name}': char for char, name in _escape_names.items()}
+
+styles = ['default', 'bw', 'monokai', 'sas']
+
+code = {
+    'python': '''\
+def f(x):  # comment |\\bfseries| bold $x^2 + y_1$ and |$\\alpha$| \\itshape
+    s = '|string|' + "$x$"  # $unclosed |\\itshape
+    return x |\\bfseries|+ 1 |\\itshape|y|{}|z|\\textbf{w}|
+    #|\\bfseries|
+''',
+    'c': '''\
+int main(void) { /* |\\itshape| a $b$ */ /* c */
+    return |\\bfseries|x + 1; // \\bfseries d |$e$|
+    /* |\\itshape| $f$ g *//* h */
+}
+''',
+}
+
+options = [
+    {'escapeinside': '||'},
+    {'texcomments': True},
+    {'mathescape': True},
+]
+
+
+def style_macros(formatter: LatexFormatter, styleval: str) -> tuple[tuple[str, str], ...]:
+    macros: dict[str, str] = {}
+    for name in styleval.split('+'):
+        cmndef = formatter.cmd2def.get(name, '')
+        matches = list(_macro_assignment_re.finditer(cmndef))
+        for match, next_match in zip(matches, [*matches[1:], None]):
+            macros[match.group(1)] = cmndef[match.end():next_match.start() if next_match else len(cmndef)]
+    return tuple(sorted(macros.items()))
+
+
+def interpret(tex: str, formatter: LatexFormatter) -> list[tuple[str, tuple[tuple[str, str], ...], tuple[str, ...]]]:
+    tokens = _tex_token_re.findall(tex)
+    typeset: list[tuple[str, tuple[tuple[str, str], ...], tuple[str, ...]]] = []
+    pos = 0
+
+    def group(macros: tuple[tuple[str, str], ...], declarations: tuple[str, ...], closing: bool):
+        nonlocal pos
+        while pos < len(tokens):
+            token = tokens[pos]
+            pos += 1
+            if token == '}':
+                assert closing
+                return
+            if token == '{':
+                group(macros, declarations, True)
+            elif token == '\\PY':
+                assert tokens[pos] == '{'
+                end = tokens.index('}', pos)
+                styleval = ''.join(tokens[pos+1:end])
+                assert tokens[end+1] == '{'
+                pos = end + 2
+                group(style_macros(formatter, styleval), declarations, True)
+            elif token in _escape_chars:
+                typeset.append((_escape_chars[token], macros, declarations))
+            else:
+                if re.fullmatch(r'\\[A-Za-z]+', token):
+                    declarations = (*declarations, token)
+                typeset.append((token, macros, declarations))
+        assert not closing
+
+    group((), (), False)
+    return typeset
+
+
+def highlight_both(text: str, lexer_name: str, style: str, **opts) -> tuple[str, str]:
+    outputs = []
+    for Formatter in (CompactLatexFormatter, LatexFormatter):
+        lexer = get_lexer_by_name(lexer_name)
+        if 'escapeinside' in opts:
+            lexer = EscapeInsideLexer(opts['escapeinside'][0], opts['escapeinside'][1], lexer)
+        outputs.append(highlight(text, lexer, Formatter(style=style, **opts)))
+    return (outputs[0], outputs[1])
+
+
+@pytest.mark.parametrize('lexer_name', sorted(code))
+@pytest.mark.parametrize('style', styles)
+@pytest.mark.parametrize('opts', options)
+def test_compact_output_matches_latex_formatter(lexer_name: str, style: str, opts: dict[str, object]):
+    compact, reference = highlight_both(code[lexer_name], lexer_name, style, **opts)
+    formatter = LatexFormatter(style=style)
+    assert interpret(compact, formatter) == interpret(reference, formatter)
+    assert len(compact) < len(reference)
+
+
+@pytest.mark.parametrize('lexer_name', sorted(code))
+def test_compact_output_matches_latex_formatter_random_text(lexer_name: str):
+    rng = random.Random(lexer_name)
+    # Raw LaTeX must be valid, so braces are balanced and there are no
+    # lone backslashes
+    pieces = [
+        '|', '$', '#', '//', '/*', '*/', '\\bfseries', '\\itshape', ' ', '\n', 'x', 'y1', '{}', '_', '^',
+        '"', "'", '+', '(', ')', 'def', 'return',
+    ]
+    for _ in range(200):
+        text = ''.join(rng.choice(pieces) for _ in range(rng.randrange(40)))
+        style = rng.choice(styles)
+        compact, reference = highlight_both(text, lexer_name, style, **rng.choice(options))
+        formatter = LatexFormatter(style=style)
+        assert interpret(compact, formatter) == interpret(reference, formatter)
+
+
+def test_compact_output_groups_raw_text_without_styles():
+    # `bw` has no definitions for any of these tokens
+    compact, reference = highlight_both('x = 1 |\\bfseries|z\n', 'python', 'bw', escapeinside='||', nowrap=True)
+    assert reference == '\\PY{n}{x} \\PY{o}{=} \\PY{l+m+mi}{1} \\PY{esc}{\\bfseries}\\PY{n}{z}\n'
+    assert compact == '{x = 1 \\bfseries}z\n'
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import random
+import re
+from json import dumps as json_dumps
+from json import loads as json_loads
+import pytest
+from pygments.lexers import get_lexer_by_name
+from latexminted.incremental import (
+    _is_run, _max_newlines, lex_incremental, sre_parse, supports_incremental_lexing
+)
+
+
+
+
+def max_newlines(pattern: str, flags: int = 0) -> int | None:
+    parsed = sre_parse.parse(pattern, flags)
+    return _max_newlines(parsed, bool(parsed.state.flags & sre_parse.SRE_FLAG_DOTALL))
+
+
+@pytest.mark.parametrize('pattern, flags, expected', [
+    (r'abc', 0, 0),
+    (r'a\nb', 0, 1),
+    (r'\n{3}', 0, 3),
+    (r'\n{1,4}?', 0, 4),
+    (r'a|\n\n', 0, 2),
+    (r'(?=\n\n)', 0, 2),
+    (r'(?<=\n\n)x', 0, 0),
+    (r'.', 0, 0),
+    (r'.', re.DOTALL, 1),
+    (r'(?s:.)', 0, 1),
+    (r'[^"]', 0, 1),
+    (r'[a-z\d]', 0, 0),
+    (r'\s+', 0, 1),
+    (r'[ \t\n]*', 0, 1),
+    (r'\s+\w+\s+', 0, 2),
+    (r'.*', 0, 0),
+    (r'(?s).*', 0, None),
+    (r'[^"]+', 0, None),
+    (r'(\n\w)+', 0, None),
+])
+def test_max_newlines(pattern: str, flags: int, expected: int | None):
+    assert max_newlines(pattern, flags) == expected
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    (r'[^"]+', True),
+    (r'(?:[^"\\]+)', True),
+    (r'.*', True),
+    (r'"[^"]*"', False),
+    (r'[^"]{2,}', False),
+    (r'(\n\w)+', False),
+])
+def test_is_run(pattern: str, expected: bool):
+    assert _is_run(sre_parse.parse(pattern)) == expected
+
+
+
+
+def reference_tokens(lexer, text: str) -> list[tuple[int, object, str]]:
+    return list(lexer.get_tokens_unprocessed(text))
+
+
+def relex(lexer, previous_text: str, text: str):
+    previous = lex_incremental(lexer, previous_text, None)
+    # Checkpoint data is saved as JSON
+    previous_data = json_loads(json_dumps(previous.checkpoint_data))
+    return lex_incremental(lexer, text, previous_data)
+
+
+python_lines = [
+    'def f{n}(x):',
+    '    # Comment',
+    '',
+    '    y = x + {n}  # comment',
+    "    s = 'string {n}'",
+    '    return [y, s]',
+    '',
+]
+
+
+def python_text(functions: int, *, docstrings: bool = False) -> str:
+    lines = python_lines
+    if docstrings:
+        lines = [lines[0], '    """Docstring', '', '    continued"""', *lines[1:]]
+    return ''.join('\n'.join(lines).format(n=n) + '\n' for n in range(functions))
+
+
+def test_unsupported_lexers():
+    assert supports_incremental_lexing(get_lexer_by_name('python'))
+    # Uses callbacks
+    assert not supports_incremental_lexing(get_lexer_by_name('c'))
+    assert not supports_incremental_lexing(get_lexer_by_name('ruby'))
+
+
+def toml_text(sections: int) -> str:
+    return ''.join(f'[section{n}]\n# comment\n\nkey{n} = "value {n}"\nnumber = {n}\n\n' for n in range(sections))
+
+
+def test_relex_reuses_tokens_before_and_after_edit():
+    lexer = get_lexer_by_name('toml')
+    text = lexer._preprocess_lexer_input(toml_text(200))
+    edited = text.replace('number = 100\n', 'number = 1000\n')
+    assert edited != text
+    result = relex(lexer, text, edited)
+    assert result.tokens == reference_tokens(lexer, edited)
+    assert 0 < result.relexed_chars < len(edited) // 10
+
+    result = relex(lexer, text, text)
+    assert result.relexed_chars == 0
+    assert result.tokens == reference_tokens(lexer, text)
+
+
+def test_relex_with_unbounded_reach_starts_from_beginning():
+    # Python's root state has a docstring regex that can consume any number
+    # of lines when it is attempted, so checkpoints can't be used for
+    # resuming, only for stopping
+    lexer = get_lexer_by_name('python')
+    text = lexer._preprocess_lexer_input(python_text(200, docstrings=True))
+    position = text.index('y = x + 100')
+    edited = text.replace('y = x + 100', 'y = x - 100')
+    result = relex(lexer, text, edited)
+    assert result.tokens == reference_tokens(lexer, edited)
+    assert position < result.relexed_chars < position + len(edited) // 10
+    checkpoint_reach = [reach for _, _, reach, _ in result.checkpoint_data['checkpoints']]
+    assert checkpoint_reach[0] is not None
+    assert len(checkpoint_reach) > 1 and all(reach is None for reach in checkpoint_reach[1:])
+
+
+def test_relex_continues_until_state_converges():
+    # Opening a triple-quoted string that is never closed changes how
+    # everything after it is lexed, so lexing must not stop at a checkpoint
+    lexer = get_lexer_by_name('python')
+    text = lexer._preprocess_lexer_input(python_text(200))
+    edited = text.replace('y = x + 100', 'y = """x + 100', 1)
+    assert edited != text
+    result = relex(lexer, text, edited)
+    assert result.tokens == reference_tokens(lexer, edited)
+    assert result.relexed_chars == len(edited)
+
+
+@pytest.mark.parametrize('lexer_name', ['python', 'javascript', 'html', 'latex', 'toml', 'ini'])
+def test_relex_random_edits_match_full_lex(lexer_name: str):
+    rng = random.Random(lexer_name)
+    lexer = get_lexer_by_name(lexer_name)
+    fragments = ['\n', '\n\n', ' ', '"', "'", '"""', '#', '/*', '*/', '{', '}', '[', ']', ':', '%', '\\', 'x', '1']
+    text = lexer._preprocess_lexer_input(python_text(30, docstrings=True) + toml_text(30))
+    previous_data = lex_incremental(lexer, text, None).checkpoint_data
+    for _ in range(30):
+        pos = rng.randrange(len(text))
+        if rng.random() < 0.5:
+            edited = text[:pos] + rng.choice(fragments) + text[pos:]
+        else:
+            edited = text[:pos] + text[pos+rng.randrange(1, 20):]
+        result = lex_incremental(lexer, edited, json_loads(json_dumps(previous_data)))
+        assert result.tokens == reference_tokens(lexer, edited)
+        text = edited
+        previous_data = result.checkpoint_data
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import random
+import re
+import pytest
+from pygments.lexers import find_lexer_class_by_name
+from pygments.token import Keyword, Name
+from latexminted.keywords import _name_run_class, _uses_standard_algorithm, extra_keywords_lexer_class
+
+
+
+
+extra_tokens = {
+    'foo': Keyword,
+    'foo_bar': Keyword.Constant,
+    'Bar': Keyword.Type,
+    'x': Keyword.Pseudo,
+    'f0': Keyword.Reserved,
+    'überall': Keyword,
+    'self': Keyword,
+    'foo bar': Keyword,
+    '': Keyword,
+}
+
+code = '''\
+def foo(x, foo_bar, Bar=None):
+    self.foo = foo.bar + foox + xfoo + FOO + f0(x)[x] * überall
+    return Bar(foo_bar) if x else foo_bar_baz  # foo
+class C: foo = 'foo'
+int foo(int x) { return foo_bar->x + Bar::foo(x); }
+<a foo="x" x=foo>foo</a> $foo = @x; foo: x; SELECT foo FROM Bar WHERE x = 1;
+'''
+
+lexer_names = ['python', 'c', 'cpp', 'javascript', 'java', 'rust', 'go', 'sql', 'html', 'php', 'ruby', 'perl', 'css']
+
+
+def reference_tokens(lexer_class, text: str):
+    # Check every token
+    return [
+        (index, extra_tokens[value] if token is Name and value in extra_tokens else token, value)
+        for index, token, value in lexer_class().get_tokens_unprocessed(text)
+    ]
+
+
+@pytest.mark.parametrize('lexer_name', lexer_names)
+def test_extra_keywords_match_checking_every_token(lexer_name: str):
+    lexer_class = find_lexer_class_by_name(lexer_name)
+    ExtraKeywordsLexer = extra_keywords_lexer_class(lexer_class, extra_tokens)
+    assert list(ExtraKeywordsLexer().get_tokens_unprocessed(code)) == reference_tokens(lexer_class, code)
+    rng = random.Random(lexer_name)
+    words = re.findall(r'\w+|\W', code)
+    for _ in range(20):
+        text = ''.join(rng.choice(words) for _ in range(200))
+        assert list(ExtraKeywordsLexer().get_tokens_unprocessed(text)) == reference_tokens(lexer_class, text)
+
+
+def test_extra_keywords_rules_are_inserted_into_token_definitions():
+    lexer_class = find_lexer_class_by_name('python')
+    assert _uses_standard_algorithm(lexer_class)
+    ExtraKeywordsLexer = extra_keywords_lexer_class(lexer_class, extra_tokens)
+    assert 'get_tokens_unprocessed' not in ExtraKeywordsLexer.__dict__
+    lexer = ExtraKeywordsLexer()
+    original_rules = lexer_class()._tokens['root']
+    rules = lexer._tokens['root']
+    keyword_rules = [
+        (rexmatch, action) for rexmatch, action, _ in rules if rexmatch.__self__.pattern.startswith('(?-i:')
+    ]
+    assert len(rules) == len(original_rules) + len(keyword_rules)
+    assert keyword_rules
+    assert all(rexmatch('foo') is None or rexmatch('foo').group() == 'foo' for rexmatch, _ in keyword_rules)
+    assert all(rexmatch('foox') is None for rexmatch, _ in keyword_rules)
+    # The original lexer is unchanged
+    assert lexer_class()._tokens['root'] == original_rules
+    assert list(lexer_class().get_tokens_unprocessed('foo'))[0][1] is Name
+
+
+def test_extra_keywords_lexer_classes_are_cached():
+    lexer_class = find_lexer_class_by_name('python')
+    ExtraKeywordsLexer = extra_keywords_lexer_class(lexer_class, extra_tokens)
+    assert extra_keywords_lexer_class(lexer_class, dict(reversed(extra_tokens.items()))) is ExtraKeywordsLexer
+    assert extra_keywords_lexer_class(lexer_class, {'foo': Keyword}) is not ExtraKeywordsLexer
+    # Lexers that don't use the standard `RegexLexer` algorithm check every token
+    ruby_lexer_class = find_lexer_class_by_name('ruby')
+    assert not _uses_standard_algorithm(ruby_lexer_class)
+    assert 'get_tokens_unprocessed' in extra_keywords_lexer_class(ruby_lexer_class, extra_tokens).__dict__
+
+
+@pytest.mark.parametrize('pattern, flags, expected', [
+    (r'[a-z_]\w*', 0, r'[\w]'),
+    (r'(?:[a-zA-Z_][a-zA-Z0-9_]*)', 0, r'[\U00000061-\U0000007a\U00000041-\U0000005a\U00000030-\U00000039\U0000005f]'),
+    (r'@[a-z]+', 0, r'[\U00000061-\U0000007a]'),
+    (r'[^\s]*', 0, r'[^\s]'),
+    (r'x', 0, ''),
+    (r'[a-z]+?', 0, None),
+    (r'[a-z]{1,5}', 0, None),
+    (r'[a-z]\w*(?=\()', 0, None),
+    (r'(?i:[a-z]\w*)', 0, None),
+    (r'foo|bar', 0, None),
+    (r'[a-z]\w*', re.IGNORECASE, r'[\w]'),
+])
+def test_name_run_class(pattern: str, flags: int, expected: str | None):
+    assert _name_run_class(re.compile(pattern, flags)) == expected
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+from pathlib import Path
+import pytest
+from pygments.lexers import get_lexer_by_name
+from conftest import highlight_data, TexSandbox, write_hostile_module
+import latexminted.parallel
+from latexminted.parallel import lex_parallel, lex_range, split_points, supports_parallel_lexing
+
+
+
+
+def python_text(functions: int) -> str:
+    return ''.join(
+        f'def f{n}(x):\n    """\n    Docstring\n    continued\n    """\n    return x + {n}\n\n' for n in range(functions)
+    )
+
+
+def test_split_points_start_lines():
+    text = python_text(500)
+    starts = split_points(text, 8)
+    assert starts[0] == 0
+    assert len(starts) == 8
+    assert starts == sorted(set(starts))
+    assert all(text[start-1] == '\n' for start in starts[1:])
+    # Chunks start after a blank line when there is one nearby
+    assert all(text[start-2:start] == '\n\n' for start in starts[1:])
+
+
+def test_split_points_without_blank_lines():
+    text = ''.join(f'x{n} = {n}\n' for n in range(1000))
+    starts = split_points(text, 4)
+    assert len(starts) == 4
+    assert all(text[start-1] == '\n' and text[start-2] != '\n' for start in starts[1:])
+
+
+def test_split_points_short_text():
+    assert split_points('x = 1\n', 4) == [0]
+    assert split_points('x = 1\ny = 2', 2) == [0, 6]
+    assert split_points('', 4) == [0]
+
+
+def serial_tokens(lexer, text: str):
+    tokens, _, _ = lex_range(lexer, text, 0, ('root',), None)
+    assert tokens == list(lexer.get_tokens_unprocessed(text))
+    return tokens
+
+
+@pytest.mark.parametrize('lexer_name', ['python', 'toml'])
+def test_lex_parallel_matches_serial(monkeypatch: pytest.MonkeyPatch, lexer_name: str):
+    monkeypatch.setattr(latexminted.parallel, 'min_chunk_lines', 100)
+    lexer = get_lexer_by_name(lexer_name)
+    assert supports_parallel_lexing(lexer)
+    text = lexer._preprocess_lexer_input(python_text(200))
+    tokens, serial_chunks = lex_parallel(lexer, text, jobs=2)
+    assert tokens == serial_tokens(lexer, text)
+    # Chunks start after blank lines, which are never within a string here
+    assert serial_chunks == 0
+
+
+def test_lex_parallel_chunk_in_string_is_lexed_serially(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(latexminted.parallel, 'min_chunk_lines', 100)
+    lexer = get_lexer_by_name('python')
+    # One string spanning almost the whole text
+    text = lexer._preprocess_lexer_input('s = """\n' + python_text(200).replace('"""', "'''") + '"""\n')
+    tokens, serial_chunks = lex_parallel(lexer, text, jobs=2)
+    assert tokens == serial_tokens(lexer, text)
+    assert serial_chunks >= 1
+
+
+def test_lex_parallel_few_lines_is_serial():
+    lexer = get_lexer_by_name('python')
+    text = lexer._preprocess_lexer_input(python_text(10))
+    assert lex_parallel(lexer, text, jobs=4) == (serial_tokens(lexer, text), 1)
+
+
+
+
+def test_highlight_parallel_through_launcher(tex_sandbox: TexSandbox, launcher_path: Path):
+    code = python_text(400)
+    tex_sandbox.write_data('0' * 32, highlight_data(code, 'python', highlightfilename=f'{1:032x}.highlight.minted'))
+    proc = tex_sandbox.run_command('highlight', '0' * 32)
+    assert proc.returncode == 0, proc.stderr
+    serial_path = tex_sandbox.work_path / '_minted' / f'{1:032x}.highlight.minted'
+    serial_highlighted = serial_path.read_text(encoding='utf8')
+
+    tex_sandbox.write_config({'lexing': {'parallel_min_lines': 1, 'parallel_jobs': 2}})
+    tex_sandbox.write_data('1' * 32, highlight_data(code, 'python', highlightfilename=f'{2:032x}.highlight.minted'))
+    proc = tex_sandbox.run_command('highlight', '1' * 32, launcher=launcher_path)
+    assert proc.returncode == 0, proc.stderr
+    assert tex_sandbox.errors('1' * 32) == []
+    parallel_path = tex_sandbox.work_path / '_minted' / f'{2:032x}.highlight.minted'
+    assert parallel_path.read_text(encoding='utf8') == serial_highlighted
+
+
+def test_highlight_parallel_does_not_import_from_working_directory(tex_sandbox: TexSandbox, launcher_path: Path):
+    marker_paths = [
+        write_hostile_module(tex_sandbox.work_path, module_name)
+        for module_name in ('multiprocessing', 'pickle', 'latexminted')
+    ]
+    tex_sandbox.write_config({'lexing': {'parallel_min_lines': 1, 'parallel_jobs': 2}})
+    tex_sandbox.write_data('1' * 32, highlight_data(python_text(400), 'python',
+                                                    highlightfilename=f'{1:032x}.highlight.minted'))
+    proc = tex_sandbox.run_command('highlight', '1' * 32, launcher=launcher_path)
+    assert proc.returncode == 0, proc.stderr
+    assert tex_sandbox.errors('1' * 32) == []
+    assert (tex_sandbox.work_path / '_minted' / f'{1:032x}.highlight.minted').is_file()
+    assert not any(marker_path.exists() for marker_path in marker_paths)
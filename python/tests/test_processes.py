@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+from conftest import highlight_data, package_root_path, TexSandbox, unguarded_launcher, write_hostile_module
+
+
+
+
+worker_script = '''\
+from latexminted.processes import spawn_context
+context = spawn_context()
+queue = context.Queue()
+process = context.Process(target=queue.put, args=("worker",))
+process.start()
+print(queue.get(timeout=60))
+process.join()
+'''
+
+
+def test_workers_do_not_import_from_working_directory_or_main_module(tmp_path: Path):
+    # The main script runs without an `if __name__ == '__main__':` guard,
+    # in a directory with modules that shadow modules the worker imports
+    script_path = tmp_path / 'script' / 'main.py'
+    script_path.parent.mkdir()
+    script_path.write_text(worker_script, encoding='utf8')
+    doc_path = tmp_path / 'doc'
+    doc_path.mkdir()
+    marker_paths = [write_hostile_module(doc_path, module_name) for module_name in ('multiprocessing', 'pickle')]
+    proc = subprocess.run([sys.executable, str(script_path)], cwd=doc_path, capture_output=True, text=True,
+                          env={'PYTHONPATH': str(package_root_path)}, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    # The main script only ran once
+    assert proc.stdout == 'worker\n'
+    assert not any(marker_path.exists() for marker_path in marker_paths)
+
+
+
+
+def write_prebuild_data(tex_sandbox: TexSandbox) -> list[str]:
+    cache_file_names = [f'{n:032x}.highlight.minted' for n in range(1, 5)]
+    tex_sandbox.write_data('0' * 32, [
+        highlight_data(f'x = {n}\n', 'python', highlightfilename=name, inputlineno=n)
+        for n, name in enumerate(cache_file_names, 1)
+    ], name='_doc.data.minted')
+    return cache_file_names
+
+
+def test_prebuild_workers_through_launcher(tex_sandbox: TexSandbox, launcher_path: Path):
+    cache_file_names = write_prebuild_data(tex_sandbox)
+    proc = tex_sandbox.run('prebuild', '--jobs', '2', '.', launcher=launcher_path)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.decode('utf8').strip() == 'Wrote 4 files, skipped 0 existing files, failed 0 files'
+    for name in cache_file_names:
+        assert r'\PYG' in (tex_sandbox.work_path / '_minted' / name).read_text(encoding='utf8')
+
+
+def test_prebuild_workers_through_unguarded_launcher(tex_sandbox: TexSandbox, launcher_path: Path):
+    # Workers don't import the main module, so the launcher's command is
+    # only run once
+    cache_file_names = write_prebuild_data(tex_sandbox)
+    proc = tex_sandbox.run('prebuild', '--jobs', '2', '.', launcher=unguarded_launcher(launcher_path))
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stderr == b''
+    assert proc.stdout.decode('utf8').strip() == 'Wrote 4 files, skipped 0 existing files, failed 0 files'
+    for name in cache_file_names:
+        assert (tex_sandbox.work_path / '_minted' / name).is_file()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+import os
+import sys
+from json import loads as json_loads
+from pathlib import Path
+import pytest
+from pygments.util import ClassNotFound
+from latexminted import registry
+
+
+
+
+lexer_module = '''\
+from pygments.lexer import RegexLexer
+from pygments.token import Text
+class RegistryTestLexer(RegexLexer):
+    name = 'Registry Test'
+    aliases = ['registrytestlexer']
+    tokens = {'root': [(r'.+\\n?', Text)]}
+'''
+
+style_module = '''\
+from pygments.style import Style
+class RegistryTestStyle(Style):
+    styles = {}
+'''
+
+
+def write_distribution(site_path: Path, name: str, module_name: str, module: str, entry_point: str):
+    (site_path / f'{module_name}.py').write_text(module, encoding='utf8')
+    dist_info_path = site_path / f'{name}-1.0.dist-info'
+    dist_info_path.mkdir()
+    (dist_info_path / 'METADATA').write_text(f'Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n', encoding='utf8')
+    (dist_info_path / 'entry_points.txt').write_text(entry_point, encoding='utf8')
+
+
+def reload_plugin_index(monkeypatch: pytest.MonkeyPatch):
+    # Each process loads the index once
+    monkeypatch.setattr(registry, '_plugin_index', None)
+    monkeypatch.setattr(registry, '_did_load_plugin_index', False)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='cache directory is only set with XDG_CACHE_HOME on POSIX')
+def test_plugin_index_is_rebuilt_when_sys_path_mtime_changes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    cache_path = tmp_path / '.cache'
+    site_path = tmp_path / 'site-packages'
+    site_path.mkdir()
+    monkeypatch.delenv('LATEXMINTED_NO_REGISTRY_CACHE', raising=False)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(cache_path))
+    monkeypatch.syspath_prepend(str(site_path))
+    for module_name in ('registry_test_lexer', 'registry_test_style'):
+        monkeypatch.delitem(sys.modules, module_name, raising=False)
+
+    write_distribution(
+        site_path, 'registry_test_lexer', 'registry_test_lexer', lexer_module,
+        '[pygments.lexers]\nregistrytest = registry_test_lexer:RegistryTestLexer\n'
+    )
+    reload_plugin_index(monkeypatch)
+    assert registry.find_lexer_class_by_name('registrytestlexer').__name__ == 'RegistryTestLexer'
+    index_paths = list((cache_path / 'latexminted' / 'registry' / sys.implementation.cache_tag).iterdir())
+    assert len(index_paths) == 1 and index_paths[0].name.startswith('plugins-')
+    site_mtime_ns = os.stat(site_path).st_mtime_ns
+
+    # Installing a distribution modifies the directory that contains its
+    # metadata.  While the mtime is unchanged, the saved index is used.
+    write_distribution(
+        site_path, 'registry_test_style', 'registry_test_style', style_module,
+        '[pygments.styles]\nregistrytest = registry_test_style:RegistryTestStyle\n'
+    )
+    os.utime(site_path, ns=(site_mtime_ns, site_mtime_ns))
+    reload_plugin_index(monkeypatch)
+    with pytest.raises(ClassNotFound):
+        registry.get_style_by_name('registrytest')
+    assert registry.find_lexer_class_by_name('registrytestlexer').__name__ == 'RegistryTestLexer'
+
+    os.utime(site_path, ns=(site_mtime_ns + 10**9, site_mtime_ns + 10**9))
+    reload_plugin_index(monkeypatch)
+    assert registry.get_style_by_name('registrytest').__name__ == 'RegistryTestStyle'
+    assert registry.find_lexer_class_by_name('registrytestlexer').__name__ == 'RegistryTestLexer'
+    assert list((cache_path / 'latexminted' / 'registry' / sys.implementation.cache_tag).iterdir()) == index_paths
+    # The rebuilt index is saved
+    index = json_loads(index_paths[0].read_text(encoding='utf8'))
+    assert index['styles']['registrytest'] == 'registry_test_style:RegistryTestStyle'
+    assert [str(site_path), site_mtime_ns + 10**9] in index['key']['sys_path']
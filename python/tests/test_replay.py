@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+from json import loads as json_loads
+from pathlib import Path
+from conftest import highlight_data, styledef_data, TexSandbox
+
+
+
+
+def test_replay_through_launcher_without_site_packages(tex_sandbox: TexSandbox, launcher_path: Path,
+                                                       bare_python: str):
+    # Replay runs are new processes, which can only import `latexminted` and
+    # its dependencies from the launcher's wheels if they get its `sys.path`
+    md5 = 'd' * 32
+    # Data files kept by `debug`:  the style definition run creates the cache
+    # directory, as in a LaTeX compile
+    data_file_names = [f'_{md5}_1.data.minted', f'_{md5}_2.data.minted']
+    tex_sandbox.write_data(md5, styledef_data(styledeffilename=f'{1:032x}.style.minted'), name=data_file_names[0])
+    tex_sandbox.write_data(md5, highlight_data('x = 1\n', 'python', highlightfilename=f'{2:032x}.highlight.minted'),
+                           name=data_file_names[1])
+    proc = tex_sandbox.run('replay', '--json', '--repeat', '2', *data_file_names, launcher=launcher_path,
+                           python=bare_python)
+    assert proc.returncode == 0, proc.stdout
+    report = json_loads(proc.stdout)
+    assert report['failed'] == 0
+    assert [run['command'] for run in report['runs']] == ['styledef', 'highlight'] * 2
+    for run in report['runs']:
+        assert run['exitcode'] == 0 and run['errors'] == []
+        assert run['stats']['counters']['outputs_written'] == 1
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+from json import loads as json_loads
+from pathlib import Path
+from typing import Iterator
+import pytest
+from conftest import highlight_data, TexSandbox, timestamp
+from latexminted.stats import (
+    accumulate_job_stats, counter_descriptions, stages, stats, timed, update_prometheus_textfile
+)
+
+
+
+
+@pytest.fixture
+def clear_stats() -> Iterator[None]:
+    stats.clear()
+    yield
+    stats.clear()
+
+
+def test_stats_as_dict_includes_every_counter_and_stage(clear_stats: None):
+    stats.count('snippets')
+    stats.count('bytes_lexed', 100)
+    stats.add_seconds('clean', 0.25)
+    assert stats.as_dict() == {
+        'counters': {k: {'snippets': 1, 'bytes_lexed': 100}.get(k, 0) for k in counter_descriptions},
+        'seconds': {k: 0.25 if k == 'clean' else 0.0 for k in stages},
+    }
+    snapshot = stats.snapshot()
+    stats.count('snippets')
+    stats.restore(snapshot)
+    assert stats.as_dict()['counters']['snippets'] == 1
+
+
+def test_timed_adds_seconds_when_function_raises(clear_stats: None):
+    @timed('styledef')
+    def fail():
+        raise ValueError
+
+    with pytest.raises(ValueError):
+        fail()
+    assert stats.as_dict()['seconds']['styledef'] > 0
+
+
+def test_accumulate_job_stats_for_runs_of_a_compile(clear_stats: None):
+    stats.count('snippets', 2)
+    stats.add_seconds('highlight', 0.5)
+    job_stats = accumulate_job_stats(None, md5='a', timestamp='1')
+    assert job_stats['runs'] == 1 and job_stats['md5'] == 'a' and job_stats['timestamp'] == '1'
+    job_stats = accumulate_job_stats(job_stats, md5='a', timestamp='1')
+    assert job_stats['runs'] == 2
+    assert job_stats['counters']['snippets'] == 4
+    assert job_stats['seconds']['highlight'] == 1.0
+    # A new compile replaces stats from earlier compiles
+    job_stats = accumulate_job_stats(job_stats, md5='a', timestamp='2')
+    assert job_stats['runs'] == 1 and job_stats['timestamp'] == '2'
+    assert job_stats['counters']['snippets'] == 2
+
+
+
+
+def read_samples(textfile_path: Path) -> dict[str, str]:
+    return dict(
+        line.rsplit(' ', 1) for line in textfile_path.read_text(encoding='utf8').splitlines()
+        if not line.startswith('#')
+    )
+
+
+def test_prometheus_textfile_counters_accumulate(tmp_path: Path, clear_stats: None):
+    textfile_path = tmp_path / 'latexminted.prom'
+    stats.count('snippets', 3)
+    stats.add_seconds('highlight', 0.125)
+    assert update_prometheus_textfile(str(textfile_path))
+    assert update_prometheus_textfile(str(textfile_path))
+    samples = read_samples(textfile_path)
+    assert samples['latexminted_runs_total'] == '2'
+    assert samples['latexminted_snippets_total'] == '6'
+    assert samples['latexminted_cache_hits_total'] == '0'
+    assert samples['latexminted_stage_seconds_total{stage="highlight"}'] == '0.250000'
+    assert samples['latexminted_stage_seconds_total{stage="clean"}'] == '0'
+    assert len(samples) == 1 + len(counter_descriptions) + len(stages)
+    text = textfile_path.read_text(encoding='utf8')
+    for k, v in counter_descriptions.items():
+        assert f'# HELP latexminted_{k}_total {v}\n# TYPE latexminted_{k}_total counter\n' in text
+    # The file is replaced atomically, leaving only the lock file
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['.latexminted.prom.lock', 'latexminted.prom']
+
+
+def test_prometheus_textfile_ignores_invalid_and_other_samples(tmp_path: Path, clear_stats: None):
+    textfile_path = tmp_path / 'latexminted.prom'
+    textfile_path.write_text(
+        'latexminted_runs_total 10\nlatexminted_snippets_total x\nother_total 5\ngarbage\n', encoding='utf8'
+    )
+    stats.count('snippets')
+    assert update_prometheus_textfile(str(textfile_path))
+    samples = read_samples(textfile_path)
+    assert samples['latexminted_runs_total'] == '11'
+    assert samples['latexminted_snippets_total'] == '1'
+    assert 'other_total' not in samples
+
+
+def test_prometheus_textfile_write_failure(tmp_path: Path, clear_stats: None):
+    assert not update_prometheus_textfile(str(tmp_path / 'missing' / 'latexminted.prom'))
+
+
+
+
+def test_stats_saved_for_each_run_of_a_compile(tex_sandbox: TexSandbox):
+    textfile_path = tex_sandbox.path / 'latexminted.prom'
+    tex_sandbox.write_config({'stats': {'enable': True, 'prometheus_textfile': str(textfile_path)}})
+    md5 = '1' * 32
+    for n in (1, 2, 3):
+        tex_sandbox.write_data(md5, highlight_data(f'x = {n}\n', 'python',
+                                                   highlightfilename=f'{n:032x}.highlight.minted'))
+        proc = tex_sandbox.run_command('highlight', md5)
+        assert proc.returncode == 0, proc.stderr
+    job_stats = json_loads((tex_sandbox.work_path / f'_{md5}.stats.minted').read_bytes())
+    assert job_stats['md5'] == md5 and job_stats['timestamp'] == timestamp and job_stats['runs'] == 3
+    counters = job_stats['counters']
+    assert counters['snippets'] == counters['cache_misses'] == counters['outputs_written'] == 3
+    assert counters['cache_hits'] == 0
+    assert counters['bytes_lexed'] == 3 * len('x = 1\n')
+    assert job_stats['seconds']['highlight'] > 0
+    samples = read_samples(textfile_path)
+    assert samples['latexminted_runs_total'] == '3'
+    assert samples['latexminted_snippets_total'] == '3'
+    assert samples['latexminted_outputs_written_total'] == '3'
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2026, Geoffrey M. Poore
+# All rights reserved.
+#
+# Licensed under the LaTeX Project Public License version 1.3c:
+# https://www.latex-project.org/lppl.txt
+#
+
+
+from __future__ import annotations
+
+from pathlib import Path
+from conftest import highlight_data, TexSandbox, unguarded_launcher, write_hostile_module
+
+
+
+
+code = 'def f(x):\n    return x + 1\n'
+
+
+def highlight(tex_sandbox: TexSandbox, n: int, *, launcher: Path | None = None):
+    md5 = f'{n:032x}'
+    tex_sandbox.write_data(md5, highlight_data(code, 'python', highlightfilename=f'{n:032x}.highlight.minted'))
+    return tex_sandbox.run_command('highlight', md5, launcher=launcher)
+
+
+def test_supervised_highlight_through_launcher(tex_sandbox: TexSandbox, launcher_path: Path):
+    proc = highlight(tex_sandbox, 1)
+    assert proc.returncode == 0, proc.stderr
+    tex_sandbox.write_config({'lexing': {'timeout_seconds': 60, 'max_memory_mb': 1024}})
+    proc = highlight(tex_sandbox, 2, launcher=launcher_path)
+    assert proc.returncode == 0, proc.stderr
+    assert tex_sandbox.errors(f'{2:032x}') == []
+    cache_path = tex_sandbox.work_path / '_minted'
+    assert (
+        (cache_path / f'{2:032x}.highlight.minted').read_text(encoding='utf8') ==
+        (cache_path / f'{1:032x}.highlight.minted').read_text(encoding='utf8')
+    )
+
+
+def test_supervised_highlight_through_unguarded_launcher(tex_sandbox: TexSandbox, launcher_path: Path):
+    # The worker does not import the main module, so the launcher's command
+    # is not run again
+    tex_sandbox.write_config({'lexing': {'timeout_seconds': 60}})
+    proc = highlight(tex_sandbox, 1, launcher=unguarded_launcher(launcher_path))
+    assert proc.returncode == 0, proc.stderr
+    assert tex_sandbox.errors(f'{1:032x}') == []
+    assert r'\PYG' in (tex_sandbox.work_path / '_minted' / f'{1:032x}.highlight.minted').read_text(encoding='utf8')
+
+
+def test_supervised_worker_does_not_import_from_working_directory(tex_sandbox: TexSandbox, launcher_path: Path):
+    marker_paths = [
+        write_hostile_module(tex_sandbox.work_path, module_name)
+        for module_name in ('multiprocessing', 'pickle', 'latexminted')
+    ]
+    tex_sandbox.write_config({'lexing': {'timeout_seconds': 60}})
+    proc = highlight(tex_sandbox, 1, launcher=launcher_path)
+    assert proc.returncode == 0, proc.stderr
+    assert tex_sandbox.errors(f'{1:032x}') == []
+    assert not any(marker_path.exists() for marker_path in marker_paths)